@@ -6,10 +6,15 @@ from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.metrics import silhouette_score
-from sqlalchemy import create_engine, text
+import os
+import sys
+from sqlalchemy import text
 
-# Creamos la conexión a la base de datos
-engine = create_engine('mysql+pymysql://root:''@localhost/data_lab')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Consulta SQL para extraer los datos necesarios
 query = text("""
@@ -36,7 +41,7 @@ query = text("""
 df = pd.read_sql(query, engine)
 
 # Cerramos la conexión a la base de datos
-engine.dispose()
+cerrar_engine()
 
 # Preparar los datos para el clustering
 features = ['precio', 'descuento', 'num_colores', 'num_tallas', 'num_subcategorias']
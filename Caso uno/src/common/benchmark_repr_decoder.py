@@ -0,0 +1,50 @@
+import argparse
+import ast
+import gc
+import os
+import time
+
+import pandas as pd
+
+from product_dataset import LIST_COLUMNS, MAP_COLUMNS
+from repr_decoder import decode_column
+
+# CSV de productos con las columnas de listas y diccionarios guardadas como repr
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data',
+                           'productos_scrapeados_v2.csv')
+
+# Decodificación de referencia: ast.literal_eval celda por celda, como se hacía en los scripts
+def decode_literal(series):
+    return [ast.literal_eval(value) if isinstance(value, str) and value.strip() else None for value in series]
+
+def measure(function, *args):
+    gc.collect()  # Que la basura de la medición anterior no se cobre en esta
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el decodificador por columnas con ast.literal_eval")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="CSV de productos con columnas de listas y diccionarios")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Veces que se repiten las filas del CSV")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, dtype=str, keep_default_na=False)
+    df = pd.concat([df] * args.repeticiones, ignore_index=True)
+    print(f"Filas: {len(df)} ({args.repeticiones} repeticiones de {args.csv})")
+
+    total_literal = total_decoder = 0.0
+    for column in LIST_COLUMNS + MAP_COLUMNS:
+        if column not in df.columns:
+            continue
+        kind = 'dict' if column in MAP_COLUMNS else 'list'
+        reference, literal_seconds = measure(decode_literal, df[column])
+        (values, malformed), decoder_seconds = measure(decode_column, df[column], kind)
+        total_literal += literal_seconds
+        total_decoder += decoder_seconds
+        status = "idéntico" if values.tolist() == reference else "DIFERENTE"
+        print(f"{column:>28}: literal_eval {len(df) / literal_seconds:9.0f} celdas/s | "
+              f"decodificador {len(df) / decoder_seconds:9.0f} celdas/s ({literal_seconds / decoder_seconds:.1f}x) | "
+              f"salida {status} | mal formadas: {len(malformed)}")
+    print(f"{'Total':>28}: {total_literal:.2f} s con literal_eval, {total_decoder:.2f} s con el decodificador "
+          f"({total_literal / total_decoder:.1f}x)")
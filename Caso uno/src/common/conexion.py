@@ -0,0 +1,72 @@
+import configparser
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import NoSuchModuleError
+
+# Base de datos si no se configura otra (el MySQL local del proyecto)
+URL_POR_DEFECTO = 'mysql+pymysql://root:@localhost/data_lab'
+# Archivo de configuración opcional, con las opciones en la sección [base_datos]; otra ruta con DATA_LAB_CONFIG
+CONFIG_POR_DEFECTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data_lab.ini')
+SECCION = 'base_datos'
+# Bases locales (un archivo): el pool de conexiones no se ajusta
+BASES_LOCALES = {'sqlite', 'duckdb'}
+
+# Convierte "1", "true", "si"... de la configuración o del entorno en booleano
+def _booleano(valor):
+    return str(valor).strip().lower() in {'1', 'true', 'si', 'sí', 'yes', 'on'}
+
+# Opciones: nombre -> (variable de entorno, conversión, valor por defecto). MySQL cierra las conexiones
+# inactivas (wait_timeout), así que se reciclan cada hora y se comprueban antes de usarlas.
+OPCIONES = {
+    'url': ('DATA_LAB_URL', str, URL_POR_DEFECTO),
+    'pool_size': ('DATA_LAB_POOL_SIZE', int, 5),
+    'max_overflow': ('DATA_LAB_MAX_OVERFLOW', int, 10),
+    'pool_recycle': ('DATA_LAB_POOL_RECYCLE', int, 3600),
+    'pool_pre_ping': ('DATA_LAB_POOL_PRE_PING', _booleano, True),
+}
+
+# Engine compartido, creado en el primer uso
+_engine = None
+
+# Opciones de conexión: valores por defecto, sustituidos por los del archivo de configuración, luego por las
+# variables de entorno y por último por los argumentos que no son None
+def configuracion(**valores):
+    config = configparser.ConfigParser()
+    config.read(os.environ.get('DATA_LAB_CONFIG', CONFIG_POR_DEFECTO), encoding='utf-8')
+    archivo = config[SECCION] if config.has_section(SECCION) else {}
+    opciones = {}
+    for nombre, (variable, convertir, defecto) in OPCIONES.items():
+        valor = valores.get(nombre)
+        if valor is None:
+            valor = os.environ.get(variable, archivo.get(nombre, defecto))
+        opciones[nombre] = convertir(valor)
+    return opciones
+
+# Crea un engine nuevo con la configuración (o con la URL y opciones indicadas). Admite MySQL y, para pruebas
+# y ejecuciones locales sin servidor, SQLite (sqlite:///ruta.sqlite) y DuckDB (duckdb:///ruta.duckdb, requiere
+# duckdb-engine)
+def crear_engine(url=None, **opciones):
+    opciones = configuracion(url=url, **opciones)
+    url = make_url(opciones.pop('url'))
+    if url.get_backend_name() in BASES_LOCALES:
+        opciones = {}
+    try:
+        return create_engine(url, **opciones)
+    except NoSuchModuleError:
+        raise ImportError(f"No hay controlador de SQLAlchemy para {url.drivername} (para DuckDB, instalar duckdb-engine)")
+
+# Engine compartido por los scripts del proyecto; se crea la primera vez que se pide
+def obtener_engine():
+    global _engine
+    if _engine is None:
+        _engine = crear_engine()
+    return _engine
+
+# Cierra las conexiones del engine compartido; el siguiente obtener_engine() crea uno nuevo
+def cerrar_engine():
+    global _engine
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
@@ -0,0 +1,170 @@
+import os
+
+import pandas as pd
+
+from repr_decoder import decode_column, decode_value
+
+# pyarrow es opcional: sin él los datos se siguen leyendo y escribiendo en CSV
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Columnas de listas de textos (en el CSV se guardan como repr de una lista de Python)
+LIST_COLUMNS = ('Subcategorías', 'Colores Disponibles', 'Tallas Disponibles', 'Recomendaciones de Cuidado',
+                'URLs de Imágenes')
+# Columnas de clave -> valor (en el CSV, repr de un diccionario)
+MAP_COLUMNS = ('Detalles del Producto',)
+# Columnas con pocos valores distintos: se guardan con codificación de diccionario y se leen como category
+CATEGORY_COLUMNS = ('Categoría Principal', 'Descuento')
+# Columnas enteras
+INT_COLUMNS = ('Position', 'Pagination')
+# Filas por lote al leer o escribir el conjunto por partes
+CHUNK_SIZE = 10000
+# Prefijo de las columnas de subcategoría que crea delete_duplicate.py (Subcategoría_1, Subcategoría_2, ...)
+SUBCATEGORY_PREFIX = 'Subcategoría_'
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("La salida Parquet requiere instalar pyarrow")
+
+def is_parquet(path):
+    return str(path).rstrip('/\\').endswith('.parquet')
+
+# Tipo Arrow de cada columna del conjunto de productos; las que no se conocen quedan como texto
+def column_type(column):
+    if column in LIST_COLUMNS:
+        return pa.list_(pa.string())
+    if column in MAP_COLUMNS:
+        return pa.map_(pa.string(), pa.string())
+    if column in CATEGORY_COLUMNS or column.startswith(SUBCATEGORY_PREFIX):
+        return pa.dictionary(pa.int32(), pa.string())
+    if column in INT_COLUMNS:
+        return pa.int32()
+    return pa.string()
+
+# Tipo de repr de una columna en el CSV: 'list', 'dict' o None si es un valor simple
+def repr_kind(column):
+    if column in LIST_COLUMNS:
+        return 'list'
+    if column in MAP_COLUMNS:
+        return 'dict'
+    return None
+
+def product_schema(columns):
+    require_pyarrow()
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+# Convierte un valor al tipo nativo de su columna. Los registros del scraper ya traen listas y diccionarios;
+# solo los que vienen de un CSV (p. ej. los que se arrastran en una actualización incremental) traen el repr.
+def _native_value(column, value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if repr_kind(column):
+        if isinstance(value, str):
+            value, _ = decode_value(value, repr_kind(column))
+        if column in MAP_COLUMNS and value is not None:
+            return {str(key): None if item is None else str(item) for key, item in dict(value).items()}
+        return None if value is None else [str(item) for item in value]
+    if column in INT_COLUMNS:
+        return int(value) if value != '' else None
+    return str(value)
+
+# Tabla Arrow a partir de registros (diccionarios con las columnas del scraper)
+def records_to_table(records):
+    columns = list(dict.fromkeys(column for record in records for column in record))
+    rows = [{column: _native_value(column, record.get(column)) for column in columns} for record in records]
+    return pa.Table.from_pylist(rows, schema=product_schema(columns))
+
+def dataframe_to_table(df):
+    return records_to_table(df.to_dict('records'))
+
+# Escribe el conjunto de productos en un archivo Parquet (se escribe aparte y se renombra)
+def write_products(data, path):
+    require_pyarrow()
+    table = data if isinstance(data, pa.Table) else (
+        dataframe_to_table(data) if isinstance(data, pd.DataFrame) else records_to_table(data)
+    )
+    temp_path = f"{path}.tmp"
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, path)
+    return table.num_rows
+
+# CSV con el formato de siempre (listas y diccionarios como repr) para quien todavía lee el CSV
+def write_products_csv(df, path, append=False):
+    df = df.copy()
+    for column in df.columns:
+        if column in LIST_COLUMNS:
+            df[column] = df[column].apply(lambda value: list(value) if value is not None else value)
+    df.to_csv(path, index=False, mode='a' if append else 'w', header=not append)
+
+# Escritura del conjunto de productos lote a lote, sin tenerlo entero en memoria: en Parquet cada lote es un
+# grupo de filas y en CSV se añade al final. Se escribe a un archivo temporal que se renombra al cerrar.
+class ProductWriter:
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = f"{path}.tmp"
+        self.parquet = is_parquet(path)
+        if self.parquet:
+            require_pyarrow()
+        self.writer = None
+        self.columns = None
+        self.rows = 0
+
+    def write(self, df):
+        if self.parquet:
+            self.columns = self.columns or list(df.columns)
+            if len(df):
+                table = dataframe_to_table(df)
+                if self.writer is None:
+                    self.writer = pq.ParquetWriter(self.temp_path, table.schema)
+                self.writer.write_table(table)
+        else:
+            write_products_csv(df, self.temp_path, append=self.columns is not None)
+            self.columns = list(df.columns)
+        self.rows += len(df)
+
+    def close(self):
+        if self.parquet and self.writer is None and self.columns is not None:
+            self.writer = pq.ParquetWriter(self.temp_path, product_schema(self.columns))  # Sin filas: solo el esquema
+        if self.writer is not None:
+            self.writer.close()
+        if os.path.exists(self.temp_path):
+            os.replace(self.temp_path, self.path)
+
+# Lee el conjunto de productos, solo con las columnas pedidas. En Parquet (un archivo o una carpeta de partes)
+# las listas llegan como arreglos, los detalles como diccionarios y las categorías como category, sin volver a
+# interpretar texto; en un CSV antiguo se decodifica el repr de esas columnas.
+def read_products(path, columns=None):
+    if is_parquet(path):
+        require_pyarrow()
+        table = pq.read_table(path, columns=columns)
+        return table.to_pandas(maps_as_pydicts='strict')
+
+    return _decode_reprs(pd.read_csv(path, usecols=columns, dtype={'Referencia': str}))
+
+def _decode_reprs(df):
+    df.columns = df.columns.str.strip()
+    for column in df.columns:
+        if repr_kind(column):
+            df[column], _ = decode_column(df[column], repr_kind(column))  # Avisa de las celdas mal formadas
+    return df
+
+# Partes de un conjunto Parquet en orden (un archivo suelto o los part-*.parquet de una carpeta)
+def _parquet_files(path):
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.endswith('.parquet') and not name.startswith(('.', '_'))]
+
+# Lee el conjunto de productos por lotes de como mucho chunk_size filas, con los mismos tipos que read_products
+def iter_products(path, chunk_size=CHUNK_SIZE, columns=None):
+    if is_parquet(path):
+        require_pyarrow()
+        for part in _parquet_files(path):
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas(maps_as_pydicts='strict')
+        return
+    for chunk in pd.read_csv(path, usecols=columns, dtype={'Referencia': str}, chunksize=chunk_size):
+        yield _decode_reprs(chunk)
@@ -0,0 +1,114 @@
+import ast
+import json
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+# Tipos de celda que se decodifican: repr de una lista de textos o de un diccionario plano texto -> texto
+KINDS = {'list': ('[', ']'), 'dict': ('{', '}')}
+
+# Filas mal formadas que se muestran en el aviso
+MAX_REPORTED = 5
+
+# ¿El valor decodificado tiene la forma esperada?
+def _valid(value, kind):
+    if kind == 'list':
+        return type(value) is list and all(type(item) is str for item in value)
+    return type(value) is dict and all(type(key) is str and type(item) is str for key, item in value.items())
+
+# Decodificación de una celda con ast.literal_eval (el camino lento, para las celdas con escapes o comillas dobles)
+def _literal(text, kind):
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None, False
+    return value, _valid(value, kind)
+
+# Decodifica una celda suelta; devuelve (valor, válida)
+def decode_value(text, kind='list'):
+    if not isinstance(text, str):
+        return (None, True) if text is None or (isinstance(text, float) and pd.isna(text)) else (text, True)
+    if not text.strip():
+        return None, True
+    if '"' not in text and '\\' not in text:
+        try:
+            value = json.loads(text.replace("'", '"'))
+        except ValueError:
+            return _literal(text, kind)  # Sintaxis válida en Python pero no en JSON, p. ej. una coma final
+        return value, _valid(value, kind)
+    return _literal(text, kind)
+
+# Estructura que debe quedar de una columna ya pasada a JSON al quitarle los textos y los espacios:
+# cada celda es una lista de textos ([,,]) o un diccionario de texto a texto ({:,:}); así se descartan
+# números, anidamientos y celdas con más de un valor sin recorrer los elementos uno por uno
+_STRUCTURE = {
+    'list': re.compile(r'\[(?:\[,*\](?:,\[,*\])*)?\]'),
+    'dict': re.compile(r'\[(?:\{(?::(?:,:)*)?\}(?:,\{(?::(?:,:)*)?\})*)?\]'),
+}
+
+# Decodifica de una vez celdas sin comillas dobles ni barras invertidas: en ellas el repr de Python pasa a ser
+# JSON cambiando ' por ", y toda la columna se lee con un solo json.loads. Devuelve None si alguna celda no
+# tiene la forma esperada (entonces se decodifican una por una).
+def _decode_bulk(texts, kind):
+    payload = '[' + ','.join(texts).replace("'", '"') + ']'
+    structure = ''.join(payload.split('"')[::2])  # Lo que queda fuera de las comillas (no hay escapes)
+    if not _STRUCTURE[kind].fullmatch(structure.replace(' ', '')):
+        return None
+    try:
+        values = json.loads(payload)
+    except ValueError:
+        return None
+    return values if len(values) == len(texts) else None
+
+# Decodifica una columna entera de repr de listas ('list') o diccionarios ('dict'). Las celdas simples
+# se decodifican en bloque (_decode_bulk); las que tienen escapes o comillas dobles, una por una.
+# Devuelve (valores, índices de las celdas mal formadas); las celdas vacías quedan como None y las que ya
+# no son texto (p. ej. listas leídas de Parquet) se conservan tal cual.
+def decode_column(series, kind='list', name=None):
+    cells = series.to_numpy(dtype=object)
+    values = np.full(len(cells), None, dtype=object)
+    positions, texts = [], []
+    for position, cell in enumerate(cells):
+        if isinstance(cell, str):
+            cell = cell.strip()
+            if cell:
+                positions.append(position)
+                texts.append(cell)
+        elif cell is not None and not (isinstance(cell, float) and np.isnan(cell)):
+            values[position] = cell
+
+    joined = ''.join(texts)
+    if '"' in joined or '\\' in joined:
+        simple = ['"' not in text and '\\' not in text for text in texts]
+    else:
+        simple = [True] * len(texts)
+    fast = [position for position, is_simple in zip(positions, simple) if is_simple]
+    bulk = _decode_bulk([text for text, is_simple in zip(texts, simple) if is_simple], kind) if fast else None
+    if bulk is not None:
+        values[fast] = np.fromiter(bulk, dtype=object, count=len(bulk))
+    else:
+        simple = [False] * len(texts)
+
+    malformed = []
+    for position, text, is_simple in zip(positions, texts, simple):
+        if is_simple:
+            continue
+        value, valid = decode_value(text, kind)
+        if valid:
+            values[position] = value
+        else:
+            malformed.append(position)
+
+    malformed = series.index[malformed]
+    if len(malformed):
+        logging.warning(f"{len(malformed)} celdas mal formadas en '{name or series.name}' "
+                        f"(filas {list(malformed[:MAX_REPORTED])}{'...' if len(malformed) > MAX_REPORTED else ''})")
+    return pd.Series(values, index=series.index, name=series.name), malformed
+
+def decode_list_column(series, name=None):
+    return decode_column(series, 'list', name)
+
+def decode_dict_column(series, name=None):
+    return decode_column(series, 'dict', name)
@@ -0,0 +1,82 @@
+import argparse
+import gc
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from casi_duplicados import (PALABRAS_SHINGLE, PERMUTACIONES, UMBRAL, agrupar, firmas_minhash, permutaciones,
+                             shingles, texto_producto)
+
+# CSV de productos con nombre y descripción
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data',
+                           'productos_scrapeados_v2_limpios.csv')
+
+# Copias del catálogo con una palabra menos por descripción, para tener casi duplicados que no son idénticos
+def repetir(df, repeticiones, semilla=1):
+    generador = np.random.default_rng(semilla)
+    copias = [df]
+    for copia in range(1, repeticiones):
+        otra = df.copy()
+        otra['Referencia'] = otra['Referencia'] + f'-{copia}'
+        palabras = otra['Descripción del Producto'].fillna('').str.split()
+        otra['Descripción del Producto'] = [
+            ' '.join(p[:i] + p[i + 1:]) for p, i in zip(palabras, generador.integers(0, 1 << 30, len(palabras)) % palabras.str.len().clip(lower=1))
+        ]
+        copias.append(otra)
+    return pd.concat(copias, ignore_index=True)
+
+# Pares sobre el umbral comparando todos contra todos con la similitud de Jaccard exacta (cuadrático)
+def pares_exactos(conjuntos, umbral):
+    conjuntos = [set(conjunto.tolist()) for conjunto in conjuntos]
+    pares = set()
+    for i, a in enumerate(conjuntos):
+        for j in range(i + 1, len(conjuntos)):
+            b = conjuntos[j]
+            if len(a & b) >= umbral * len(a | b):
+                pares.add((i, j))
+    return pares
+
+def measure(function, *args):
+    gc.collect()  # Que la basura de la medición anterior no se cobre en esta
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara MinHash + LSH con la comparación exacta de todos los pares")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="CSV de productos con nombre y descripción")
+    parser.add_argument("--repeticiones", type=int, default=2, help="Copias (con una palabra menos) del catálogo")
+    parser.add_argument("--umbral", type=float, default=UMBRAL, help="Similitud de Jaccard mínima")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, usecols=['Referencia', 'Nombre del Producto', 'Descripción del Producto'], dtype=str)
+    df = repetir(df, args.repeticiones)
+    conjuntos = [shingles(texto_producto(nombre, descripcion), PALABRAS_SHINGLE)
+                 for nombre, descripcion in zip(df['Nombre del Producto'], df['Descripción del Producto'].fillna(''))]
+    print(f"Productos: {len(df)} ({args.repeticiones} copias de {args.csv})")
+
+    firmas, segundos_firmas = measure(firmas_minhash, conjuntos, permutaciones(PERMUTACIONES))
+    grupos, segundos_lsh = measure(agrupar, df['Referencia'].tolist(), firmas, args.umbral)
+    exactos, segundos_exactos = measure(pares_exactos, conjuntos, args.umbral)
+
+    # Pares dentro de un mismo grupo del LSH y, de ellos, los de cada producto con su representante (los que
+    # insert_db.py --duplicados da por duplicados)
+    posicion = {referencia: i for i, referencia in enumerate(df['Referencia'])}
+    agrupados = set()
+    for miembros in grupos.groupby('Grupo')['Referencia']:
+        indices = sorted(posicion[referencia] for referencia in miembros[1])
+        agrupados.update((i, j) for k, i in enumerate(indices) for j in indices[k + 1:])
+    con_representante = {tuple(sorted((posicion[representante], posicion[referencia])))
+                         for referencia, representante in zip(grupos['Referencia'], grupos['Representante'])
+                         if referencia != representante}
+
+    encontrados = len(exactos & agrupados)
+    print(f"Todos contra todos: {segundos_exactos:.2f} s, {len(exactos)} pares sobre el umbral")
+    print(f"MinHash + LSH: {segundos_firmas + segundos_lsh:.2f} s (firmas {segundos_firmas:.2f} s, "
+          f"LSH {segundos_lsh:.2f} s), {grupos['Grupo'].nunique()} grupos con {len(grupos)} productos "
+          f"({segundos_exactos / (segundos_firmas + segundos_lsh):.1f}x)")
+    print(f"Pares exactos dentro de un mismo grupo: {encontrados / max(len(exactos), 1):.1%} "
+          f"| pares agrupados que superan el umbral exacto: {encontrados / max(len(agrupados), 1):.1%} "
+          f"| con el representante: {len(exactos & con_representante) / max(len(con_representante), 1):.1%}")
@@ -0,0 +1,79 @@
+import argparse
+import gc
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from repr_decoder import decode_list_column
+from normalizacion import MAX_SUBCATEGORIAS, expandir_subcategorias, normalizar_tallas, tabla_tallas
+
+# CSV de productos con las columnas 'Subcategorías' y 'Tallas Disponibles' como repr de listas
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data',
+                           'productos_scrapeados_v2_limpios.csv')
+
+# Limpieza de tallas de referencia: fila por fila, como la hacía delete_duplicate.py
+def limpiar_tallas(tallas):
+    if tallas is None:
+        return []
+    tallas_limpias = []
+    for talla in tallas:
+        talla = re.sub(r'\b0+(\d)', r'\1', talla)
+        if '-' in talla:
+            tallas_limpias.extend(talla.split('-'))
+        elif '/' in talla:
+            tallas_limpias.extend(talla.split('/'))
+        else:
+            tallas_limpias.append(talla)
+    return tallas_limpias
+
+def tallas_por_fila(tallas):
+    return tallas.apply(limpiar_tallas)
+
+# Subcategorías en columnas de referencia: un apply por columna, como lo hacía delete_duplicate.py
+def subcategorias_por_fila(subcategorias):
+    subcategorias = subcategorias.apply(lambda x: x if x is not None else [])
+    return pd.DataFrame({
+        f'Subcategoría_{i+1}': subcategorias.apply(lambda x: x[i] if len(x) > i else None)
+        for i in range(MAX_SUBCATEGORIAS)
+    })
+
+def measure(function, *args):
+    gc.collect()  # Que la basura de la medición anterior no se cobre en esta
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la normalización vectorizada con la limpieza fila por fila")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="CSV de productos con subcategorías y tallas")
+    parser.add_argument("--filas", type=int, default=100000, help="Filas del benchmark (se repiten las del CSV)")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, usecols=['Subcategorías', 'Tallas Disponibles'], dtype=str)
+    df = pd.concat([df] * (args.filas // len(df) + 1), ignore_index=True).head(args.filas)
+    subcategorias, _ = decode_list_column(df['Subcategorías'])
+    tallas, _ = decode_list_column(df['Tallas Disponibles'])
+    print(f"Filas: {len(df)} (a partir de {args.csv})")
+
+    referencia, segundos_fila = measure(tallas_por_fila, tallas)
+    vectorizada, segundos_vector = measure(normalizar_tallas, tallas)
+    status = "idéntico" if vectorizada.tolist() == referencia.tolist() else "DIFERENTE"
+    print(f"{'Tallas Disponibles':>20}: fila por fila {segundos_fila:.2f} s | vectorizada {segundos_vector:.2f} s "
+          f"({segundos_fila / segundos_vector:.1f}x) | salida {status}")
+
+    # Segunda pasada: todas las tallas ya están en la tabla
+    _, segundos_tabla = measure(normalizar_tallas, tallas)
+    print(f"{'':>20}  con la tabla ya cargada: {segundos_tabla:.2f} s ({segundos_fila / segundos_tabla:.1f}x)")
+
+    referencia, segundos_fila = measure(subcategorias_por_fila, subcategorias)
+    vectorizada, segundos_vector = measure(expandir_subcategorias, subcategorias)
+    status = "idéntico" if vectorizada.equals(referencia) else "DIFERENTE"
+    print(f"{'Subcategorías':>20}: fila por fila {segundos_fila:.2f} s | vectorizada {segundos_vector:.2f} s "
+          f"({segundos_fila / segundos_vector:.1f}x) | salida {status}")
+
+    print("\nTabla de tallas en orden canónico:")
+    print(tabla_tallas().to_string(index=False))
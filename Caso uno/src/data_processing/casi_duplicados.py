@@ -0,0 +1,216 @@
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from product_dataset import CHUNK_SIZE, is_parquet, iter_products, require_pyarrow
+
+# Carpeta de los datos y nombres por defecto de la entrada (salida de delete_duplicate.py) y de los grupos
+DATA_DIR = 'C:/Users/johan/Desktop/Data/Caso uno/data'
+ENTRADA = 'productos_scrapeados_v3_limpios'
+SALIDA = 'grupos_casi_duplicados.csv'
+
+# Columnas que se comparan
+COLUMNAS = ['Referencia', 'Nombre del Producto', 'Descripción del Producto']
+
+# Parámetros por defecto: similitud de Jaccard mínima entre dos productos, palabras por shingle y
+# permutaciones de la firma MinHash (más permutaciones, estimación más precisa y firmas más grandes)
+UMBRAL = 0.8
+PALABRAS_SHINGLE = 3
+PERMUTACIONES = 128
+# Peso de los falsos negativos al elegir las bandas del LSH: los candidatos se verifican con la firma, así que
+# un falso positivo solo cuesta una comparación y conviene perder pocos pares
+PESO_FALSOS_NEGATIVOS = 0.9
+
+# Primo de Mersenne para el hash universal (a * x + b) mod p de cada permutación
+_PRIMO = (1 << 61) - 1
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Shingles que se procesan a la vez al calcular las firmas (acota la matriz shingles x permutaciones)
+_SHINGLES_POR_BLOQUE = 1 << 16
+
+# Texto comparable de un producto: nombre y descripción en minúsculas, sin tildes ni signos. Del nombre se quita
+# el número de modelo del final ('Bermuda ... para Hombre 05378'), que cambia entre referencias de la misma prenda.
+def texto_producto(nombre, descripcion):
+    nombre = re.sub(r'\s+\d+\s*$', '', nombre or '')
+    texto = unicodedata.normalize('NFKD', f"{nombre} {descripcion or ''}".lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+# Shingles de un texto (grupos de `palabras` palabras seguidas) como hashes de 32 bits. Un texto más corto
+# que un shingle queda como un solo shingle.
+def shingles(texto, palabras=PALABRAS_SHINGLE):
+    tokens = texto.split()
+    grupos = {' '.join(tokens[i:i + palabras]) for i in range(max(len(tokens) - palabras + 1, 1))}
+    return np.fromiter((zlib.crc32(grupo.encode()) for grupo in grupos), dtype=np.uint64, count=len(grupos))
+
+# Coeficientes (a, b) de las permutaciones; con la misma semilla las firmas de distintas ejecuciones son comparables
+def permutaciones(cantidad=PERMUTACIONES, semilla=1):
+    generador = np.random.default_rng(semilla)
+    a = generador.integers(1, _PRIMO, size=cantidad, dtype=np.uint64)
+    b = generador.integers(0, _PRIMO, size=cantidad, dtype=np.uint64)
+    return a, b
+
+# Firmas MinHash de una lista de conjuntos de shingles (una fila por producto). Se calculan por bloques de
+# shingles: cada bloque se permuta entero con numpy y se toma el mínimo de cada producto con reduceat.
+def firmas_minhash(conjuntos, coeficientes):
+    a, b = coeficientes
+    firmas = np.empty((len(conjuntos), len(a)), dtype=np.uint32)
+    inicio = 0
+    while inicio < len(conjuntos):
+        fin, total = inicio, 0
+        while fin < len(conjuntos) and (fin == inicio or total + len(conjuntos[fin]) <= _SHINGLES_POR_BLOQUE):
+            total += len(conjuntos[fin])
+            fin += 1
+        bloque = conjuntos[inicio:fin]
+        valores = (np.concatenate(bloque)[:, None] * a + b) % np.uint64(_PRIMO) & _MAX_HASH  # El producto da la vuelta en 64 bits
+        cortes = np.cumsum([0] + [len(conjunto) for conjunto in bloque[:-1]])
+        firmas[inicio:fin] = np.minimum.reduceat(valores, cortes, axis=0)
+        inicio = fin
+    return firmas
+
+# Bandas y filas por banda del LSH para un umbral: las que minimizan la suma ponderada de las probabilidades de
+# falso positivo (pares bajo el umbral que caen en un mismo cubo) y de falso negativo (pares sobre el umbral que no)
+def parametros_lsh(umbral=UMBRAL, permutaciones=PERMUTACIONES, peso_falsos_negativos=PESO_FALSOS_NEGATIVOS):
+    similitudes = np.linspace(0, 1, 1001)
+    mejor, mejor_error = None, None
+    for bandas in range(1, permutaciones + 1):
+        filas = permutaciones // bandas
+        candidato = 1 - (1 - similitudes ** filas) ** bandas  # Probabilidad de compartir al menos un cubo
+        bajo, sobre = similitudes < umbral, similitudes >= umbral
+        error = ((1 - peso_falsos_negativos) * np.trapezoid(candidato[bajo], similitudes[bajo])
+                 + peso_falsos_negativos * np.trapezoid(1 - candidato[sobre], similitudes[sobre]))
+        if mejor_error is None or error < mejor_error:
+            mejor, mejor_error = (bandas, filas), error
+    return mejor
+
+# Pares candidatos del LSH: cada banda de la firma se usa como clave de un cubo y los productos que comparten
+# algún cubo son candidatos. Solo se ordenan las claves de cada banda, sin comparar todos contra todos.
+def pares_candidatos(firmas, bandas, filas):
+    pares = set()
+    for banda in range(bandas):
+        claves = np.ascontiguousarray(firmas[:, banda * filas:(banda + 1) * filas])
+        claves = claves.view(np.dtype((np.void, claves.dtype.itemsize * filas))).ravel()
+        _, cubo = np.unique(claves, return_inverse=True)
+        orden = np.argsort(cubo, kind='stable')
+        inicios = np.flatnonzero(np.diff(cubo[orden], prepend=-1))
+        for miembros in np.split(orden, inicios[1:]):
+            if len(miembros) > 1:
+                pares.update((int(i), int(j)) for k, i in enumerate(miembros) for j in miembros[k + 1:])
+    if not pares:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.array(sorted(pares), dtype=np.int64)
+
+# Grupos en estrella de los pares, recorriendo los nodos en `orden`: el primer nodo sin grupo es el representante
+# y se lleva a sus vecinos que aún no tienen grupo. Así cada miembro supera el umbral con el representante; las
+# componentes conexas encadenarían productos que no se parecen al representante. Devuelve el grupo de cada nodo,
+# numerado por su representante (un nodo sin vecinos libres queda solo)
+def grupos_estrella(nodos, pares, orden):
+    vecinos = [[] for _ in range(nodos)]
+    for i, j in pares.tolist():
+        vecinos[i].append(j)
+        vecinos[j].append(i)
+    grupo = np.full(nodos, -1, dtype=np.int64)
+    for nodo in orden.tolist():
+        if grupo[nodo] != -1:
+            continue
+        grupo[nodo] = nodo
+        for vecino in vecinos[nodo]:
+            if grupo[vecino] == -1:
+                grupo[vecino] = nodo
+    return grupo
+
+# Similitud de Jaccard estimada de cada par: fracción de permutaciones en las que coinciden las firmas
+def similitud_estimada(firmas, pares):
+    return (firmas[pares[:, 0]] == firmas[pares[:, 1]]).mean(axis=1)
+
+# Grupos de casi duplicados de un conjunto de productos. Los productos con la misma firma se juntan antes
+# (así un texto repetido muchas veces no llena los cubos); el LSH propone pares entre las firmas distintas,
+# se quedan los que superan el umbral y con ellos se forman grupos en estrella en el orden de la entrada.
+# Devuelve un DataFrame con Grupo, Referencia, Representante (la primera referencia del grupo en el orden de
+# la entrada) y Similitud (estimada con el representante, siempre >= umbral); solo aparecen los productos que
+# tienen duplicados. Como cada producto se parece al representante, insert_db.py --duplicados puede omitir
+# todos los que no son representante.
+def agrupar(referencias, firmas, umbral=UMBRAL):
+    bandas, filas = parametros_lsh(umbral, firmas.shape[1])
+    unicas, firma_de = np.unique(firmas, axis=0, return_inverse=True)
+    firma_de = firma_de.ravel()
+
+    pares = pares_candidatos(unicas, bandas, filas)
+    pares = pares[similitud_estimada(unicas, pares) >= umbral]
+    logging.info(f"{len(unicas)} firmas distintas, LSH de {bandas} bandas x {filas} filas: {len(pares)} pares sobre el umbral")
+
+    primera = np.full(len(unicas), len(firma_de), dtype=np.int64)  # Primera aparición de cada firma en la entrada
+    np.minimum.at(primera, firma_de, np.arange(len(firma_de)))
+    componente = grupos_estrella(len(unicas), pares, np.argsort(primera, kind='stable'))[firma_de]
+
+    grupos = pd.DataFrame({'Componente': componente, 'Referencia': np.asarray(referencias, dtype=object)})
+    grupos['Posicion'] = np.arange(len(grupos))
+    grupos = grupos[grupos.groupby('Componente')['Referencia'].transform('size') > 1]
+    if grupos.empty:
+        return pd.DataFrame({'Grupo': pd.Series(dtype='int64'), 'Referencia': pd.Series(dtype=object),
+                             'Representante': pd.Series(dtype=object), 'Similitud': pd.Series(dtype='float64')})
+
+    representante = grupos.groupby('Componente')['Posicion'].transform('min').to_numpy()
+    grupos['Representante'] = grupos['Referencia'].to_numpy()[np.searchsorted(grupos['Posicion'].to_numpy(), representante)]
+    grupos['Similitud'] = (firmas[grupos['Posicion'].to_numpy()] == firmas[representante]).mean(axis=1)
+    grupos['Grupo'] = pd.factorize(representante)[0]  # Numerados en el orden de la entrada
+    grupos = grupos.sort_values(['Grupo', 'Posicion'])
+    return grupos[['Grupo', 'Referencia', 'Representante', 'Similitud']].reset_index(drop=True)
+
+# Firmas de los productos de una o varias entradas, leídas por lotes; devuelve (referencias, firmas)
+def firmas_productos(entradas, palabras=PALABRAS_SHINGLE, coeficientes=None, chunk_size=CHUNK_SIZE):
+    coeficientes = coeficientes or permutaciones()
+    referencias, firmas = [], []
+    for entrada in entradas:
+        for lote in iter_products(entrada, chunk_size, columns=COLUMNAS):
+            lote = lote.astype(object).where(lote.notna(), None)
+            conjuntos = [shingles(texto_producto(nombre, descripcion), palabras)
+                         for nombre, descripcion in zip(lote['Nombre del Producto'], lote['Descripción del Producto'])]
+            referencias.extend(lote['Referencia'])
+            firmas.append(firmas_minhash(conjuntos, coeficientes))
+    if not firmas:
+        return referencias, np.empty((0, len(coeficientes[0])), dtype=np.uint32)
+    return referencias, np.concatenate(firmas)
+
+# Guarda los grupos en CSV o Parquet según la extensión
+def guardar_grupos(grupos, path):
+    if is_parquet(path):
+        require_pyarrow()
+        grupos.to_parquet(path, index=False)
+    else:
+        grupos.to_csv(path, index=False)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Busca productos casi duplicados (MinHash + LSH sobre nombre y descripción)")
+    parser.add_argument("--entrada", nargs='+',
+                        help=f"CSV o Parquet de productos (por defecto {ENTRADA} en {DATA_DIR})")
+    parser.add_argument("--salida", default=os.path.join(DATA_DIR, SALIDA), help="CSV o Parquet con los grupos")
+    parser.add_argument("--umbral", type=float, default=UMBRAL, help="Similitud de Jaccard mínima (0 a 1)")
+    parser.add_argument("--palabras", type=int, default=PALABRAS_SHINGLE, help="Palabras por shingle")
+    parser.add_argument("--permutaciones", type=int, default=PERMUTACIONES, help="Permutaciones de la firma MinHash")
+    args = parser.parse_args()
+
+    entradas = args.entrada
+    if not entradas:
+        entradas = [os.path.join(DATA_DIR, f'{ENTRADA}.parquet')]
+        if not os.path.exists(entradas[0]):
+            entradas = [os.path.join(DATA_DIR, f'{ENTRADA}.csv')]
+
+    start_time = time.time()
+    referencias, firmas = firmas_productos(entradas, args.palabras, permutaciones(args.permutaciones))
+    grupos = agrupar(referencias, firmas, args.umbral)
+    guardar_grupos(grupos, args.salida)
+
+    print(f"Productos comparados: {len(referencias)}")
+    print(f"Grupos de casi duplicados: {grupos['Grupo'].nunique()} ({len(grupos)} productos, "
+          f"{len(grupos) - grupos['Grupo'].nunique()} sobrantes)")
+    print(f"Grupos guardados en {args.salida} ({time.time() - start_time:.2f} segundos)")
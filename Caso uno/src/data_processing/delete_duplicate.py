@@ -1,83 +1,178 @@
 import pandas as pd
-import ast
-import re
-
-# Cargar el archivo CSV que contiene los productos desde una ruta específica
-df = pd.read_csv('C:/Users/johan/Desktop/Data/Caso uno/data/productos_scrapeados_v2_limpios.csv')
-
-# Mostramos el número total de filas antes de la eliminación de duplicados
-print(f"Número de filas antes de eliminar duplicados: {len(df)}")
-
-# Eliminamos las filas duplicadas basadas en la columna 'Referencia'
-df_clean = df.drop_duplicates(subset='Referencia')
-
-# Mostramos el número de filas después de eliminar duplicados para verificar cuántas se eliminaron
-print(f"Número de filas después de eliminar duplicados: {len(df_clean)}")
-
-# Imprimimos cuántas filas duplicadas fueron eliminadas
-print(f"Se eliminaron {len(df) - len(df_clean)} filas duplicadas.")
-
-# Ahora, procesamos el DataFrame limpio para trabajar con las subcategorías y reordenar las columnas
-df_clean.columns = df_clean.columns.str.strip()  # Eliminar espacios adicionales en los nombres de las columnas
-
-# Verificar las columnas y eliminar las columnas numéricas (0, 1, 2, ..., 11)
-df_clean = df_clean.loc[:, ~df_clean.columns.str.match(r'^\d+$')]
-
-# Eliminar la columna 'Subcategorías' si ya tienes las columnas 'Subcategoría_1', 'Subcategoría_2', ...
-if 'Subcategorías' in df_clean.columns:
-    # Convertir las subcategorías de string a lista (si está en formato string como una lista)
-    df_clean['Subcategorías'] = df_clean['Subcategorías'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
-    
-    # Crear columnas separadas para cada subcategoría
-    max_subcategorias = df_clean['Subcategorías'].apply(len).max()  # Cuántas subcategorías hay como máximo
-
-    # Crear nuevas columnas para cada subcategoría
-    for i in range(max_subcategorias):
-        df_clean[f'Subcategoría_{i+1}'] = df_clean['Subcategorías'].apply(lambda x: x[i] if len(x) > i else None)
-
-    # Eliminar la columna 'Subcategorías' original
-    df_clean.drop(columns=['Subcategorías'], inplace=True)
-
-# Organizar las subcategorías después de la columna 'Categoría Principal'
-subcategorias = [f'Subcategoría_{i+1}' for i in range(7)]  # Aquí asumo que tienes hasta 7 subcategorías
-
-# Crear una lista de las columnas en el orden deseado
-columnas_ordenadas = ['Nombre del Producto', 'Categoría Principal'] + subcategorias + [col for col in df_clean.columns if col not in ['Nombre del Producto', 'Categoría Principal'] + subcategorias]
-
-# Reordenar el DataFrame con las columnas organizadas
-df_clean = df_clean[columnas_ordenadas]
-
-# Función para limpiar y reorganizar las tallas
-def limpiar_tallas(tallas):
-    # Si el valor es una cadena, la convertimos en lista de tallas
-    if isinstance(tallas, str):
-        tallas = ast.literal_eval(tallas)  # Convertimos la cadena en lista de tallas
-    
-    tallas_limpias = []
-
-    for talla in tallas:
-        # Eliminar ceros a la izquierda en números (e.g., '02' -> '2')
-        talla = re.sub(r'\b0+(\d)', r'\1', talla)
-        
-        # Si la talla contiene un rango numérico (e.g. '10-12'), la dividimos por el '-'
-        if '-' in talla:
-            tallas_limpias.extend(talla.split('-'))  # Divide y agrega cada número individualmente
-        elif '/' in talla:
-            # Si la talla contiene '/', la reemplazamos por una coma para separar los valores
-            tallas_limpias.extend(talla.split('/'))  # Divide en 'XS' y 'S'
-        else:
-            # Si no es un rango ni tiene '/', agregamos la talla tal cual
-            tallas_limpias.append(talla)
-
-    # Devolver la lista de tallas limpiadas
-    return tallas_limpias
-
-# Aplicar la función de limpieza a la columna 'Tallas Disponibles'
-df_clean['Tallas Disponibles'] = df_clean['Tallas Disponibles'].apply(limpiar_tallas)
-
-# Mostrar el DataFrame limpio y organizado
-print("\nDatos limpios y organizados:")
-print(df_clean)
-
-# Guardamos el DataFrame limpio en un nuevo archivo CSV
-df_clean.to_csv('C:/Users/johan/Desktop/Data/Caso uno/data/productos_scrapeados_v3_limpios.csv', index=False)
\ No newline at end of file
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from product_dataset import CHUNK_SIZE, ProductWriter, iter_products, pa
+from repr_decoder import decode_list_column
+from normalizacion import MAX_SUBCATEGORIAS, expandir_subcategorias, normalizar_tallas, registrar_tabla, tabla_actual, tabla_tallas
+
+# Carpeta de los datos y nombre base de los archivos de entrada y salida
+DATA_DIR = 'C:/Users/johan/Desktop/Data/Caso uno/data'
+ENTRADA = 'productos_scrapeados_v2_limpios'
+SALIDA = 'productos_scrapeados_v3_limpios'
+
+# Conjunto en disco de las referencias ya escritas. Cada referencia se guarda como su hash de 64 bits
+# (clave primaria entera de SQLite, unos pocos bytes por referencia), así la memoria no crece con la entrada.
+# Si se indica un archivo, el conjunto se conserva entre ejecuciones y las referencias de días anteriores
+# también cuentan como duplicadas.
+class ReferenciasVistas:
+    def __init__(self, path=None):
+        self.temporal = path is None
+        if self.temporal:
+            descriptor, path = tempfile.mkstemp(suffix='.sqlite')
+            os.close(descriptor)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        if self.temporal:
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS referencias (hash INTEGER PRIMARY KEY)")
+        self.conn.execute("CREATE TEMP TABLE lote (hash INTEGER PRIMARY KEY)")
+        self.conn.commit()
+
+    # Máscara de las filas que hay que conservar: primera aparición de su referencia en el lote y que no se
+    # haya visto en lotes anteriores. Las referencias nuevas quedan registradas.
+    def filtrar(self, referencias):
+        hashes = pd.util.hash_pandas_object(referencias.astype(object), index=False).to_numpy().view('int64')
+        primeras = ~pd.Series(hashes).duplicated().to_numpy()
+        candidatas = hashes[primeras].tolist()
+
+        self.conn.executemany("INSERT INTO lote (hash) VALUES (?)", ((h,) for h in candidatas))
+        vistas = {h for h, in self.conn.execute("SELECT hash FROM lote JOIN referencias USING (hash)")}
+        self.conn.execute("INSERT OR IGNORE INTO referencias (hash) SELECT hash FROM lote")
+        self.conn.execute("DELETE FROM lote")
+        self.conn.commit()
+
+        if vistas:
+            primeras &= ~pd.Series(hashes).isin(vistas).to_numpy()
+        return primeras
+
+    def close(self):
+        self.conn.close()
+        if self.temporal:
+            os.remove(self.path)
+
+# Arreglos de columnas sobre un lote de productos: subcategorías en columnas, orden de columnas y tallas
+def limpiar_lote(df):
+    df = df.copy()
+    df.columns = df.columns.str.strip()  # Eliminar espacios adicionales en los nombres de las columnas
+
+    # Verificar las columnas y eliminar las columnas numéricas (0, 1, 2, ..., 11)
+    df = df.loc[:, ~df.columns.str.match(r'^\d+$')]
+
+    # Eliminar la columna 'Subcategorías' si ya tienes las columnas 'Subcategoría_1', 'Subcategoría_2', ...
+    if 'Subcategorías' in df.columns:
+        # Convertir las subcategorías de string a lista (si está en formato string como una lista)
+        df['Subcategorías'], _ = decode_list_column(df['Subcategorías'])
+
+        # Crear las columnas Subcategoría_1 ... Subcategoría_7 en una sola pasada y quitar la original
+        subcategorias = expandir_subcategorias(df['Subcategorías'])
+        df = pd.concat([df.drop(columns=['Subcategorías']), subcategorias], axis=1)
+
+    # Organizar las subcategorías después de la columna 'Categoría Principal'
+    subcategorias = [f'Subcategoría_{i+1}' for i in range(MAX_SUBCATEGORIAS)]
+
+    # Crear una lista de las columnas en el orden deseado
+    columnas_ordenadas = ['Nombre del Producto', 'Categoría Principal'] + subcategorias + [col for col in df.columns if col not in ['Nombre del Producto', 'Categoría Principal'] + subcategorias]
+
+    # Reordenar el DataFrame con las columnas organizadas
+    df = df[columnas_ordenadas]
+
+    # Normalizar la columna 'Tallas Disponibles' (las celdas en texto se decodifican antes, de una vez para
+    # todo el lote): sin ceros a la izquierda y con los rangos y las tallas dobles separados
+    df['Tallas Disponibles'], _ = decode_list_column(df['Tallas Disponibles'])
+    df['Tallas Disponibles'] = normalizar_tallas(df['Tallas Disponibles'])
+    return df
+
+# Limpia un archivo de entrada completo en un proceso aparte y lo deja en un Parquet temporal; devuelve
+# también las tallas que normalizó, para la tabla de tallas del proceso principal
+def _limpiar_archivo(entrada, temporal, chunk_size):
+    writer = ProductWriter(temporal)
+    for lote in iter_products(entrada, chunk_size):
+        writer.write(limpiar_lote(lote))
+    writer.close()
+    return temporal, tabla_actual()
+
+# Lotes limpios de todas las entradas, en orden. Con varios procesos cada archivo se limpia en paralelo
+# (a un Parquet temporal) mientras se van entregando los lotes de los archivos anteriores.
+def _lotes_limpios(entradas, chunk_size, procesos):
+    if procesos <= 1:
+        for entrada in entradas:
+            for lote in iter_products(entrada, chunk_size):
+                yield limpiar_lote(lote)
+        return
+
+    temporales = tempfile.mkdtemp(prefix='limpieza_')
+    try:
+        with ProcessPoolExecutor(procesos) as pool:
+            partes = [
+                pool.submit(_limpiar_archivo, entrada, os.path.join(temporales, f'parte-{i:05d}.parquet'), chunk_size)
+                for i, entrada in enumerate(entradas)
+            ]
+            for parte in partes:
+                temporal, tabla = parte.result()
+                registrar_tabla(tabla)
+                yield from iter_products(temporal, chunk_size)
+                os.remove(temporal)
+    finally:
+        shutil.rmtree(temporales, ignore_errors=True)
+
+# Limpieza por lotes: lee cada entrada de a `chunk_size` filas, arregla las columnas, descarta las referencias
+# ya vistas (en este lote, en lotes anteriores o, con `vistas`, en ejecuciones anteriores) y escribe el lote
+# en cada salida. La memoria queda acotada por el tamaño del lote, sin importar el tamaño de la entrada.
+def limpiar_productos(entradas, salidas, chunk_size=CHUNK_SIZE, vistas=None, procesos=1):
+    referencias = ReferenciasVistas(vistas)
+    writers = [ProductWriter(salida) for salida in salidas]
+    leidas = 0
+    try:
+        for lote in _lotes_limpios(entradas, chunk_size, procesos):
+            leidas += len(lote)
+            lote = lote[referencias.filtrar(lote['Referencia'])]
+            for writer in writers:
+                writer.write(lote)
+    finally:
+        referencias.close()
+    for writer in writers:
+        writer.close()
+    return leidas, writers[0].rows if writers else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Elimina productos duplicados por referencia y limpia las columnas")
+    parser.add_argument("--entrada", nargs='+',
+                        help=f"CSV o Parquet de productos, en orden (por defecto {ENTRADA} en {DATA_DIR})")
+    parser.add_argument("--salida", default=os.path.join(DATA_DIR, SALIDA),
+                        help="Ruta de salida sin extensión; se escribe un archivo por formato")
+    parser.add_argument("--formatos", default="parquet,csv" if pa is not None else "csv",
+                        help="Formatos de salida separados por comas (parquet, csv)")
+    parser.add_argument("--lote", type=int, default=CHUNK_SIZE, help="Filas que se leen y limpian a la vez")
+    parser.add_argument("--vistas", help="SQLite con las referencias ya vistas, para conservarlas entre ejecuciones")
+    parser.add_argument("--procesos", type=int, default=1, help="Archivos de entrada que se limpian en paralelo")
+    parser.add_argument("--tabla-tallas", help="CSV donde guardar la tabla de normalización de tallas en orden canónico")
+    args = parser.parse_args()
+
+    # Por defecto se usa la versión Parquet si existe (las listas y los detalles ya vienen con su tipo);
+    # del CSV se decodifican al leerlo
+    entradas = args.entrada
+    if not entradas:
+        entradas = [os.path.join(DATA_DIR, f'{ENTRADA}.parquet')]
+        if not os.path.exists(entradas[0]):
+            entradas = [os.path.join(DATA_DIR, f'{ENTRADA}.csv')]
+    salidas = [f"{args.salida}.{formato.strip()}" for formato in args.formatos.split(',')]
+
+    start_time = time.time()
+    leidas, escritas = limpiar_productos(entradas, salidas, args.lote, args.vistas, args.procesos)
+
+    # Mostramos el número de filas antes y después de eliminar duplicados
+    print(f"Número de filas antes de eliminar duplicados: {leidas}")
+    print(f"Número de filas después de eliminar duplicados: {escritas}")
+    print(f"Se eliminaron {leidas - escritas} filas duplicadas.")
+    if args.tabla_tallas:
+        tabla_tallas().to_csv(args.tabla_tallas, index=False)
+    print(f"Datos limpios guardados en {', '.join(salidas)} ({time.time() - start_time:.2f} segundos)")
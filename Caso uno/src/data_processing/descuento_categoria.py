@@ -2,10 +2,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 import seaborn as sns
-from sqlalchemy import create_engine
+import os
+import sys
 
-# Creamos una conexión a la base de datos MySQL
-engine = create_engine('mysql+pymysql://root:''@localhost/data_lab')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Realizamos la consulta para obtener precios, categorías y descuentos
 query = """
@@ -16,7 +20,7 @@ JOIN categorias_principales ca ON ca.categoria_id = p.categoria_id
 df_productos = pd.read_sql(query, engine)
 
 # Cerramos el motor de conexión
-engine.dispose()
+cerrar_engine()
 
 # Imprimimos el DataFrame con las columnas relevantes (opcional)
 print(df_productos[['nombre_categoria', 'precio', 'descuento']].head())
@@ -1,10 +1,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sqlalchemy import create_engine
+import os
+import sys
 
-# Creamos la conexión a la base de datos MySQL usando SQLAlchemy
-engine = create_engine('mysql+pymysql://root:''@localhost/data_lab')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Realizamos la consulta para obtener la cantidad de productos por color
 # Agrupamos los productos según su color y contamos cuántos productos tienen cada color
@@ -18,7 +22,7 @@ SELECT c.nombre, COUNT(p.producto_id) as cantidad
 df_colores = pd.read_sql(query, engine)
 
 # Cerramos la conexión a la base de datos para liberar recursos
-engine.dispose()
+cerrar_engine()
 
 # Mostramos solo los 10 colores más frecuentes en los productos
 top_n = 10
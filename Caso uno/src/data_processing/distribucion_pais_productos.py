@@ -1,31 +1,48 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sqlalchemy import create_engine
-import ast  # Para convertir strings en formato de diccionario
-
-# Creamos la conexión a la base de datos MySQL usando SQLAlchemy
-engine = create_engine('mysql+pymysql://root:''@localhost/data_lab')
-
-# Realizamos la consulta para obtener la columna 'detalles' de la tabla 'productos'
-# La columna 'detalles' contiene información adicional en formato de string
-query = "SELECT detalles FROM productos"
-df_detalles = pd.read_sql(query, engine)
-
-# Cerramos la conexión a la base de datos para liberar recursos
-engine.dispose()
-
-# Función para extraer el 'País de Origen' de la columna 'detalles'
-# Esta función convierte el string de la columna en un diccionario y extrae el país
-def obtener_pais_origen(detalles):
-    try:
-        detalles_dict = ast.literal_eval(detalles)  # Convertir el string a diccionario
-        return detalles_dict.get('País de Origen', 'Desconocido')  # Extraer el país de origen
-    except (ValueError, SyntaxError):  # Manejar errores en la conversión del string a diccionario
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from product_dataset import read_products
+from repr_decoder import decode_dict_column
+from conexion import cerrar_engine, obtener_engine
+
+# Origen de los productos: por defecto la base de datos; con --archivo, el conjunto Parquet de productos limpios
+# que escribe delete_duplicate.py
+parser = argparse.ArgumentParser(description="Top 3 de países de origen de los productos")
+parser.add_argument("--archivo", help="Parquet de productos limpios que se lee en lugar de la base de datos")
+args = parser.parse_args()
+
+if args.archivo:
+    # Leemos solo la columna de detalles, que en Parquet ya viene como diccionario
+    df_detalles = read_products(args.archivo, columns=['Detalles del Producto'])
+    df_detalles = df_detalles.rename(columns={'Detalles del Producto': 'detalles'})
+else:
+    # Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+    engine = obtener_engine()
+
+    # Realizamos la consulta para obtener la columna 'detalles' de la tabla 'productos'
+    # La columna 'detalles' contiene información adicional en formato de string
+    query = "SELECT detalles FROM productos"
+    df_detalles = pd.read_sql(query, engine)
+
+    # Cerramos la conexión a la base de datos para liberar recursos
+    cerrar_engine()
+
+# Función para extraer el 'País de Origen' del diccionario de detalles de un producto
+# Las celdas vacías o mal formadas llegan como None
+def obtener_pais_origen(detalles_dict):
+    if detalles_dict is None:
         return 'Desconocido'
+    return detalles_dict.get('País de Origen', 'Desconocido')  # Extraer el país de origen
 
-# Aplicamos la función 'obtener_pais_origen' a cada fila de la columna 'detalles'
-df_detalles['pais_origen'] = df_detalles['detalles'].apply(obtener_pais_origen)
+# Convertimos toda la columna 'detalles' a diccionarios de una vez (si viene de la base de datos está en texto;
+# las celdas mal formadas se reportan en el log) y extraemos el país de cada fila
+detalles_dicts, _ = decode_dict_column(df_detalles['detalles'])
+df_detalles['pais_origen'] = detalles_dicts.map(obtener_pais_origen)
 
 # Obtenemos el top 3 de países con más productos
 # Utilizamos value_counts() para contar cuántos productos hay por país y nlargest() para seleccionar los 3 principales
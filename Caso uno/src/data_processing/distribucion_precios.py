@@ -1,18 +1,22 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sqlalchemy import create_engine
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
 import numpy as np
 
-# Creamos la conexión a la base de datos MySQL utilizando SQLAlchemy
-engine = create_engine('mysql+pymysql://root:@localhost/data_lab')
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Realizamos la consulta para obtener los precios de los productos
 query = "SELECT precio FROM productos"
 df_precios = pd.read_sql(query, engine)
 
 # Cerramos la conexión a la base de datos después de realizar la consulta
-engine.dispose()
+cerrar_engine()
 
 # Nos aseguramos que los precios son numéricos (para evitar posibles errores con datos no válidos)
 # pd.to_numeric convierte los valores no numéricos en NaN, lo que permite un manejo más fácil de los datos
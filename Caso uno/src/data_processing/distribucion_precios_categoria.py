@@ -2,10 +2,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 import seaborn as sns
-from sqlalchemy import create_engine
+import os
+import sys
 
-# Creamos la conexión a la base de datos MySQL utilizando SQLAlchemy
-engine = create_engine('mysql+pymysql://root:@localhost/data_lab')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Realizamos la consulta para obtener los precios de los productos y los nombres de sus categorías
 query = """
@@ -20,7 +24,7 @@ df_precios = pd.read_sql(query, engine)
 df_precios['precio_formateado'] = df_precios['precio'].apply(lambda x: f'COP {int(x):,}'.replace(",", "."))
 
 # Cerramos la conexión a la base de datos después de realizar la consulta
-engine.dispose()
+cerrar_engine()
 
 # Configuramos el estilo de Seaborn para mejorar la visualización
 sns.set(style="whitegrid")
@@ -1,10 +1,14 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sqlalchemy import create_engine
+import os
+import sys
 
-# Crear una conexión a la base de datos MySQL utilizando SQLAlchemy
-engine = create_engine('mysql+pymysql://root:@localhost/data_lab')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Realizamos la consulta para obtener las categorías y la cantidad de productos por cada una
 # realizamos un JOIN entre las tablas 'productos' y 'categorias_principales' 
@@ -19,7 +23,7 @@ ORDER BY cantidad_productos DESC
 df_categorias = pd.read_sql(query, engine)
 
 # Cerramos la conexión a la base de datos después de la consulta
-engine.dispose()
+cerrar_engine()
 
 # Calcular total de productos
 total_productos = df_categorias['cantidad_productos'].sum()
@@ -0,0 +1,105 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+# Columnas de subcategoría del archivo limpio (Subcategoría_1 ... Subcategoría_7)
+MAX_SUBCATEGORIAS = 7
+# Tallas por letra, de menor a mayor
+TALLAS_LETRA = ('XXXS', 'XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL', 'XXXXL')
+
+# Ceros a la izquierda en números (e.g., '02' -> '2')
+_CEROS = r'\b0+(\d)'
+# Número de talla, con o sin comillas de pulgadas (e.g. '38', '24.5"')
+_NUMERO = re.compile(r'^(\d+(?:\.\d+)?)"?$')
+
+# Tabla de tallas ya normalizadas: talla original -> tallas canónicas. Las tallas distintas son pocas
+# (decenas) aunque haya millones de filas, así que cada una se normaliza una sola vez por proceso.
+_tabla_tallas = {}
+
+# Normaliza un conjunto de tallas originales con operaciones de texto sobre toda la serie:
+# quita ceros a la izquierda y separa los rangos ('10-12' -> '10', '12') y las tallas dobles ('XS/S')
+def _normalizar_unicas(tallas):
+    limpias = tallas.str.replace(_CEROS, r'\1', regex=True)
+    con_guion = limpias.str.contains('-', regex=False)
+    partes = limpias.str.split('/', regex=False)  # Sin '/' queda la talla sola en una lista
+    partes = partes.where(~con_guion, limpias.str.split('-', regex=False))  # El guion tiene prioridad
+    return [tuple(piezas) for piezas in partes]
+
+# Añade a la tabla las tallas que todavía no están
+def _registrar(tallas):
+    nuevas = [talla for talla in pd.unique(tallas) if talla not in _tabla_tallas]
+    if nuevas:
+        _tabla_tallas.update(zip(nuevas, _normalizar_unicas(pd.Series(nuevas, dtype=object))))
+
+# Incorpora una tabla de tallas calculada en otro proceso
+def registrar_tabla(tabla):
+    _tabla_tallas.update(tabla)
+
+def tabla_actual():
+    return dict(_tabla_tallas)
+
+# Vuelve a juntar en una lista por fila los valores de una serie explotada (índice = posición de la fila, en
+# orden); las filas sin valores quedan con una lista vacía. Como explode conserva el orden de las filas, basta
+# con cortar los valores donde empieza cada fila (mucho más rápido que un groupby con agg(list)).
+def _reagrupar(valores, filas):
+    cortes = np.cumsum(np.bincount(valores.index.to_numpy(dtype=np.int64), minlength=filas))[:-1]
+    partes = np.split(valores.to_numpy(dtype=object), cortes)
+    return np.fromiter((parte.tolist() for parte in partes), dtype=object, count=filas)
+
+# Normaliza la columna de tallas (listas por fila): explota las listas, traduce cada talla con la tabla y
+# vuelve a agrupar. Da el mismo resultado que limpiar cada talla de cada fila por separado.
+def normalizar_tallas(tallas):
+    explotadas = tallas.reset_index(drop=True).explode().dropna()
+    _registrar(explotadas)
+    piezas = explotadas.map(_tabla_tallas).explode()
+    return pd.Series(_reagrupar(piezas, len(tallas)), index=tallas.index, name=tallas.name)
+
+# Reparte la columna de subcategorías (listas por fila) en columnas Subcategoría_1 ... en una sola pasada:
+# cada subcategoría va a la columna de su posición en la lista
+def expandir_subcategorias(subcategorias, columnas=MAX_SUBCATEGORIAS):
+    explotadas = subcategorias.reset_index(drop=True).explode()
+    filas = explotadas.index.to_numpy(dtype=np.int64)
+    por_fila = np.bincount(filas, minlength=len(subcategorias))
+    inicios = np.cumsum(por_fila) - por_fila
+    posiciones = np.arange(len(filas)) - inicios[filas]  # Posición de cada subcategoría dentro de su fila
+    valores = explotadas.to_numpy(dtype=object)
+
+    sobrantes = posiciones >= columnas
+    if sobrantes.any():
+        logging.warning(f"{len(np.unique(filas[sobrantes]))} productos con más de {columnas} subcategorías: "
+                        f"se conservan las primeras {columnas}")
+    dentro = ~sobrantes & pd.notna(valores)
+    resultado = np.full((len(subcategorias), columnas), None, dtype=object)
+    resultado[filas[dentro], posiciones[dentro]] = valores[dentro]
+    return pd.DataFrame(resultado, index=subcategorias.index,
+                        columns=[f'Subcategoría_{i+1}' for i in range(columnas)])
+
+# Orden canónico de las tallas: primero las numéricas de menor a mayor, luego las de letra (XXS ... XXXL)
+# y al final las demás (UNICA, medidas como 130X78) en orden alfabético
+def clave_talla(talla):
+    numero = _NUMERO.match(talla)
+    if numero:
+        return (0, float(numero.group(1)), talla)
+    if talla in TALLAS_LETRA:
+        return (1, TALLAS_LETRA.index(talla), talla)
+    return (2, 0, talla)
+
+# Tallas canónicas vistas hasta ahora, en orden canónico
+def tallas_canonicas():
+    return sorted({pieza for piezas in _tabla_tallas.values() for pieza in piezas}, key=clave_talla)
+
+# Tipo category ordenado con las tallas canónicas, para ordenar o comparar tallas en los análisis
+def tipo_tallas():
+    return pd.CategoricalDtype(tallas_canonicas(), ordered=True)
+
+# Tabla de normalización: cada talla original con sus tallas canónicas, en orden canónico
+def tabla_tallas():
+    orden = {talla: posicion for posicion, talla in enumerate(tallas_canonicas())}
+    filas = sorted(_tabla_tallas.items(), key=lambda item: (min(orden[pieza] for pieza in item[1]), item[0]))
+    return pd.DataFrame({
+        'Talla original': [original for original, _ in filas],
+        'Tallas normalizadas': [list(piezas) for _, piezas in filas],
+        'Orden': [min(orden[pieza] for pieza in piezas) for _, piezas in filas],
+    })
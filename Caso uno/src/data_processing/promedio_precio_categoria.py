@@ -2,10 +2,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 import seaborn as sns
-from sqlalchemy import create_engine
+import os
+import sys
 
-# Creamos una conexión a la base de datos MySQL
-engine = create_engine('mysql+pymysql://root:''@localhost/data_lab')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Obtenemos la conexión a la base de datos configurada en common/conexion.py (MySQL por defecto)
+engine = obtener_engine()
 
 # Realizamos la consulta para obtener precios y categorías
 query = """
@@ -16,7 +20,7 @@ JOIN categorias_principales ca ON ca.categoria_id = p.categoria_id
 df_precios = pd.read_sql(query, engine)
 
 # Cerramos el motor de conexión
-engine.dispose()
+cerrar_engine()
 
 # Formateamos los precios en el DataFrame con el formato COP (para visualización)
 df_precios['precio_formateado'] = df_precios['precio'].apply(lambda x: f'COP {int(x):,}'.replace(",", "."))
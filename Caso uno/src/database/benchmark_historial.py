@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from estructura_bd import CategoriaPrincipal, Producto, crear_tablas
+from historial_precios import cambios_descuento, como_decimal, precios_en_fecha, registrar_captura
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import crear_engine
+
+# Historial sintético en una base SQLite temporal: `capturas` crawls diarios de `productos` productos en los que
+# cambia el precio o el descuento de una fracción de ellos. Mide la carga de cada captura y las consultas, y
+# compara las consultas con el historial completo guardado en memoria.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el historial de precios con cientos de capturas")
+    parser.add_argument("--productos", type=int, default=1600, help="Productos por captura")
+    parser.add_argument("--capturas", type=int, default=300, help="Capturas (crawls) que se cargan")
+    parser.add_argument("--cambios", type=float, default=0.05, help="Fracción de productos que cambia en cada captura")
+    args = parser.parse_args()
+
+    random.seed(1)
+    descriptor, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(descriptor)
+    engine = crear_engine(f'sqlite:///{path}')
+    crear_tablas(engine)
+    try:
+        with engine.begin() as conn:
+            conn.execute(CategoriaPrincipal.__table__.insert(), [{'nombre_categoria': 'HOMBRE'}])
+            conn.execute(Producto.__table__.insert(), [{'nombre': f'Producto {i}', 'categoria_id': 1, 'referencia': str(i)}
+                                                       for i in range(args.productos)])
+
+        precios = {str(i): (random.randint(50, 500) * 1000.0, float(random.choice([0, 10, 20, 30])))
+                   for i in range(args.productos)}
+        inicio = datetime(2024, 1, 1)
+        capturas = []  # (fecha, precios) de cada captura, para comprobar las consultas
+        tiempos = []
+        for captura in range(args.capturas):
+            if captura:
+                for referencia in random.sample(list(precios), int(args.productos * args.cambios)):
+                    precio, descuento = precios[referencia]
+                    precios[referencia] = (random.choice([precio, precio * 0.9]), float(random.choice([0, 10, 20, 30])))
+            fecha = inicio + timedelta(days=captura)
+            start_time = time.perf_counter()
+            with engine.begin() as conn:
+                registrar_captura(conn, fecha, dict(precios))
+            tiempos.append(time.perf_counter() - start_time)
+            capturas.append((fecha, dict(precios)))
+
+        with engine.connect() as conn:
+            filas = conn.exec_driver_sql("SELECT COUNT(*) FROM precio_historial").scalar()
+        print(f"{args.capturas} capturas de {args.productos} productos: {filas} filas en el historial "
+              f"(de {args.capturas * args.productos} si se guardara todo)")
+        print(f"Carga de una captura: media {sum(tiempos) / len(tiempos) * 1000:.1f} ms, "
+              f"primera {tiempos[0] * 1000:.1f} ms, última {tiempos[-1] * 1000:.1f} ms")
+
+        fecha, esperados = capturas[len(capturas) // 2]
+        with engine.connect() as conn:
+            start_time = time.perf_counter()
+            resultado = precios_en_fecha(conn, fecha + timedelta(hours=12))
+            segundos = time.perf_counter() - start_time
+        correcto = all((como_decimal(esperados[referencia][0]), como_decimal(esperados[referencia][1])) == (precio, descuento)
+                       for referencia, precio, descuento in zip(resultado['referencia'], resultado['precio'].map(como_decimal),
+                                                                resultado['descuento'].map(como_decimal)))
+        print(f"Precios en una fecha: {segundos * 1000:.1f} ms, {len(resultado)} productos, "
+              f"{'correcto' if correcto and len(resultado) == args.productos else 'DIFERENTE'}")
+
+        (desde, antes), (hasta, despues) = capturas[len(capturas) // 3], capturas[2 * len(capturas) // 3]
+        with engine.connect() as conn:
+            start_time = time.perf_counter()
+            resultado = cambios_descuento(conn, desde, hasta)
+            segundos = time.perf_counter() - start_time
+        esperado = sorted(referencia for referencia in antes if como_decimal(antes[referencia][1]) != como_decimal(despues[referencia][1]))
+        print(f"Cambios de descuento en {(hasta - desde).days} días: {segundos * 1000:.1f} ms, {len(resultado)} productos, "
+              f"{'correcto' if sorted(resultado['referencia']) == esperado else 'DIFERENTE'}")
+    finally:
+        engine.dispose()
+        os.remove(path)
@@ -1,31 +1,40 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DECIMAL, Table
+import os
+import sys
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DECIMAL, DateTime, Index, Table
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import obtener_engine
+
 # Definimos la base para las clases de modelos
 Base = declarative_base()
 
 # Tabla intermedia Producto_Colores para relación muchos-a-muchos
 producto_colores = Table('producto_colores', Base.metadata,
     Column('producto_id', Integer, ForeignKey('productos.producto_id'), primary_key=True),
-    Column('color_id', Integer, ForeignKey('colores.color_id'), primary_key=True)
+    Column('color_id', Integer, ForeignKey('colores.color_id'), primary_key=True),
+    Index('ix_producto_colores_color', 'color_id', 'producto_id')  # Productos de un color (la clave empieza por producto_id)
 )
 
 # Tabla intermedia Producto_Tallas para relación muchos-a-muchos
 producto_tallas = Table('producto_tallas', Base.metadata,
     Column('producto_id', Integer, ForeignKey('productos.producto_id'), primary_key=True),
-    Column('talla_id', Integer, ForeignKey('tallas.talla_id'), primary_key=True)
+    Column('talla_id', Integer, ForeignKey('tallas.talla_id'), primary_key=True),
+    Index('ix_producto_tallas_talla', 'talla_id', 'producto_id')  # Productos de una talla
 )
 
 # Tabla intermedia Producto_Subcategorias para relación muchos-a-muchos
 producto_subcategorias = Table('producto_subcategorias', Base.metadata,
     Column('producto_id', Integer, ForeignKey('productos.producto_id'), primary_key=True),
-    Column('subcategoria_id', Integer, ForeignKey('subcategorias.subcategoria_id'), primary_key=True)
+    Column('subcategoria_id', Integer, ForeignKey('subcategorias.subcategoria_id'), primary_key=True),
+    Index('ix_producto_subcategorias_subcategoria', 'subcategoria_id', 'producto_id')  # Productos de una subcategoría
 )
 
 # Clase que representa la tabla de Categorías Principales
 class CategoriaPrincipal(Base):
     __tablename__ = 'categorias_principales'
+    __table_args__ = (Index('uq_categorias_principales_nombre', 'nombre_categoria', unique=True),)  # Un registro por nombre
     
     categoria_id = Column(Integer, primary_key=True, autoincrement=True)  # ID de la categoría
     nombre_categoria = Column(String(255), nullable=False)  # Nombre de la categoría
@@ -36,6 +45,11 @@ class CategoriaPrincipal(Base):
 # Clase que representa la tabla de Productos
 class Producto(Base):
     __tablename__ = 'productos'
+    __table_args__ = (
+        Index('uq_productos_referencia', 'referencia', unique=True),  # Un producto por referencia
+        # Cubre las consultas por categoría de data_processing (precio y descuento por categoría) sin leer la tabla
+        Index('ix_productos_categoria_precio_descuento', 'categoria_id', 'precio', 'descuento'),
+    )
     
     producto_id = Column(Integer, primary_key=True, autoincrement=True)  # ID del producto
     nombre = Column(String(255), nullable=False)  # Nombre del producto
@@ -47,6 +61,7 @@ class Producto(Base):
     detalles = Column(Text)  # Detalles adicionales del producto
     position = Column(Integer)  # Posición para ordenación
     pagination = Column(Integer)  # Número de página para paginación
+    hash_registro = Column(String(40))  # SHA-1 de los datos cargados del producto, para detectar cambios
 
     # Relaciones
     categoria_principal = relationship("CategoriaPrincipal", back_populates="productos")  # Relación con Categoría
@@ -55,10 +70,12 @@ class Producto(Base):
     subcategorias = relationship("Subcategoria", secondary=producto_subcategorias, back_populates="productos")  # Relación con Subcategorías
     imagenes = relationship("Imagen", back_populates="producto")  # Relación con Imágenes
     recomendaciones = relationship("RecomendacionCuidado", back_populates="producto")  # Relación con Recomendaciones de Cuidado
+    historial = relationship("PrecioHistorial", back_populates="producto")  # Relación con el historial de precios
 
 # Clase que representa la tabla de Colores
 class Color(Base):
     __tablename__ = 'colores'
+    __table_args__ = (Index('uq_colores_nombre', 'nombre', unique=True),)  # Un registro por nombre
     
     color_id = Column(Integer, primary_key=True, autoincrement=True)  # ID del color
     nombre = Column(String(255), nullable=False)  # Nombre del color
@@ -69,6 +86,7 @@ class Color(Base):
 # Clase que representa la tabla de Tallas
 class Talla(Base):
     __tablename__ = 'tallas'
+    __table_args__ = (Index('uq_tallas_nombre', 'nombre', unique=True),)  # Un registro por nombre
     
     talla_id = Column(Integer, primary_key=True, autoincrement=True)  # ID de la talla
     nombre = Column(String(255), nullable=False)  # Nombre de la talla
@@ -79,6 +97,7 @@ class Talla(Base):
 # Clase que representa la tabla de Subcategorías
 class Subcategoria(Base):
     __tablename__ = 'subcategorias'
+    __table_args__ = (Index('uq_subcategorias_nombre', 'nombre', unique=True),)  # Un registro por nombre
     
     subcategoria_id = Column(Integer, primary_key=True, autoincrement=True)  # ID de la subcategoría
     nombre = Column(String(255), nullable=False)  # Nombre de la subcategoría
@@ -89,6 +108,7 @@ class Subcategoria(Base):
 # Clase que representa la tabla de URLs de Imágenes
 class Imagen(Base):
     __tablename__ = 'urls_imagenes'
+    __table_args__ = (Index('ix_urls_imagenes_producto', 'producto_id'),)  # Imágenes de un producto
     
     imagen_id = Column(Integer, primary_key=True, autoincrement=True)  # ID de la imagen
     producto_id = Column(Integer, ForeignKey('productos.producto_id'))  # FK al producto
@@ -100,6 +120,7 @@ class Imagen(Base):
 # Clase que representa la tabla de Recomendaciones de Cuidado
 class RecomendacionCuidado(Base):
     __tablename__ = 'recomendaciones_cuidado'
+    __table_args__ = (Index('ix_recomendaciones_cuidado_producto', 'producto_id'),)  # Recomendaciones de un producto
     
     recomendacion_id = Column(Integer, primary_key=True, autoincrement=True)  # ID de la recomendación
     producto_id = Column(Integer, ForeignKey('productos.producto_id'))  # FK al producto
@@ -108,8 +129,29 @@ class RecomendacionCuidado(Base):
     # Relación uno-a-muchos con Productos
     producto = relationship("Producto", back_populates="recomendaciones")
 
-# Conexión a la base de datos (ajustar el URI de conexión según corresponda)
-engine = create_engine('mysql+pymysql://root:@localhost/data_lab')
+# Clase que representa el historial de precios y descuentos: solo se añaden filas, una por producto y captura
+# (crawl) en la que cambió el precio o el descuento. La clave (producto_id, fecha) sirve para buscar el último
+# valor de cada producto hasta una fecha; el índice por fecha, para las capturas de un período.
+class PrecioHistorial(Base):
+    __tablename__ = 'precio_historial'
+    __table_args__ = (Index('ix_precio_historial_fecha', 'fecha'),)
+
+    producto_id = Column(Integer, ForeignKey('productos.producto_id'), primary_key=True)  # FK al producto
+    fecha = Column(DateTime, primary_key=True)  # Fecha de la captura
+    precio = Column(DECIMAL(10, 2))  # Precio en esa captura
+    descuento = Column(DECIMAL(5, 2))  # Descuento en esa captura
+
+    # Relación uno-a-muchos con Productos
+    producto = relationship("Producto", back_populates="historial")
+
+# Creamos las tablas definidas que falten en la base de datos (por defecto, la configurada en common/conexion.py)
+# y aplicamos a las que ya existían las migraciones pendientes de migraciones.py (que importa este módulo, por eso
+# se importa aquí). Devuelve las versiones aplicadas.
+def crear_tablas(engine=None):
+    from migraciones import migrar
+    engine = engine or obtener_engine()
+    Base.metadata.create_all(engine)
+    return migrar(engine)
 
-# Creamos todas las tablas definidas en la base de datos
-Base.metadata.create_all(engine)
\ No newline at end of file
+if __name__ == "__main__":
+    crear_tablas()
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+from sqlalchemy import and_, bindparam, func, select
+from estructura_bd import PrecioHistorial, Producto
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import cerrar_engine, obtener_engine
+
+# Filas por sentencia al escribir el historial y valores por consulta en los IN
+FILAS_POR_INSERT = 500
+# Formato de las fechas en la línea de comandos (YYYY-MM-DD HH:MM:SS)
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Valor con los decimales de la columna (DECIMAL(10, 2) y DECIMAL(5, 2)), para comparar con lo guardado
+def como_decimal(valor):
+    return None if valor is None else Decimal(str(valor)).quantize(Decimal('0.01'))
+
+# Consulta del último precio y descuento registrados de cada producto hasta una fecha (inclusive, o estrictamente
+# antes con incluida=False; sin fecha, el último de todos), solo de los productos de `productos` si se indica
+# (lista o subconsulta de producto_id).
+# El MAX(fecha) por producto se resuelve con la clave (producto_id, fecha) sin recorrer todas las capturas.
+def consulta_ultimos(fecha=None, productos=None, incluida=True):
+    historial = PrecioHistorial.__table__
+    ultima = select(historial.c.producto_id, func.max(historial.c.fecha).label('fecha')).group_by(historial.c.producto_id)
+    if fecha is not None:
+        ultima = ultima.where(historial.c.fecha <= fecha if incluida else historial.c.fecha < fecha)
+    if productos is not None:
+        ultima = ultima.where(historial.c.producto_id.in_(productos))
+    ultima = ultima.subquery()
+    return select(historial.c.producto_id, historial.c.fecha, historial.c.precio, historial.c.descuento).select_from(
+        historial.join(ultima, and_(historial.c.producto_id == ultima.c.producto_id, historial.c.fecha == ultima.c.fecha)))
+
+# Añade al historial la captura `fecha` de los productos de `precios` (referencia -> (precio, descuento)): solo
+# los productos cuyo precio o descuento cambió respecto a su último registro anterior a `fecha` (o que no tenían
+# ninguno), así que también se pueden cargar capturas atrasadas. Si la captura ya estaba cargada, sus filas se
+# actualizan con los valores nuevos. Como solo se guardan los cambios, una captura atrasada o recargada no corrige
+# las capturas posteriores de un producto que no dejaron fila. Las referencias que no están en productos se
+# ignoran. Devuelve las filas añadidas o actualizadas.
+def registrar_captura(conn, fecha, precios):
+    historial = PrecioHistorial.__table__
+    productos = Producto.__table__
+    ids = {}
+    referencias = list(precios)
+    for inicio in range(0, len(referencias), FILAS_POR_INSERT):
+        consulta = select(productos.c.referencia, productos.c.producto_id).where(
+            productos.c.referencia.in_(referencias[inicio:inicio + FILAS_POR_INSERT]))
+        ids.update(conn.execute(consulta).all())
+    anteriores = {producto_id: (precio, descuento) for producto_id, _, precio, descuento
+                  in conn.execute(consulta_ultimos(fecha, incluida=False))}
+    cargadas = {producto_id: (precio, descuento) for producto_id, precio, descuento in conn.execute(
+        select(historial.c.producto_id, historial.c.precio, historial.c.descuento).where(historial.c.fecha == fecha))}
+
+    filas, cambiadas = [], []
+    for referencia, producto_id in ids.items():
+        valor = tuple(como_decimal(v) for v in precios[referencia])
+        if producto_id in cargadas:
+            if cargadas[producto_id] != valor:
+                cambiadas.append({'id_producto': producto_id, 'precio': valor[0], 'descuento': valor[1]})
+        elif anteriores.get(producto_id) != valor:
+            filas.append({'producto_id': producto_id, 'fecha': fecha, 'precio': valor[0], 'descuento': valor[1]})
+    for inicio in range(0, len(filas), FILAS_POR_INSERT):
+        conn.execute(historial.insert(), filas[inicio:inicio + FILAS_POR_INSERT])
+    if cambiadas:
+        conn.execute(historial.update().where(historial.c.producto_id == bindparam('id_producto'),
+                                              historial.c.fecha == fecha), cambiadas)
+    return len(filas) + len(cambiadas)
+
+# Precio y descuento de cada producto en una fecha (su último registro hasta esa fecha), con su referencia
+def precios_en_fecha(conn, fecha):
+    ultimos = consulta_ultimos(fecha).subquery()
+    productos = Producto.__table__
+    consulta = select(productos.c.referencia, productos.c.nombre, ultimos.c.precio, ultimos.c.descuento,
+                      ultimos.c.fecha).select_from(ultimos.join(productos, productos.c.producto_id == ultimos.c.producto_id))
+    return pd.read_sql(consulta.order_by(productos.c.referencia), conn)
+
+# Productos cuyo descuento cambió entre dos fechas: solo se miran los productos con alguna captura en el período
+# (índice por fecha) y de ellos se compara el descuento vigente en `desde` con el vigente en `hasta`
+def cambios_descuento(conn, desde, hasta):
+    historial = PrecioHistorial.__table__
+    productos = Producto.__table__
+    periodo = select(historial.c.producto_id).where(historial.c.fecha > desde, historial.c.fecha <= hasta).distinct()
+    antes = consulta_ultimos(desde, periodo).subquery()
+    despues = consulta_ultimos(hasta, periodo).subquery()
+    consulta = select(productos.c.referencia, productos.c.nombre, antes.c.descuento.label('descuento_antes'),
+                      despues.c.descuento.label('descuento_despues'), despues.c.fecha).select_from(
+        antes.join(despues, antes.c.producto_id == despues.c.producto_id)
+             .join(productos, productos.c.producto_id == antes.c.producto_id)
+    ).where(antes.c.descuento != despues.c.descuento)
+    return pd.read_sql(consulta.order_by(productos.c.referencia), conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta el historial de precios y descuentos")
+    parser.add_argument("--fecha", help="Precios vigentes en esta fecha (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument("--desde", help="Inicio del período para los cambios de descuento")
+    parser.add_argument("--hasta", help="Fin del período para los cambios de descuento (por defecto, ahora)")
+    args = parser.parse_args()
+
+    with obtener_engine().connect() as conn:
+        if args.fecha:
+            print(precios_en_fecha(conn, datetime.strptime(args.fecha, FORMATO_FECHA)).to_string(index=False))
+        if args.desde:
+            hasta = datetime.strptime(args.hasta, FORMATO_FECHA) if args.hasta else datetime.now()
+            print(cambios_descuento(conn, datetime.strptime(args.desde, FORMATO_FECHA), hasta).to_string(index=False))
+    cerrar_engine()
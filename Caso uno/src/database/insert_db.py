@@ -1,12 +1,28 @@
-import csv
-from sqlalchemy import create_engine
+import argparse
+import hashlib
+import json
+import os
+import sys
+import pandas as pd
+import time
+import unicodedata
+from datetime import datetime
+from sqlalchemy import and_, bindparam, select
 from sqlalchemy.orm import sessionmaker
-from estructura_bd import CategoriaPrincipal, Producto, Subcategoria, Color, Talla, Imagen, RecomendacionCuidado
-import ast  # Usar ast.literal_eval en lugar de eval para mayor seguridad
+from estructura_bd import (CategoriaPrincipal, Producto, Subcategoria, Color, Talla, Imagen, RecomendacionCuidado,
+                           producto_colores, producto_subcategorias, producto_tallas, crear_tablas)
+from historial_precios import FORMATO_FECHA, registrar_captura
 
-# Conexión a la base de datos
-engine = create_engine('mysql+pymysql://root:@localhost/data_lab')
-Session = sessionmaker(bind=engine)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from product_dataset import is_parquet, read_products
+from conexion import cerrar_engine, obtener_engine
+
+# Sesiones del ORM, sobre el engine compartido de conexion.py
+Session = sessionmaker()
+
+# Productos por lote en la carga masiva y filas por sentencia INSERT de varias filas
+LOTE = 1000
+FILAS_POR_INSERT = 500
 
 # Función para procesar el precio desde un string a un float
 def procesar_precio(precio_str):
@@ -20,123 +36,183 @@ def procesar_descuento(descuento_str):
     descuento_str = descuento_str.replace("%", "").strip()
     return float(descuento_str)  # Convertir a decimal
 
-# Función para insertar los datos desde el archivo CSV
-def insertar_datos_csv(csv_file):
-    session = Session()  # Iniciar sesión
+# Grupos de casi duplicados de data_processing/casi_duplicados.py: referencia -> representante de su grupo
+def leer_representantes(archivo):
+    if is_parquet(archivo):
+        grupos = pd.read_parquet(archivo, columns=['Referencia', 'Representante'])
+    else:
+        grupos = pd.read_csv(archivo, usecols=['Referencia', 'Representante'], dtype=str)
+    return dict(zip(grupos['Referencia'], grupos['Representante']))
+
+# Lista de una columna de listas (None si la celda está vacía)
+def como_lista(valor):
+    return list(valor) if valor is not None else []
+
+# Lee el archivo de productos limpios con las celdas vacías como None. Con `duplicados` (los grupos de
+# casi_duplicados.py) solo se conserva el representante de cada grupo de casi duplicados: los grupos se forman
+# alrededor del representante, así que todos los demás superan el umbral de similitud con él y se omiten todos.
+def leer_productos(archivo, duplicados=None):
+    # Leer el archivo: en Parquet las listas y los detalles ya vienen con su tipo
+    df = read_products(archivo)
+    df = df.astype(object).where(df.notna(), None)  # Celdas vacías como None
+
+    if duplicados:
+        representantes = leer_representantes(duplicados)
+        omitir = df['Referencia'].map(lambda referencia: representantes.get(referencia, referencia) != referencia)
+        df = df[~omitir]
+        print(f"Se omitirán {int(omitir.sum())} casi duplicados (grupos de {duplicados}).")
+
+    # Imprimir las columnas para depuración (opcional)
+    print("Columnas del archivo:", list(df.columns))
+    return df
+
+# Fecha de la captura que se carga: la indicada o, si no, la de modificación del archivo (cuando terminó el crawl)
+def fecha_captura(archivo, fecha=None):
+    return fecha or datetime.fromtimestamp(os.path.getmtime(archivo)).replace(microsecond=0)
+
+# Añade al historial de precios la captura del archivo (la primera fila de cada referencia)
+def registrar_historial(conn, filas, fecha):
+    precios = {}
+    for row in filas:
+        precios.setdefault(row['Referencia'], (procesar_precio(row['Precio']), procesar_descuento(row['Descuento'])))
+    print(f"Historial de precios: {registrar_captura(conn, fecha, precios)} cambios en la captura del {fecha}.")
+
+# Subcategorías de una fila (columnas Subcategoría_1 a Subcategoría_7), sin las vacías
+def subcategorias_fila(row):
+    return [row.get(f'Subcategoría_{i}') for i in range(1, 8) if row.get(f'Subcategoría_{i}')]
+
+# Columnas de la tabla productos para una fila del archivo (sin la categoría, que depende de la carga)
+def columnas_producto(row):
+    return {
+        'nombre': row['Nombre del Producto'],
+        'referencia': row['Referencia'],
+        'precio': procesar_precio(row['Precio']),
+        'descuento': procesar_descuento(row['Descuento']),
+        'descripcion': row['Descripción del Producto'],
+        'detalles': str(row['Detalles del Producto']) if row['Detalles del Producto'] is not None else '',  # Como texto, igual que en el CSV
+        'position': int(row['Position']),
+        'pagination': int(row['Pagination']),
+        'hash_registro': hash_registro(row),
+    }
+
+# Hash de todo lo que se carga de un producto (columnas, categoría, relaciones, imágenes y recomendaciones),
+# para saber en una carga incremental si el producto cambió sin compararlo columna por columna
+def hash_registro(row):
+    registro = {
+        'nombre': row['Nombre del Producto'],
+        'categoria': row['Categoría Principal'],
+        'precio': procesar_precio(row['Precio']),
+        'descuento': procesar_descuento(row['Descuento']),
+        'descripcion': row['Descripción del Producto'],
+        'detalles': str(row['Detalles del Producto']) if row['Detalles del Producto'] is not None else '',
+        'position': int(row['Position']),
+        'pagination': int(row['Pagination']),
+        'subcategorias': sorted(set(subcategorias_fila(row))),
+        'colores': sorted(set(como_lista(row['Colores Disponibles']))),
+        'tallas': sorted(set(como_lista(row['Tallas Disponibles']))),
+        'imagenes': como_lista(row['URLs de Imágenes']),
+        'recomendaciones': como_lista(row['Recomendaciones de Cuidado']),
+    }
+    return hashlib.sha1(json.dumps(registro, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+# Función para insertar los datos desde el archivo Parquet (o CSV) de productos limpios, fila por fila con el ORM
+def insertar_datos(archivo, duplicados=None, fecha=None):
+    session = Session(bind=obtener_engine())  # Iniciar sesión
     try:
-        # Abrir el archivo CSV
-        with open(csv_file, newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)  # Leer el archivo como un diccionario
+        fecha = fecha_captura(archivo, fecha)
+        df = leer_productos(archivo, duplicados)
+
+        # Procesar cada fila del archivo
+        for row in df.to_dict('records'):
+            # Verificar o insertar la Categoría Principal
+            categoria_nombre = row['Categoría Principal']
+            categoria_principal = session.query(CategoriaPrincipal).filter_by(nombre_categoria=categoria_nombre).first()
+            if not categoria_principal:
+                categoria_principal = CategoriaPrincipal(nombre_categoria=categoria_nombre)
+                session.add(categoria_principal)
+                session.flush()  # Asegurar que se cree el ID para la relación del producto
+            
+            # Procesar subcategorías (Subcategoría_1 a Subcategoría_7, solo las no vacías)
+            subcategorias = subcategorias_fila(row)
+            
+            subcategoria_objs = []
+            unique_subcategorias = set(subcategorias)  # Usar un conjunto para evitar duplicados
             
-            # Limpiar los encabezados para eliminar los espacios extra
-            reader.fieldnames = [field.strip() for field in reader.fieldnames]
+            for subcat in unique_subcategorias:
+                subcategoria = session.query(Subcategoria).filter_by(nombre=subcat).first()
+                if not subcategoria:
+                    subcategoria = Subcategoria(nombre=subcat)
+                    session.add(subcategoria)
+                    session.flush()  # Asegurar que se cree el ID
+                subcategoria_objs.append(subcategoria)
             
-            # Imprimir los encabezados para depuración (opcional)
-            print("Encabezados del archivo CSV:", reader.fieldnames)
-
-            # Procesar cada fila en el archivo CSV
-            for row in reader:
-                # Verificar o insertar la Categoría Principal
-                categoria_nombre = row['Categoría Principal']
-                categoria_principal = session.query(CategoriaPrincipal).filter_by(nombre_categoria=categoria_nombre).first()
-                if not categoria_principal:
-                    categoria_principal = CategoriaPrincipal(nombre_categoria=categoria_nombre)
-                    session.add(categoria_principal)
-                    session.flush()  # Asegurar que se cree el ID para la relación del producto
-                
-                # Procesar subcategorías
-                subcategorias = []
-                for i in range(1, 8):  # Recorremos las columnas de subcategorías (Subcategoría_1 a Subcategoría_7)
-                    subcategoria = row.get(f'Subcategoría_{i}')
-                    if subcategoria:  # Solo agregar si la subcategoría no es vacía
-                        subcategorias.append(subcategoria)
-                
-                subcategoria_objs = []
-                unique_subcategorias = set(subcategorias)  # Usar un conjunto para evitar duplicados
-                
-                for subcat in unique_subcategorias:
-                    subcategoria = session.query(Subcategoria).filter_by(nombre=subcat).first()
-                    if not subcategoria:
-                        subcategoria = Subcategoria(nombre=subcat)
-                        session.add(subcategoria)
-                        session.flush()  # Asegurar que se cree el ID
-                    subcategoria_objs.append(subcategoria)
-                
-                # Procesar colores
-                colores = ast.literal_eval(row['Colores Disponibles']) if row['Colores Disponibles'] else []  # Usar ast.literal_eval
-                color_objs = []
-                unique_colores = set(colores)  # Usar un conjunto para evitar duplicados
-                
-                for color in unique_colores:
-                    color_obj = session.query(Color).filter_by(nombre=color).first()
-                    if not color_obj:
-                        color_obj = Color(nombre=color)
-                        session.add(color_obj)
-                        session.flush()  # Asegurar que se cree el ID
-                    color_objs.append(color_obj)
-                
-                # Procesar tallas
-                tallas = ast.literal_eval(row['Tallas Disponibles']) if row['Tallas Disponibles'] else []  # Usar ast.literal_eval
-                talla_objs = []
-                unique_tallas = set(tallas)  # Usar un conjunto para evitar duplicados
-                
-                for talla in unique_tallas:
-                    talla_obj = session.query(Talla).filter_by(nombre=talla).first()
-                    if not talla_obj:
-                        talla_obj = Talla(nombre=talla)
-                        session.add(talla_obj)
-                        session.flush()  # Asegurar que se cree el ID
-                    talla_objs.append(talla_obj)
-                
-                # Verificar si el producto ya existe por referencia
-                existing_product = session.query(Producto).filter_by(referencia=row['Referencia']).first()
-                if existing_product:
-                    print(f"El producto con la referencia {row['Referencia']} ya existe. Se omitirá la inserción.")
-                    continue  # O puedes usar 'break' si deseas detener todo el proceso
-                
-                # Crear el producto
-                producto = Producto(
-                    nombre=row['Nombre del Producto'],
-                    categoria_principal=categoria_principal,
-                    referencia=row['Referencia'],
-                    precio=procesar_precio(row['Precio']),
-                    descuento=procesar_descuento(row['Descuento']),
-                    descripcion=row['Descripción del Producto'],
-                    detalles=row['Detalles del Producto'],
-                    position=int(row['Position']),
-                    pagination=int(row['Pagination'])
-                )
-                session.add(producto)
-                session.flush()  # Asegurar que el producto obtenga un ID para las relaciones
-                
-                # Relacionar subcategorías, colores y tallas
-                for subcategoria in subcategoria_objs:
-                    if subcategoria not in producto.subcategorias:
-                        producto.subcategorias.append(subcategoria)
-                
-                for color in color_objs:
-                    if color not in producto.colores:
-                        producto.colores.append(color)
-                
-                for talla in talla_objs:
-                    if talla not in producto.tallas:
-                        producto.tallas.append(talla)
-                
-                # Procesar URLs de imágenes
-                imagenes = ast.literal_eval(row['URLs de Imágenes']) if row['URLs de Imágenes'] else []  # Usar ast.literal_eval
-                for url in imagenes:
-                    imagen = Imagen(producto_id=producto.producto_id, url=url)
-                    session.add(imagen)
-                
-                # Procesar recomendaciones de cuidado
-                recomendaciones = ast.literal_eval(row['Recomendaciones de Cuidado']) if row['Recomendaciones de Cuidado'] else []  # Usar ast.literal_eval
-                for recomendacion in recomendaciones:
-                    recomendacion_obj = RecomendacionCuidado(producto_id=producto.producto_id, recomendacion=recomendacion)
-                    session.add(recomendacion_obj)
+            # Procesar colores
+            colores = como_lista(row['Colores Disponibles'])
+            color_objs = []
+            unique_colores = set(colores)  # Usar un conjunto para evitar duplicados
             
-            # Hacer commit de todos los cambios
-            session.commit()
-            print("Datos insertados correctamente.")
+            for color in unique_colores:
+                color_obj = session.query(Color).filter_by(nombre=color).first()
+                if not color_obj:
+                    color_obj = Color(nombre=color)
+                    session.add(color_obj)
+                    session.flush()  # Asegurar que se cree el ID
+                color_objs.append(color_obj)
+            
+            # Procesar tallas
+            tallas = como_lista(row['Tallas Disponibles'])
+            talla_objs = []
+            unique_tallas = set(tallas)  # Usar un conjunto para evitar duplicados
+            
+            for talla in unique_tallas:
+                talla_obj = session.query(Talla).filter_by(nombre=talla).first()
+                if not talla_obj:
+                    talla_obj = Talla(nombre=talla)
+                    session.add(talla_obj)
+                    session.flush()  # Asegurar que se cree el ID
+                talla_objs.append(talla_obj)
+            
+            # Verificar si el producto ya existe por referencia
+            existing_product = session.query(Producto).filter_by(referencia=row['Referencia']).first()
+            if existing_product:
+                print(f"El producto con la referencia {row['Referencia']} ya existe. Se omitirá la inserción.")
+                continue  # O puedes usar 'break' si deseas detener todo el proceso
+            
+            # Crear el producto
+            producto = Producto(categoria_principal=categoria_principal, **columnas_producto(row))
+            session.add(producto)
+            session.flush()  # Asegurar que el producto obtenga un ID para las relaciones
+            
+            # Relacionar subcategorías, colores y tallas
+            for subcategoria in subcategoria_objs:
+                if subcategoria not in producto.subcategorias:
+                    producto.subcategorias.append(subcategoria)
+            
+            for color in color_objs:
+                if color not in producto.colores:
+                    producto.colores.append(color)
+            
+            for talla in talla_objs:
+                if talla not in producto.tallas:
+                    producto.tallas.append(talla)
+            
+            # Procesar URLs de imágenes
+            imagenes = como_lista(row['URLs de Imágenes'])
+            for url in imagenes:
+                imagen = Imagen(producto_id=producto.producto_id, url=url)
+                session.add(imagen)
+            
+            # Procesar recomendaciones de cuidado
+            recomendaciones = como_lista(row['Recomendaciones de Cuidado'])
+            for recomendacion in recomendaciones:
+                recomendacion_obj = RecomendacionCuidado(producto_id=producto.producto_id, recomendacion=recomendacion)
+                session.add(recomendacion_obj)
+        
+        # Registrar la captura en el historial de precios y hacer commit de todos los cambios
+        session.flush()
+        registrar_historial(session.connection(), df.to_dict('records'), fecha)
+        session.commit()
+        print("Datos insertados correctamente.")
     
     except Exception as e:
         session.rollback()  # Revertir cambios en caso de error
@@ -145,5 +221,264 @@ def insertar_datos_csv(csv_file):
     finally:
         session.close()  # Asegurar que la sesión se cierra
 
-# Ejecutar la inserción de datos desde el CSV
-insertar_datos_csv('C:/Users/johan/Desktop/Data/Caso uno/data/productos_scrapeados_v3_limpios.csv')
\ No newline at end of file
+# Tabla de dimensión (categorías, subcategorías, colores o tallas) precargada en memoria: nombre -> id.
+# Los nombres nuevos se juntan y se insertan de una vez por lote; luego se leen sus ids.
+# Las colaciones _ci de MySQL comparan los nombres de las claves únicas sin distinguir mayúsculas ni tildes, así que
+# 'Algodón' y 'ALGODON' son el mismo registro: la caché se indexa por el nombre normalizado (clave_nombre) y se crea
+# con la primera grafía vista. Los nombres se insertan ignorando los repetidos, así que si la colación iguala dos
+# nombres que clave_nombre no iguala, decide la base y se usa el id que ya tenía.
+class Dimension:
+    def __init__(self, conn, modelo, columna):
+        self.tabla = modelo.__table__
+        self.columna = self.tabla.c[columna]
+        self.id = self.tabla.primary_key.columns[0]
+        self.ids = {}
+        self.nuevos = {}
+        self._cargar(conn, select(self.id, self.columna))
+
+    # Como filter_by(...).first(): si un nombre está repetido se usa el id más bajo
+    def _cargar(self, conn, consulta):
+        for id_, nombre in conn.execute(consulta.order_by(self.id)):
+            self.ids.setdefault(clave_nombre(nombre), id_)
+
+    # Registra un nombre; los que no existen se crean en el siguiente `resolver`, en el orden en que se pidieron
+    def pedir(self, nombre):
+        clave = clave_nombre(nombre)
+        if clave not in self.ids:
+            self.nuevos.setdefault(clave, nombre)
+
+    def resolver(self, conn):
+        if not self.nuevos:
+            return
+        nuevos = list(self.nuevos.values())
+        insertar_filas(conn, self.tabla, [{self.columna.name: nombre} for nombre in nuevos], ignorar_repetidos=True)
+        for inicio in range(0, len(nuevos), FILAS_POR_INSERT):
+            self._cargar(conn, select(self.id, self.columna).where(self.columna.in_(nuevos[inicio:inicio + FILAS_POR_INSERT])))
+        # Nombres que la base igualó a uno ya guardado con otra clave: se busca el id con su propia comparación
+        for clave, nombre in self.nuevos.items():
+            if clave not in self.ids:
+                self.ids[clave] = conn.execute(select(self.id).where(self.columna == nombre).order_by(self.id)).scalars().first()
+        self.nuevos = {}
+
+    def __getitem__(self, nombre):
+        return self.ids[clave_nombre(nombre)]
+
+# Nombre de una dimensión como lo comparan las claves únicas de MySQL (colación _ci con PAD SPACE): sin mayúsculas,
+# sin tildes ni otras marcas (NFKD sin los caracteres combinantes) y sin los espacios finales; los iniciales cuentan
+def clave_nombre(nombre):
+    descompuesto = unicodedata.normalize('NFKD', nombre.casefold())
+    return ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter)).rstrip(' ')
+
+# INSERT de varias filas: la sentencia se compila una vez y se ejecuta con la lista de filas (executemany; pymysql
+# la envía como INSERT ... VALUES (...), (...) de varias filas). Con `ignorar_repetidos`, las filas que chocan con
+# una clave única se descartan (INSERT IGNORE en MySQL, INSERT OR IGNORE en SQLite y DuckDB)
+def insertar_filas(conn, tabla, filas, ignorar_repetidos=False):
+    sentencia = tabla.insert()
+    if ignorar_repetidos:
+        sentencia = (sentencia.prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+                     .prefix_with('OR IGNORE', dialect='duckdb'))
+    for inicio in range(0, len(filas), FILAS_POR_INSERT):
+        conn.execute(sentencia, filas[inicio:inicio + FILAS_POR_INSERT])
+
+# Ejecuta una consulta por partes de una lista de valores (para los IN con muchos valores)
+def por_partes(conn, consulta, valores):
+    for inicio in range(0, len(valores), FILAS_POR_INSERT):
+        yield from conn.execute(consulta(valores[inicio:inicio + FILAS_POR_INSERT]))
+
+# Relaciones muchos-a-muchos: tabla intermedia, columna del id de la dimensión y posición en la fila preparada
+RELACIONES = ((producto_subcategorias, 'subcategoria_id', 1), (producto_colores, 'color_id', 2),
+              (producto_tallas, 'talla_id', 3))
+# Tablas hijas: modelo, columna y columna del archivo
+HIJAS = ((Imagen, 'url', 'URLs de Imágenes'), (RecomendacionCuidado, 'recomendacion', 'Recomendaciones de Cuidado'))
+
+# Carga por lotes con Core dentro de una transacción: dimensiones precargadas y productos, relaciones e hijas
+# escritos con INSERT de varias filas
+class Cargador:
+    def __init__(self, conn):
+        self.conn = conn
+        self.categorias = Dimension(conn, CategoriaPrincipal, 'nombre_categoria')
+        self.dimensiones = (None, Dimension(conn, Subcategoria, 'nombre'), Dimension(conn, Color, 'nombre'),
+                            Dimension(conn, Talla, 'nombre'))
+        self.productos = Producto.__table__
+
+    # Prepara un lote: (row, fila) con fila = (categoría, subcategorías, colores, tallas) sin repetidos y en el
+    # mismo orden que insertar_datos, para que los ids nuevos coincidan; las dimensiones nuevas quedan creadas
+    def preparar(self, filas):
+        preparadas = []
+        for row in filas:
+            fila = (row['Categoría Principal'], list(set(subcategorias_fila(row))),
+                    list(set(como_lista(row['Colores Disponibles']))), list(set(como_lista(row['Tallas Disponibles']))))
+            self.categorias.pedir(fila[0])
+            for dimension, valores in zip(self.dimensiones[1:], fila[1:]):
+                for valor in valores:
+                    dimension.pedir(valor)
+            preparadas.append((row, fila))
+        for dimension in (self.categorias,) + self.dimensiones[1:]:
+            dimension.resolver(self.conn)
+        return preparadas
+
+    def _columnas(self, row, fila):
+        return dict(columnas_producto(row), categoria_id=self.categorias[fila[0]])
+
+    # Ids de las dimensiones de una relación para una fila preparada, sin repetidos
+    def _ids(self, fila, posicion):
+        return list(dict.fromkeys(self.dimensiones[posicion][valor] for valor in fila[posicion]))
+
+    # Inserta productos nuevos con sus relaciones e hijas; devuelve referencia -> producto_id
+    def insertar(self, nuevos):
+        insertar_filas(self.conn, self.productos, [self._columnas(row, fila) for row, fila in nuevos])
+        ids = self.ids_productos([row['Referencia'] for row, _ in nuevos])
+
+        for tabla, columna, posicion in RELACIONES:
+            insertar_filas(self.conn, tabla, [{'producto_id': ids[row['Referencia']], columna: dimension_id}
+                                              for row, fila in nuevos for dimension_id in self._ids(fila, posicion)])
+        for modelo, columna, origen in HIJAS:
+            insertar_filas(self.conn, modelo.__table__, [{'producto_id': ids[row['Referencia']], columna: valor}
+                                                         for row, _ in nuevos for valor in como_lista(row[origen])])
+        return ids
+
+    def ids_productos(self, referencias):
+        productos = self.productos
+        consulta = lambda parte: select(productos.c.producto_id, productos.c.referencia).where(productos.c.referencia.in_(parte))
+        return {referencia: producto_id for producto_id, referencia in por_partes(self.conn, consulta, referencias)}
+
+    # Actualiza productos que cambiaron (producto_id, row, fila): sus columnas, las relaciones muchos-a-muchos por
+    # diferencia de conjuntos y las hijas (imágenes, recomendaciones) solo si su lista cambió
+    def actualizar(self, cambiados):
+        productos = self.productos
+        self.conn.execute(productos.update().where(productos.c.producto_id == bindparam('id_producto')),
+                          [dict(self._columnas(row, fila), id_producto=producto_id) for producto_id, row, fila in cambiados])
+        ids = [producto_id for producto_id, _, _ in cambiados]
+
+        for tabla, columna, posicion in RELACIONES:
+            consulta = lambda parte: select(tabla.c.producto_id, tabla.c[columna]).where(tabla.c.producto_id.in_(parte))
+            actuales = set(por_partes(self.conn, consulta, ids))
+            deseadas = {(producto_id, dimension_id) for producto_id, _, fila in cambiados
+                        for dimension_id in self._ids(fila, posicion)}
+            sobrantes = [{'p': producto_id, 'd': dimension_id} for producto_id, dimension_id in actuales - deseadas]
+            if sobrantes:
+                self.conn.execute(tabla.delete().where(and_(tabla.c.producto_id == bindparam('p'),
+                                                            tabla.c[columna] == bindparam('d'))), sobrantes)
+            insertar_filas(self.conn, tabla, [{'producto_id': producto_id, columna: dimension_id}
+                                              for producto_id, dimension_id in sorted(deseadas - actuales)])
+
+        for modelo, columna, origen in HIJAS:
+            tabla = modelo.__table__
+            consulta = lambda parte: select(tabla.c.producto_id, tabla.c[columna]).where(
+                tabla.c.producto_id.in_(parte)).order_by(tabla.primary_key.columns[0])
+            actuales = {}
+            for producto_id, valor in por_partes(self.conn, consulta, ids):
+                actuales.setdefault(producto_id, []).append(valor)
+            distintos = [(producto_id, como_lista(row[origen])) for producto_id, row, _ in cambiados
+                         if actuales.get(producto_id, []) != como_lista(row[origen])]
+            if distintos:
+                for inicio in range(0, len(distintos), FILAS_POR_INSERT):
+                    parte = [producto_id for producto_id, _ in distintos[inicio:inicio + FILAS_POR_INSERT]]
+                    self.conn.execute(tabla.delete().where(tabla.c.producto_id.in_(parte)))
+                insertar_filas(self.conn, tabla, [{'producto_id': producto_id, columna: valor}
+                                                  for producto_id, valores in distintos for valor in valores])
+
+# Carga masiva: precarga las dimensiones y las referencias existentes, y por cada lote de productos crea las
+# dimensiones nuevas, los productos, las relaciones muchos-a-muchos, las imágenes y las recomendaciones con
+# INSERT de varias filas. Da la misma base que insertar_datos (mismos ids, en el mismo orden) con unas pocas
+# consultas por lote en vez de varias por fila.
+def insertar_datos_masivo(archivo, duplicados=None, lote=LOTE, fecha=None):
+    try:
+        fecha = fecha_captura(archivo, fecha)
+        df = leer_productos(archivo, duplicados)
+        filas = df.to_dict('records')
+
+        with obtener_engine().begin() as conn:  # Una sola transacción, como el commit final de insertar_datos
+            cargador = Cargador(conn)
+            referencias = {referencia for referencia, in conn.execute(select(Producto.__table__.c.referencia))}
+
+            for inicio in range(0, len(filas), lote):
+                # Productos nuevos (las referencias ya cargadas, o repetidas en el archivo, se omiten)
+                nuevos = []
+                for row, fila in cargador.preparar(filas[inicio:inicio + lote]):
+                    if row['Referencia'] in referencias:
+                        print(f"El producto con la referencia {row['Referencia']} ya existe. Se omitirá la inserción.")
+                        continue
+                    referencias.add(row['Referencia'])
+                    nuevos.append((row, fila))
+                if nuevos:
+                    cargador.insertar(nuevos)
+
+            registrar_historial(conn, filas, fecha)
+
+        print("Datos insertados correctamente.")
+
+    except Exception as e:
+        print(f"Error al insertar datos: {e}")  # La transacción se revierte al salir del bloque con error
+
+# Carga incremental (upsert): inserta los productos nuevos y actualiza los que ya existen solo si su hash
+# (hash_registro) cambió, p. ej. por un nuevo precio o descuento; los que no cambiaron no se tocan
+def actualizar_datos(archivo, duplicados=None, lote=LOTE, fecha=None):
+    try:
+        fecha = fecha_captura(archivo, fecha)
+        df = leer_productos(archivo, duplicados)
+        filas = df.to_dict('records')
+        nuevos_total = actualizados = sin_cambios = 0
+
+        with obtener_engine().begin() as conn:
+            cargador = Cargador(conn)
+            productos = Producto.__table__
+            existentes = {referencia: (producto_id, hash_actual) for producto_id, referencia, hash_actual in
+                          conn.execute(select(productos.c.producto_id, productos.c.referencia, productos.c.hash_registro))}
+            vistas = set()
+
+            for inicio in range(0, len(filas), lote):
+                nuevos, cambiados = [], []
+                for row, fila in cargador.preparar(filas[inicio:inicio + lote]):
+                    if row['Referencia'] in vistas:
+                        continue  # Repetida en el archivo: vale la primera
+                    vistas.add(row['Referencia'])
+                    if row['Referencia'] not in existentes:
+                        nuevos.append((row, fila))
+                    elif existentes[row['Referencia']][1] != hash_registro(row):
+                        cambiados.append((existentes[row['Referencia']][0], row, fila))
+                    else:
+                        sin_cambios += 1
+                if nuevos:
+                    cargador.insertar(nuevos)
+                if cambiados:
+                    cargador.actualizar(cambiados)
+                nuevos_total += len(nuevos)
+                actualizados += len(cambiados)
+
+            registrar_historial(conn, filas, fecha)
+
+        print(f"Datos actualizados correctamente: {nuevos_total} nuevos, {actualizados} actualizados, "
+              f"{sin_cambios} sin cambios.")
+
+    except Exception as e:
+        print(f"Error al actualizar datos: {e}")  # La transacción se revierte al salir del bloque con error
+
+# Ejecutar la inserción de datos desde el conjunto Parquet
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inserta los productos limpios en la base de datos")
+    parser.add_argument("--archivo", default='C:/Users/johan/Desktop/Data/Caso uno/data/productos_scrapeados_v3_limpios.parquet',
+                        help="Parquet (o CSV) de productos limpios")
+    parser.add_argument("--duplicados", help="Grupos de casi duplicados (casi_duplicados.py); solo se inserta el representante de cada grupo, con el que todos los demás superan el umbral")
+    parser.add_argument("--modo", choices=['masivo', 'upsert', 'fila'], default='masivo',
+                        help="masivo: INSERT de varias filas por lote; upsert: inserta los nuevos y actualiza los que "
+                             "cambiaron; fila: una fila a la vez con el ORM")
+    parser.add_argument("--lote", type=int, default=LOTE, help="Productos por lote en los modos masivo y upsert")
+    parser.add_argument("--fecha", help="Fecha de la captura para el historial de precios (YYYY-MM-DD HH:MM:SS); "
+                                        "por defecto, la de modificación del archivo")
+    args = parser.parse_args()
+    fecha = datetime.strptime(args.fecha, FORMATO_FECHA) if args.fecha else None
+
+    start_time = time.time()
+    # Las tablas que faltan se crean ya al día; las que existen se migran (hash_registro, claves únicas, índices)
+    aplicadas = crear_tablas()
+    if aplicadas:
+        print(f"Migraciones aplicadas: {aplicadas}")
+    if args.modo == 'masivo':
+        insertar_datos_masivo(args.archivo, args.duplicados, args.lote, fecha)
+    elif args.modo == 'upsert':
+        actualizar_datos(args.archivo, args.duplicados, args.lote, fecha)
+    else:
+        insertar_datos(args.archivo, args.duplicados, fecha)
+    cerrar_engine()
+    print(f"Carga terminada en {time.time() - start_time:.2f} segundos")
\ No newline at end of file
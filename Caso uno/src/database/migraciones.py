@@ -0,0 +1,118 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text
+from estructura_bd import Base, PrecioHistorial, Producto
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import crear_engine
+
+# Migraciones del esquema data_lab. Cada una lleva a una base existente a lo que declaran los modelos de
+# estructura_bd.py (que siguen siendo la referencia: create_all crea una base nueva ya al día) y solo crea lo que
+# falta, así que también se puede aplicar sobre una base creada con los modelos nuevos. Las aplicadas quedan en
+# la tabla version_esquema.
+
+# Tabla con las migraciones aplicadas (fuera de Base para que create_all no la cree)
+version_esquema = Table('version_esquema', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('nombre', String(255), nullable=False),
+    Column('aplicada', DateTime, nullable=False),
+)
+
+# Nombres de los índices (y claves únicas) que ya tiene una tabla
+def _indices_existentes(conn, tabla):
+    inspector = inspect(conn)
+    return ({indice['name'] for indice in inspector.get_indexes(tabla)}
+            | {clave['name'] for clave in inspector.get_unique_constraints(tabla)})
+
+# Crea los índices de los modelos cuyo nombre empieza por `prefijo` y que todavía no existen (en las tablas que
+# ya existen: las que crea una migración posterior reciben sus índices con ella)
+def _crear_indices(conn, prefijo):
+    for tabla in Base.metadata.sorted_tables:
+        if not inspect(conn).has_table(tabla.name):
+            continue
+        existentes = _indices_existentes(conn, tabla.name)
+        for indice in sorted(tabla.indexes, key=lambda indice: indice.name):
+            if indice.name.startswith(prefijo) and indice.name not in existentes:
+                if indice.unique:
+                    _comprobar_unicos(conn, tabla, indice)
+                indice.create(conn)
+                logging.info(f"Índice {indice.name} creado en {tabla.name}")
+
+# Una clave única no se puede crear si ya hay valores repetidos: se avisa con algunos ejemplos
+def _comprobar_unicos(conn, tabla, indice):
+    columnas = list(indice.columns)
+    repetidos = conn.execute(select(*columnas, func.count()).group_by(*columnas).having(func.count() > 1).limit(5)).all()
+    if repetidos:
+        raise RuntimeError(f"No se puede crear {indice.name}: hay valores repetidos en {tabla.name} "
+                           f"({', '.join(str(tuple(fila[:-1])) for fila in repetidos)}...)")
+
+# Añade una columna del modelo si la tabla no la tiene
+def _agregar_columna(conn, columna):
+    tabla = columna.table.name
+    if columna.name in {existente['name'] for existente in inspect(conn).get_columns(tabla)}:
+        return
+    tipo = columna.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna.name} {tipo}"))
+    logging.info(f"Columna {columna.name} añadida a {tabla}")
+
+# 1: referencia y nombres de las dimensiones únicos, y hash_registro para la carga incremental (upsert)
+def _claves_unicas(conn):
+    _agregar_columna(conn, Producto.__table__.c.hash_registro)
+    _crear_indices(conn, 'uq_')
+
+# 2: historial de precios y descuentos
+def _historial_precios(conn):
+    PrecioHistorial.__table__.create(conn, checkfirst=True)
+
+# 3: índices de las búsquedas y de las consultas de data_processing y analysis: productos por categoría con
+# precio y descuento (cubriente), relaciones muchos-a-muchos desde la dimensión, e hijas por producto
+def _indices_consultas(conn):
+    _crear_indices(conn, 'ix_')
+
+# Migraciones en orden: (versión, nombre, función)
+MIGRACIONES = [
+    (1, 'claves_unicas', _claves_unicas),
+    (2, 'historial_precios', _historial_precios),
+    (3, 'indices_consultas', _indices_consultas),
+]
+
+def versiones_aplicadas(engine):
+    with engine.begin() as conn:
+        version_esquema.create(conn, checkfirst=True)
+        return {version for version, in conn.execute(select(version_esquema.c.version))}
+
+# Aplica las migraciones pendientes (hasta la versión `hasta`, si se indica), cada una en su transacción.
+# En MySQL las sentencias DDL no se pueden revertir; como cada migración solo crea lo que falta, una migración
+# que falle a medias se puede volver a aplicar.
+def migrar(engine, hasta=None):
+    aplicadas = versiones_aplicadas(engine)
+    pendientes = [(version, nombre, funcion) for version, nombre, funcion in MIGRACIONES
+                  if version not in aplicadas and (hasta is None or version <= hasta)]
+    for version, nombre, funcion in pendientes:
+        with engine.begin() as conn:
+            funcion(conn)
+            conn.execute(version_esquema.insert(), {'version': version, 'nombre': nombre, 'aplicada': datetime.now()})
+        logging.info(f"Migración {version} ({nombre}) aplicada")
+    return [version for version, _, _ in pendientes]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Aplica las migraciones pendientes del esquema data_lab")
+    parser.add_argument("--url", help="URL de la base de datos (por defecto, la configurada en common/conexion.py)")
+    parser.add_argument("--hasta", type=int, help="Última versión que se aplica")
+    parser.add_argument("--listar", action='store_true', help="Solo muestra las migraciones y si están aplicadas")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url)
+    if args.listar:
+        aplicadas = versiones_aplicadas(engine)
+        for version, nombre, _ in MIGRACIONES:
+            print(f"{version:3d} {nombre:<20} {'aplicada' if version in aplicadas else 'pendiente'}")
+    else:
+        aplicadas = migrar(engine, args.hasta)
+        print(f"Migraciones aplicadas: {aplicadas or 'ninguna (el esquema está al día)'}")
+    engine.dispose()
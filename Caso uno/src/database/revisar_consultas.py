@@ -0,0 +1,93 @@
+import argparse
+import ast
+import glob
+import os
+import re
+import sys
+
+from estructura_bd import Base
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from conexion import crear_engine
+
+# Carpeta src del proyecto
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Scripts cuyas consultas se revisan
+SCRIPTS = sorted(glob.glob(os.path.join(SRC, 'data_processing', '*.py'))) + [os.path.join(SRC, 'analysis', 'cluster.py')]
+
+# Recorridos completos que no se pueden evitar porque la consulta lee todas las filas:
+# (script, tabla o alias) -> (índice, motivo). Con un índice, solo se acepta el recorrido de ese índice (cubriente:
+# la tabla no se lee); con None, también el de la tabla
+ESCANEOS_ESPERADOS = {
+    ('distribucion_pais_productos.py', 'productos'): (None, 'lee la columna detalles (TEXT) de todos los productos'),
+    ('cluster.py', 'p'): (None, 'agrupa todos los productos por producto_id, en el orden de la clave primaria'),
+    ('descuento_categoria.py', 'p'): ('ix_productos_categoria_precio_descuento', 'lee precio y descuento de todos los productos'),
+    ('distribucion_color_producto.py', 'c'): ('uq_colores_nombre', 'cuenta los productos de todos los colores'),
+    ('distribucion_precios.py', 'productos'): ('ix_productos_categoria_precio_descuento', 'lee el precio de todos los productos'),
+    ('distribucion_precios_categoria.py', 'p'): ('ix_productos_categoria_precio_descuento', 'lee el precio de todos los productos'),
+    ('distribucion_producto_categoria.py', 'ca'): ('uq_categorias_principales_nombre', 'cuenta los productos de todas las categorías'),
+    ('promedio_precio_categoria.py', 'p'): ('ix_productos_categoria_precio_descuento', 'lee el precio de todos los productos'),
+}
+
+# Tablas que aparecen después de FROM o JOIN
+TABLAS_CONSULTA = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)', re.IGNORECASE)
+# Paso del plan de SQLite que lee la tabla entera ("SCAN p") o un índice entero ("SCAN p USING COVERING INDEX ix")
+ESCANEO_SQLITE = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?$')
+# Tipos de acceso de MySQL que leen la tabla entera (ALL) o un índice entero (index)
+ESCANEOS_MYSQL = {'ALL', 'index'}
+
+# Consultas SQL escritas como cadenas en un script: (línea, consulta). Se leen con ast para no ejecutar el script
+# (todos consultan la base al importarse) y solo se cuentan las que leen tablas del esquema
+def consultas_script(path):
+    with open(path, encoding='utf-8') as archivo:
+        arbol = ast.parse(archivo.read(), path)
+    consultas = []
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.Constant) and isinstance(nodo.value, str) and nodo.value.strip().upper().startswith('SELECT'):
+            tablas = TABLAS_CONSULTA.findall(nodo.value)
+            if tablas and all(tabla in Base.metadata.tables for tabla in tablas):
+                consultas.append((nodo.lineno, ' '.join(nodo.value.split())))
+    return sorted(consultas)
+
+# Tablas (o sus alias) que la consulta recorre enteras según el EXPLAIN de la base: (tabla, índice), con el índice
+# recorrido entero o None si se lee la tabla
+def escaneos_completos(conn, consulta):
+    if conn.dialect.name == 'mysql':
+        plan = conn.exec_driver_sql(f"EXPLAIN {consulta}").mappings().all()
+        return [(paso['table'], paso['key'] if paso['type'] == 'index' else None)
+                for paso in plan if paso['type'] in ESCANEOS_MYSQL]
+    if conn.dialect.name == 'sqlite':
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {consulta}").all()
+        return [escaneo.groups() for *_, detalle in plan if (escaneo := ESCANEO_SQLITE.match(detalle))]
+    raise ValueError(f"EXPLAIN no soportado para {conn.dialect.name}")
+
+# Revisa las consultas de todos los scripts y devuelve los recorridos completos que no están en ESCANEOS_ESPERADOS
+def revisar(engine, scripts=SCRIPTS):
+    pendientes = []
+    with engine.connect() as conn:
+        for path in scripts:
+            script = os.path.basename(path)
+            for linea, consulta in consultas_script(path):
+                escaneos = escaneos_completos(conn, consulta)
+                for tabla, indice in escaneos:
+                    recorrido = f"{tabla} por el índice {indice}" if indice else tabla
+                    esperado, motivo = ESCANEOS_ESPERADOS.get((script, tabla), (None, None))
+                    if motivo and esperado in (None, indice):
+                        print(f"{script}:{linea}: recorre {recorrido} (esperado: {motivo})")
+                    else:
+                        print(f"{script}:{linea}: RECORRE ENTERA {recorrido} -> {consulta}")
+                        pendientes.append((script, linea, tabla))
+                if not escaneos:
+                    print(f"{script}:{linea}: usa índices")
+    return pendientes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revisa con EXPLAIN que las consultas de data_processing y analysis usen índices")
+    parser.add_argument("--url", help="URL de la base de datos (por defecto, la configurada en common/conexion.py)")
+    args = parser.parse_args()
+
+    engine = crear_engine(args.url)
+    pendientes = revisar(engine)
+    engine.dispose()
+    print(f"Recorridos completos no esperados: {len(pendientes)}")
+    sys.exit(1 if pendientes else 0)
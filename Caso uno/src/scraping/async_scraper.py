@@ -0,0 +1,251 @@
+import asyncio
+import argparse
+import logging
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+import pandas as pd
+
+from extract_product_info import resolve_product
+from http_client import HEADERS
+from response_cache import ResponseCache
+from checkpoint import BATCH_SIZE, open_writer
+from html_archive import configure_archive
+from rate_limiter import RETRY_STATUS, get_limiter
+from extractors import EXTRACTORS, DEFAULT_BACKEND, configure_extractor, get_extractor
+from metrics import SIZE_BUCKETS, get_metrics
+
+# Límites por defecto de solicitudes simultáneas
+MAX_CONCURRENCY = 16       # Solicitudes en curso en total
+PER_HOST_CONCURRENCY = 8   # Solicitudes en curso contra un mismo dominio
+
+# Marca en el contexto de cada solicitud el instante de sus eventos (DNS, conexión, cabeceras)
+def trace_config():
+    config = aiohttp.TraceConfig()
+
+    def mark(event):
+        async def handler(session, context, params):
+            context.trace_request_ctx[event] = time.perf_counter()
+        return handler
+
+    config.on_request_start.append(mark('request_start'))
+    config.on_dns_resolvehost_start.append(mark('dns_start'))
+    config.on_dns_resolvehost_end.append(mark('dns_end'))
+    config.on_connection_create_start.append(mark('connect_start'))
+    config.on_connection_create_end.append(mark('connect_end'))
+    config.on_request_end.append(mark('headers_received'))
+    return config
+
+# Registra las fases de una solicitud a partir de los eventos de trace_config
+def _record_phases(events, end, status, content):
+    metrics = get_metrics()
+
+    def observe(phase, seconds):
+        metrics.observe("http_phase_seconds", seconds, page="producto", phase=phase)
+
+    dns = events['dns_end'] - events['dns_start'] if 'dns_end' in events and 'dns_start' in events else 0.0
+    if dns:
+        observe("dns", dns)
+    if 'connect_end' in events and 'connect_start' in events:
+        observe("connect", events['connect_end'] - events['connect_start'] - dns)  # La conexión incluye el DNS
+    if 'headers_received' in events:
+        observe("ttfb", events['headers_received'] - events.get('connect_end', events['request_start']))
+        observe("download", end - events['headers_received'])
+    observe("total", end - events['request_start'])
+    metrics.observe("response_bytes", len(content or b""), SIZE_BUCKETS, page="producto")
+    metrics.inc("responses_total", page="producto", status=str(status))
+
+# Descarga una página de producto respetando los límites de concurrencia y el ritmo del dominio.
+# Devuelve (estado, cabeceras, cuerpo) de una respuesta 200/304, o None si no se pudo descargar (contado
+# en errors_total).
+# Con conditional=False no se envían los validadores de la caché (la respuesta no puede ser un 304); solo se
+# envían si el registro guardado es del backend `backend` (por defecto, el configurado).
+async def fetch_response(session, limits, url, max_retries=3, wait_time=0, cache=None, limiter=None,
+                         conditional=True, backend=None):
+    host = urlsplit(url).netloc
+    total_semaphore, host_semaphores, per_host_concurrency = limits
+    host_semaphore = host_semaphores.setdefault(host, asyncio.Semaphore(per_host_concurrency))
+    limiter = limiter or get_limiter()  # Ritmo de solicitudes compartido por dominio
+
+    retries = 0
+    while retries < max_retries:
+        try:
+            # Solo ocupamos un cupo mientras la solicitud está en curso
+            async with total_semaphore, host_semaphore:
+                if wait_time:
+                    await asyncio.sleep(wait_time)
+                await limiter.acquire_async(url)
+                request_headers = cache.conditional_headers(url, backend) if cache is not None and conditional else {}
+                request_start = time.time()
+                events = {}
+                async with session.get(url, headers=request_headers, trace_request_ctx=events) as response:
+                    status = response.status
+                    headers = response.headers
+                    content = await response.read() if status == 200 else None
+                _record_phases(events, time.perf_counter(), status, content)
+                retry_delay = limiter.record(url, time.time() - request_start, status, headers, retries + 1)
+
+            if status == 200 or (cache is not None and status == 304):
+                logging.info(f"Solicitud exitosa para {url}")
+                return status, headers, content
+
+            elif status in RETRY_STATUS:
+                # 429/503...: el limitador ya pausó el dominio (Retry-After o backoff) y redujo la tasa
+                retries += 1
+                get_metrics().inc("retries_total", page="producto", reason=str(status))
+                logging.warning(
+                    f"Servidor saturado en {url} (código {status}). "
+                    f"Reintentando en {retry_delay:.1f} s ({retries}/{max_retries})..."
+                )
+
+            else:
+                logging.error(f"Error en la solicitud a {url}. Código de estado: {status}")
+                get_metrics().inc("errors_total", page="producto")
+                return None
+
+        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            retries += 1
+            get_metrics().inc("retries_total", page="producto", reason="conexion")
+            retry_delay = limiter.record(url, attempt=retries)  # Backoff exponencial con jitter
+            logging.error(f"Error de conexión: {e}. Reintentando en {retry_delay:.1f} s ({retries}/{max_retries})...")
+        except Exception as e:
+            logging.error(f"Otro error: {e}")
+            get_metrics().inc("errors_total", page="producto")
+            return None
+
+    logging.error(f"No se pudo completar la solicitud para la URL: {url} después de {max_retries} intentos.")
+    get_metrics().inc("errors_total", page="producto")
+    return None
+
+# Descarga una página de producto y extrae sus datos. Cada producto que no se obtiene cuenta una vez en
+# errors_total (las fallas de la descarga ya las cuenta fetch_response)
+async def fetch_product(session, limits, url, position, pagination, max_retries=3, wait_time=0, cache=None,
+                        limiter=None):
+    logging.info(f"Iniciando scraping para la URL: {url}")
+
+    start_time = time.time()  # Comenzamos a medir el tiempo
+    response = await fetch_response(session, limits, url, max_retries, wait_time, cache, limiter)
+    if response is None:
+        return None
+
+    status, headers, content = response
+    try:
+        product_data = resolve_product(url, status, headers, content, position, pagination, cache)
+        if product_data is None:
+            # 304 cuya entrada ya no está en la caché: se vuelve a pedir sin validadores
+            logging.warning(f"Respuesta 304 sin registro en la caché para {url}; se pide sin validadores")
+            response = await fetch_response(session, limits, url, max_retries, wait_time, cache, limiter,
+                                            conditional=False)
+            if response is None:
+                return None
+            status, headers, content = response
+            product_data = resolve_product(url, status, headers, content, position, pagination, cache)
+    except Exception as e:
+        logging.error(f"Error al extraer los datos de {url}: {e}")
+        get_metrics().inc("errors_total", page="producto")
+        return None
+    if product_data is None:
+        logging.error(f"Respuesta 304 sin registro en la caché para {url} aun sin validadores")
+        get_metrics().inc("errors_total", page="producto")
+        return None
+
+    end_time = time.time()  # Medir el tiempo que tomó la extracción
+    logging.info(f"Extracción completada para {url} en {end_time - start_time:.2f} segundos.")
+    get_metrics().observe("product_seconds", end_time - start_time, page="producto")
+    return product_data
+
+# Lanza todas las descargas a la vez y devuelve los resultados en el orden del DataFrame de entrada.
+# Con un CheckpointWriter los registros se escriben por lotes a medida que llegan, en orden y
+# manteniendo como mucho `window` descargas en memoria; las URLs ya completadas se omiten.
+async def scrape_products_async(product_df, max_concurrency=MAX_CONCURRENCY,
+                                per_host_concurrency=PER_HOST_CONCURRENCY, max_retries=3, wait_time=0, cache=None,
+                                writer=None):
+    limits = (asyncio.Semaphore(max_concurrency), {}, per_host_concurrency)
+    connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=per_host_concurrency)
+
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, trace_configs=[trace_config()]) as session:
+        def start(row):
+            return asyncio.ensure_future(fetch_product(
+                session, limits, row['URL'], row['Posición'], row['Paginación'], max_retries, wait_time, cache
+            ))
+
+        if writer is None:
+            results = await asyncio.gather(*[start(row) for _, row in product_df.iterrows()])
+            # gather conserva el orden, así el CSV queda igual que con el recorrido secuencial
+            return [product_data for product_data in results if product_data]
+
+        window = max(writer.batch_size, max_concurrency * 2)
+        pending = deque()
+        for _, row in product_df.iterrows():
+            if writer.is_done(row['URL']):
+                continue
+            pending.append((row['URL'], start(row)))
+            if len(pending) >= window:
+                await _write_next(pending, writer)
+        while pending:
+            await _write_next(pending, writer)
+        writer.flush()
+        return []
+
+# Espera la descarga más antigua pendiente y la entrega al escritor (conserva el orden de entrada)
+async def _write_next(pending, writer):
+    url, task = pending.popleft()
+    product_data = await task
+    if product_data:
+        writer.add(url, product_data)
+
+# Punto de entrada síncrono para usar el motor asíncrono desde otros scripts
+def scrape_products(product_df, max_concurrency=MAX_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY,
+                    max_retries=3, wait_time=0, cache=None, writer=None):
+    return asyncio.run(
+        scrape_products_async(product_df, max_concurrency, per_host_concurrency, max_retries, wait_time, cache,
+                              writer)
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping concurrente de las páginas de producto")
+    parser.add_argument("--csv", default="C:/Users/johan/Desktop/Data/Caso uno/src/scraping/productos_20241006_165851.csv",
+                        help="CSV con las columnas URL, Posición y Paginación")
+    parser.add_argument("--salida", default="productos_scrapeados_v4.csv", help="CSV de salida (o carpeta .parquet)")
+    parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCY, help="Solicitudes simultáneas en total")
+    parser.add_argument("--concurrencia-host", type=int, default=PER_HOST_CONCURRENCY,
+                        help="Solicitudes simultáneas por dominio")
+    parser.add_argument("--espera", type=float, default=0, help="Segundos de espera antes de cada solicitud")
+    parser.add_argument("--cache", default="cache_productos.sqlite", help="Archivo de la caché de respuestas")
+    parser.add_argument("--sin-cache", action="store_true", help="Descargar y parsear todas las páginas")
+    parser.add_argument("--parser", choices=list(EXTRACTORS), default=DEFAULT_BACKEND,
+                        help="Backend de extracción de los campos")
+    parser.add_argument("--resume", action="store_true", help="Reanudar omitiendo las URLs ya guardadas")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="Registros por punto de control")
+    parser.add_argument("--archivo", help="Carpeta donde archivar el HTML descargado para reextraerlo sin red")
+    parser.add_argument("--metricas", help="Ruta del informe JSON de métricas de la ejecución")
+    parser.add_argument("--metricas-prom", help="Ruta del archivo de métricas para Prometheus (textfile collector)")
+    args = parser.parse_args()
+    configure_extractor(args.parser)
+
+    # Comenzar a medir el tiempo total
+    start_time_total = time.time()
+
+    cache = None if args.sin_cache else ResponseCache(args.cache)
+    writer = open_writer(args.salida, batch_size=args.lote, resume=args.resume)
+    product_df = pd.read_csv(args.csv)
+    if args.archivo:
+        configure_archive(args.archivo).register_listing(product_df)  # Filas y orden del listado para reextraer
+    scrape_products(product_df, args.concurrencia, args.concurrencia_host, wait_time=args.espera,
+                    cache=cache, writer=writer)
+    writer.close()
+    if args.parser == "vtex-json":
+        logging.info(f"Páginas sin JSON de estado extraídas del HTML: {get_extractor().fallbacks}")
+    if cache is not None:
+        cache.log_summary()  # Aciertos y fallos de la caché de respuestas
+        cache.close()
+    get_metrics().export(args.metricas, args.metricas_prom)
+
+    logging.info(f"Datos estructurados y almacenados en {args.salida}")
+
+    # Calcular el tiempo total de ejecución
+    execution_time = time.time() - start_time_total
+    logging.info(f"Tiempo total de ejecución: {execution_time:.2f} segundos")
+    print(f"Datos estructurados y almacenados en '{args.salida}' ({len(writer.completed)} productos en {execution_time:.2f} segundos)")
@@ -0,0 +1,119 @@
+import argparse
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from extract_product_info import scrape_product
+from async_scraper import scrape_products
+from checkpoint import CheckpointWriter
+from pipeline import ScrapingPipeline
+from http_client import get_client
+from rate_limiter import configure_limiter
+
+# Carpeta con páginas de producto guardadas que sirve el servidor local
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Levanta un servidor HTTP local que responde cada /<slug>/p con una de las páginas guardadas
+def start_fixture_server(latency=0.05):
+    pages = [open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))]
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Permite conexiones keep-alive
+        disable_nagle_algorithm = True  # Evita el retraso de ACK al escribir cabeceras y cuerpo por separado
+
+        def do_GET(self):
+            time.sleep(latency)  # Simulamos la latencia del sitio real
+            # El número del slug decide qué página se devuelve, así cada URL siempre obtiene la misma
+            slug = self.path.strip('/').split('/')[0]
+            body = pages[int(slug.rsplit('-', 1)[-1]) % len(pages)]
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)  # La página no cambió desde la última descarga
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Silenciamos el log de acceso del servidor
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Construye un listado con el mismo formato que productos_YYYYMMDD_HHMMSS.csv apuntando al servidor local
+def build_listing(base_url, n_products, page_size=24):
+    return pd.DataFrame([
+        {
+            'URL': f"{base_url}/producto-{i}/p",
+            'Posición': i + 1,
+            'Paginación': i // page_size + 1
+        }
+        for i in range(n_products)
+    ])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el scraping secuencial contra el asíncrono en un servidor local")
+    parser.add_argument("--productos", type=int, default=200, help="Número de URLs a scrapear")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latencia simulada por solicitud (segundos)")
+    parser.add_argument("--concurrencia", type=int, default=16, help="Solicitudes simultáneas en total")
+    parser.add_argument("--concurrencia-host", type=int, default=8, help="Solicitudes simultáneas por dominio")
+    args = parser.parse_args()
+
+    # El servidor local no necesita protección: sin límite de tasa para medir solo red y parseo
+    configure_limiter(initial_rate=1e6, max_rate=1e6, burst=1e6)
+
+    server = start_fixture_server(args.latencia)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    product_df = build_listing(base_url, args.productos)
+
+    # Recorrido secuencial actual, sin la espera fija para medir solo red y parseo
+    start_time = time.time()
+    sequential = [
+        scrape_product(row['URL'], row['Posición'], row['Paginación'], wait_time=0)
+        for _, row in product_df.iterrows()
+    ]
+    sequential_time = time.time() - start_time
+
+    # Motor asíncrono
+    start_time = time.time()
+    concurrent = scrape_products(product_df, args.concurrencia, args.concurrencia_host)
+    concurrent_time = time.time() - start_time
+
+    # Pipeline por etapas (descarga, parseo en procesos y escritura por lotes)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline_csv_path = os.path.join(tmp_dir, 'pipeline.csv')
+        start_time = time.time()
+        writer = CheckpointWriter(pipeline_csv_path)
+        ScrapingPipeline(args.concurrencia, args.concurrencia_host, report_interval=3600).run(product_df, writer)
+        pipeline_time = time.time() - start_time
+        with open(pipeline_csv_path, encoding='utf-8') as pipeline_file:
+            pipeline_csv = pipeline_file.read()
+
+    server.shutdown()
+
+    # La salida debe ser idéntica byte a byte al CSV que genera el recorrido secuencial
+    sequential_csv = pd.DataFrame([p for p in sequential if p]).to_csv(index=False)
+    concurrent_csv = pd.DataFrame(concurrent).to_csv(index=False)
+
+    print(f"Productos: {args.productos} | latencia simulada: {args.latencia:.3f} s")
+    print(f"Secuencial: {sequential_time:.2f} s ({args.productos / sequential_time:.1f} páginas/s)")
+    print(f"Asíncrono:  {concurrent_time:.2f} s ({args.productos / concurrent_time:.1f} páginas/s)")
+    print(f"Pipeline:   {pipeline_time:.2f} s ({args.productos / pipeline_time:.1f} páginas/s)")
+    stats = get_client().stats()
+    print(f"Conexiones secuencial: {stats['new_connections']} nuevas para {stats['requests']} solicitudes "
+          f"({stats['reuse_ratio']:.1%} reutilizadas)")
+    print(f"Aceleración: {sequential_time / concurrent_time:.1f}x")
+    print(f"Salida idéntica: {sequential_csv == concurrent_csv == pipeline_csv}")
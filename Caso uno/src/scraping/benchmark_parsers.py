@@ -0,0 +1,67 @@
+import argparse
+import glob
+import os
+import time
+
+from extractors import EXTRACTORS, get_extractor
+from html_archive import HtmlArchive
+
+# Carpeta con páginas de producto reconstruidas a mano (no son capturas de la tienda)
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Simula una actualización del tema de la tienda que cambia la versión de las clases CSS
+def rename_classes(content):
+    return content.replace(b"vtex-store-components-3-x-", b"vtex-store-components-4-x-")
+
+# Mide páginas/segundo de un backend repitiendo la extracción sobre todas las páginas guardadas
+def benchmark_backend(name, pages, repeticiones):
+    extractor = get_extractor(name)
+    start_time = time.perf_counter()
+    for _ in range(repeticiones):
+        for content in pages.values():
+            extractor.extract(content)
+    elapsed = time.perf_counter() - start_time
+    return len(pages) * repeticiones / elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara los backends de extracción sobre las páginas guardadas")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Veces que se procesa cada página")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Carpeta con archivos .html de producto")
+    parser.add_argument("--archivo", help="Carpeta de un archivo HTML (--archivo de los scrapers) con páginas reales; "
+                                          "se usa en lugar de las fixtures")
+    parser.add_argument("--max-paginas", type=int, default=500, help="Páginas que se toman del archivo")
+    args = parser.parse_args()
+
+    if args.archivo:
+        # Última captura de cada URL descargada de la tienda
+        archive = HtmlArchive(args.archivo)
+        pages = {url: archive.read(segment, offset, length)
+                 for url, _, segment, offset, length, _, _ in archive.latest_captures()[:args.max_paginas]}
+        archive.close()
+    else:
+        pages = {
+            os.path.basename(path): open(path, 'rb').read()
+            for path in sorted(glob.glob(os.path.join(args.fixtures, '*.html')))
+        }
+    print(f"Páginas: {len(pages)} ({args.archivo or 'fixtures reconstruidas'}) | repeticiones: {args.repeticiones}")
+
+    # El backend de BeautifulSoup es la referencia: los demás deben producir exactamente los mismos campos
+    reference = {name: get_extractor("bs4").extract(content) for name, content in pages.items()}
+    baseline = None
+
+    for backend in EXTRACTORS:
+        try:
+            get_extractor(backend)
+        except ImportError as e:
+            print(f"{backend:>9}: omitido ({e})")
+            continue
+
+        extractor = get_extractor(backend)
+        mismatches = [name for name, content in pages.items() if extractor.extract(content) != reference[name]]
+        # Robustez: ¿sigue extrayendo lo mismo si cambian los nombres de las clases?
+        robust = all(extractor.extract(rename_classes(content)) == reference[name] for name, content in pages.items())
+        pages_per_second = benchmark_backend(backend, pages, args.repeticiones)
+        baseline = baseline or pages_per_second
+        status = "idéntico" if not mismatches else f"DIFERENTE en {', '.join(mismatches)}"
+        print(f"{backend:>9}: {pages_per_second:8.1f} páginas/s ({pages_per_second / baseline:.1f}x) | salida {status} | "
+              f"resiste cambio de clases: {'sí' if robust else 'no'}")
@@ -0,0 +1,163 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from product_dataset import is_parquet, records_to_table, require_pyarrow, pq
+
+# Registros que se acumulan en memoria antes de escribirlos a disco
+BATCH_SIZE = 50
+
+# Escritura incremental del CSV de productos con puntos de control para poder reanudar la ejecución.
+# Cada lote se añade al CSV y se sincroniza con fsync; después se anota en el diario (journal) la
+# posición del CSV tras el lote y las URLs que contiene. Al reanudar, el CSV se recorta a la última
+# posición anotada, así un lote que quedó a medias no se duplica.
+class CheckpointWriter:
+    def __init__(self, output_csv, journal_path=None, batch_size=BATCH_SIZE, resume=False):
+        self.output_csv = output_csv
+        self.journal_path = journal_path or f"{output_csv}.journal"
+        self.batch_size = batch_size
+        self.completed = set()  # URLs ya guardadas en el CSV
+        self.buffer = []  # (URL, registro, fecha de scraping) pendientes de escribir
+        self.written = 0
+        self.recovered = []  # URLs de los registros ya confirmados al reanudar, en orden y con las repetidas
+
+        if resume:
+            self._recover()
+        else:
+            # Ejecución nueva: empezamos con el CSV y el diario vacíos
+            self._reset()
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+
+    def _reset(self):
+        if os.path.exists(self.output_csv):
+            os.remove(self.output_csv)
+
+    # Lee el diario, recorta el CSV al último lote confirmado y carga las URLs terminadas
+    def _recover(self):
+        offset = 0
+        if os.path.exists(self.journal_path):
+            valid_length = 0
+            with open(self.journal_path, 'r+b') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Última línea incompleta por una caída: se ignora
+                    offset = entry['offset']
+                    self.completed.update(entry['urls'])
+                    self.recovered.extend(entry['urls'])
+                    valid_length += len(line)
+                # Quitamos la línea incompleta para que los lotes nuevos se anoten a continuación
+                journal.truncate(valid_length)
+
+        self._truncate(offset)
+        logging.info(f"Reanudando: {len(self.completed)} URLs ya completadas en {self.output_csv}")
+
+    # Deja la salida como estaba tras el último lote confirmado
+    def _truncate(self, offset):
+        if os.path.exists(self.output_csv) and os.path.getsize(self.output_csv) > offset:
+            with open(self.output_csv, 'r+b') as output:
+                output.truncate(offset)
+
+    def is_done(self, url):
+        return url in self.completed
+
+    # scraped_at permite conservar la fecha original de un registro que se arrastra sin volver a scrapearlo
+    def add(self, url, product_data, scraped_at=None):
+        self.buffer.append((url, product_data, scraped_at or time.time()))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    # Escribe el lote pendiente y confirma el punto de control
+    def flush(self):
+        if not self.buffer:
+            return
+        urls = [url for url, _, _ in self.buffer]
+        times = [scraped_at for _, _, scraped_at in self.buffer]
+        offset = self._write_batch([product_data for _, product_data, _ in self.buffer])
+
+        with open(self.journal_path, 'a', encoding='utf-8') as journal:
+            journal.write(json.dumps({'offset': offset, 'urls': urls, 'times': times}, ensure_ascii=False) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        self.completed.update(urls)
+        self.written += len(urls)
+        self.buffer = []
+        logging.info(f"Punto de control: {self.written} registros escritos en {self.output_csv}")
+
+    # Añade el lote a la salida y devuelve la posición que se anota en el diario
+    def _write_batch(self, records):
+        batch_df = pd.DataFrame(records)
+        write_header = not os.path.exists(self.output_csv) or os.path.getsize(self.output_csv) == 0
+        with open(self.output_csv, 'a', encoding='utf-8', newline='') as output:
+            batch_df.to_csv(output, index=False, header=write_header)
+            output.flush()
+            os.fsync(output.fileno())
+        return os.path.getsize(self.output_csv)
+
+    def close(self):
+        self.flush()
+
+# Misma escritura por lotes con puntos de control, pero a un conjunto Parquet: una carpeta con un archivo
+# por lote (part-00000.parquet, ...) con listas, detalles y categorías en tipos nativos. En el diario la
+# posición es el número de partes confirmadas; al reanudar se borran las partes posteriores.
+class ParquetCheckpointWriter(CheckpointWriter):
+    def __init__(self, output_dir, journal_path=None, batch_size=BATCH_SIZE, resume=False):
+        require_pyarrow()
+        self.parts = 0
+        super().__init__(output_dir, journal_path, batch_size, resume)
+        os.makedirs(self.output_csv, exist_ok=True)
+
+    def _part_path(self, index):
+        return os.path.join(self.output_csv, f"part-{index:05d}.parquet")
+
+    def _reset(self):
+        if os.path.isdir(self.output_csv):
+            shutil.rmtree(self.output_csv)
+
+    def _truncate(self, offset):
+        self.parts = offset
+        for path in glob.glob(os.path.join(self.output_csv, '.part-*.tmp')):
+            os.remove(path)  # Lote que quedó a medias
+        for path in glob.glob(os.path.join(self.output_csv, 'part-*.parquet')):
+            if int(os.path.basename(path)[len('part-'):-len('.parquet')]) >= offset:
+                os.remove(path)
+
+    def _write_batch(self, records):
+        path = self._part_path(self.parts)
+        temp_path = os.path.join(self.output_csv, f".{os.path.basename(path)}.tmp")  # Oculto para los lectores
+        with open(temp_path, 'wb') as output:
+            pq.write_table(records_to_table(records), output)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temp_path, path)
+        self.parts += 1
+        return self.parts
+
+# Escritor según la extensión de la salida: carpeta .parquet o CSV
+def open_writer(output, **kwargs):
+    if is_parquet(output):
+        return ParquetCheckpointWriter(output, **kwargs)
+    return CheckpointWriter(output, **kwargs)
+
+# Lee el diario de un CSV ya escrito: URL y fecha de scraping de cada fila, en el orden del CSV
+def read_journal(output_csv, journal_path=None):
+    urls, times = [], []
+    with open(journal_path or f"{output_csv}.journal", encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # Última línea incompleta por una caída: se ignora
+            urls.extend(entry['urls'])
+            times.extend(entry.get('times') or [None] * len(entry['urls']))
+    return urls, times
@@ -0,0 +1,285 @@
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from async_scraper import MAX_CONCURRENCY, PER_HOST_CONCURRENCY, scrape_products
+from checkpoint import BATCH_SIZE, CheckpointWriter, read_journal
+from response_cache import ResponseCache
+
+# Segundos que un trabajador retiene sus URLs sin dar señales de vida antes de que vuelvan a la cola
+LEASE_SECONDS = 120
+# Intentos por URL antes de darla por fallida (cada vencimiento de la concesión cuenta como intento)
+MAX_ATTEMPTS = 3
+# Segundos de espera cuando no hay URLs libres pero otros trabajadores aún tienen concesiones abiertas
+POLL_SECONDS = 5
+
+# Cola de trabajo persistente en SQLite compartida por los trabajadores de varios procesos o equipos.
+# Cada trabajador toma un lote de URLs con una concesión (lease) que renueva con latidos mientras trabaja;
+# si muere, la concesión vence y las URLs vuelven a estar disponibles para otro.
+# SQLite exige un sistema de archivos con bloqueos fiables: en varios equipos, un disco compartido que los
+# respete (no todos los montajes NFS/SMB lo hacen).
+class WorkQueue:
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tareas (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                position INTEGER,
+                pagination INTEGER,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                shard TEXT
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tareas_estado ON tareas (estado, lease_until)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS trabajadores (
+                worker TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    # Transacción con bloqueo de escritura: dos trabajadores nunca toman ni confirman la misma URL a la vez
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # Añade las URLs del listado en su orden; las que ya estaban en la cola se ignoran
+    def enqueue(self, product_df):
+        rows = [
+            (row['URL'], int(row['Posición']), int(row['Paginación']))
+            for _, row in product_df.drop_duplicates(subset='URL').iterrows()
+        ]
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO tareas (url, position, pagination) VALUES (?, ?, ?)", rows)
+            return self.conn.total_changes - before
+
+    # Concede al trabajador hasta `limit` URLs libres (pendientes o con la concesión vencida)
+    def lease(self, worker, limit):
+        now = time.time()
+        with self._transaction():
+            # Las URLs que agotaron sus intentos con la concesión vencida se dan por fallidas
+            self.conn.execute(
+                "UPDATE tareas SET estado = 'fallida', worker = NULL "
+                "WHERE estado = 'asignada' AND lease_until < ? AND attempts >= ?", (now, self.max_attempts)
+            )
+            rows = self.conn.execute(
+                "SELECT id, url, position, pagination FROM tareas "
+                "WHERE estado = 'pendiente' OR (estado = 'asignada' AND lease_until < ?) ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE tareas SET estado = 'asignada', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE id = ?", [(worker, now + self.lease_seconds, row[0]) for row in rows]
+            )
+            self._beat(worker, now)
+        return rows
+
+    # Renueva las concesiones del trabajador (latido)
+    def heartbeat(self, worker):
+        now = time.time()
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE tareas SET lease_until = ? WHERE estado = 'asignada' AND worker = ?",
+                (now + self.lease_seconds, worker)
+            )
+            self._beat(worker, now)
+
+    def _beat(self, worker, now):
+        self.conn.execute(
+            "INSERT INTO trabajadores (worker, heartbeat) VALUES (?, ?) "
+            "ON CONFLICT (worker) DO UPDATE SET heartbeat = excluded.heartbeat", (worker, now)
+        )
+
+    # Marca como hechas las URLs escritas en el fragmento del trabajador. Si la concesión se perdió y otro
+    # trabajador ya tomó la URL, no se toca: el registro que vale será el del fragmento que la termine.
+    def complete(self, worker, task_ids, shard):
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "UPDATE tareas SET estado = 'hecha', shard = ?, lease_until = NULL "
+                "WHERE id = ? AND estado = 'asignada' AND worker = ?", [(shard, task_id, worker) for task_id in task_ids]
+            )
+            completed = self.conn.total_changes - before
+            self.conn.execute("UPDATE trabajadores SET completed = completed + ? WHERE worker = ?", (completed, worker))
+            return completed
+
+    # Devuelve a la cola las URLs que fallaron (o las da por fallidas si agotaron sus intentos)
+    def release(self, worker, task_ids):
+        with self._transaction():
+            self.conn.executemany(
+                "UPDATE tareas SET estado = CASE WHEN attempts >= ? THEN 'fallida' ELSE 'pendiente' END, "
+                "worker = NULL, lease_until = NULL WHERE id = ? AND estado = 'asignada' AND worker = ?",
+                [(self.max_attempts, task_id, worker) for task_id in task_ids]
+            )
+
+    # URLs por estado
+    def progress(self):
+        counts = dict(self.conn.execute("SELECT estado, COUNT(*) FROM tareas GROUP BY estado").fetchall())
+        return {state: counts.get(state, 0) for state in ('pendiente', 'asignada', 'hecha', 'fallida')}
+
+    def workers(self):
+        return self.conn.execute("SELECT worker, heartbeat, completed FROM trabajadores ORDER BY worker").fetchall()
+
+    # Fragmento que terminó cada URL, en el orden del listado
+    def completed_tasks(self):
+        return self.conn.execute("SELECT url, shard FROM tareas WHERE estado = 'hecha' ORDER BY id").fetchall()
+
+    def close(self):
+        self.conn.close()
+
+# Identificador del trabajador: equipo y proceso
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+# Hilo que renueva las concesiones del trabajador mientras procesa su lote (con su propia conexión)
+class _Heartbeat(threading.Thread):
+    def __init__(self, queue_path, worker, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        queue = WorkQueue(self.queue_path, self.lease_seconds)
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                queue.heartbeat(self.worker)
+            except sqlite3.Error as e:
+                logging.warning(f"No se pudo renovar la concesión de {self.worker}: {e}")
+        queue.close()
+
+# Toma lotes de la cola hasta vaciarla y escribe los productos en su propio fragmento (shard) CSV
+def run_worker(queue_path, shards_dir, batch_size=BATCH_SIZE, max_concurrency=MAX_CONCURRENCY,
+               per_host_concurrency=PER_HOST_CONCURRENCY, lease_seconds=LEASE_SECONDS, cache=None, worker=None):
+    worker = worker or worker_name()
+    os.makedirs(shards_dir, exist_ok=True)
+    shard = os.path.join(shards_dir, f"shard-{worker}.csv")
+    queue = WorkQueue(queue_path, lease_seconds)
+    writer = CheckpointWriter(shard, batch_size=batch_size, resume=True)
+    heartbeat = _Heartbeat(queue_path, worker, lease_seconds)
+    heartbeat.start()
+
+    completed = 0
+    try:
+        while True:
+            tasks = queue.lease(worker, batch_size)
+            if not tasks:
+                progress = queue.progress()
+                if not progress['pendiente'] and not progress['asignada']:
+                    break
+                time.sleep(POLL_SECONDS)  # Otros trabajadores tienen URLs; si mueren, sus concesiones vencerán
+                continue
+
+            batch_df = pd.DataFrame(tasks, columns=['id', 'URL', 'Posición', 'Paginación'])
+            scrape_products(batch_df, max_concurrency, per_host_concurrency, cache=cache, writer=writer)
+            # scrape_products confirma el lote en disco (fsync) antes de volver; solo entonces se marca hecho
+            done = [task[0] for task in tasks if writer.is_done(task[1])]
+            failed = [task[0] for task in tasks if not writer.is_done(task[1])]
+            completed += queue.complete(worker, done, os.path.basename(shard))
+            queue.release(worker, failed)
+            logging.info(f"{worker}: lote de {len(tasks)} URLs, {len(done)} hechas, {len(failed)} devueltas")
+    finally:
+        heartbeat.stopped.set()
+        writer.close()
+        queue.close()
+    return completed
+
+# Une los fragmentos en un único CSV en el orden del listado, tomando cada URL del fragmento que la terminó
+def merge_shards(queue_path, shards_dir, output_csv):
+    queue = WorkQueue(queue_path)
+    completed = queue.completed_tasks()
+    queue.close()
+
+    records = {}
+    columns = None
+    for shard in sorted({shard for _, shard in completed}):
+        shard_path = os.path.join(shards_dir, shard)
+        # Leemos todo como texto para volver a escribir las celdas exactamente igual
+        shard_df = pd.read_csv(shard_path, dtype=str, keep_default_na=False)
+        urls, times = read_journal(shard_path)
+        columns = columns or list(shard_df.columns)
+        for url, scraped_at, record in zip(urls, times, shard_df.to_dict('records')):
+            records[(url, shard)] = (record, scraped_at)
+
+    writer = CheckpointWriter(output_csv)
+    missing = 0
+    for url, shard in completed:
+        if (url, shard) not in records:
+            missing += 1
+            continue
+        record, scraped_at = records[(url, shard)]
+        writer.add(url, {column: record[column] for column in columns}, scraped_at)
+    writer.close()
+    if missing:
+        logging.warning(f"{missing} URLs hechas no aparecen en su fragmento")
+    return writer.written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping repartido entre trabajadores con una cola compartida")
+    parser.add_argument("--cola", default="cola_productos.sqlite", help="Archivo SQLite de la cola compartida")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    enqueue_parser = subparsers.add_parser("encolar", help="Añade a la cola las URLs de un listado")
+    enqueue_parser.add_argument("--listado", required=True, help="CSV con las columnas URL, Posición y Paginación")
+
+    worker_parser = subparsers.add_parser("trabajar", help="Procesa URLs de la cola hasta vaciarla")
+    worker_parser.add_argument("--fragmentos", default="fragmentos", help="Carpeta de los CSV de cada trabajador")
+    worker_parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="URLs que se toman de la cola cada vez")
+    worker_parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCY, help="Solicitudes simultáneas")
+    worker_parser.add_argument("--concesion", type=float, default=LEASE_SECONDS,
+                               help="Segundos sin latidos tras los que las URLs vuelven a la cola")
+    worker_parser.add_argument("--cache", help="Archivo de la caché de respuestas de este trabajador")
+
+    subparsers.add_parser("estado", help="Muestra el avance de la cola y los trabajadores")
+
+    merge_parser = subparsers.add_parser("unir", help="Une los fragmentos en un único CSV")
+    merge_parser.add_argument("--fragmentos", default="fragmentos", help="Carpeta de los CSV de cada trabajador")
+    merge_parser.add_argument("--salida", default="productos_scrapeados_v4.csv", help="CSV de salida")
+    args = parser.parse_args()
+
+    start_time_total = time.time()
+    if args.comando == "encolar":
+        queue = WorkQueue(args.cola)
+        added = queue.enqueue(pd.read_csv(args.listado))
+        print(f"{added} URLs nuevas en la cola: {queue.progress()}")
+        queue.close()
+    elif args.comando == "trabajar":
+        cache = ResponseCache(args.cache) if args.cache else None
+        completed = run_worker(args.cola, args.fragmentos, args.lote, args.concurrencia, args.concurrencia,
+                               args.concesion, cache)
+        if cache is not None:
+            cache.log_summary()
+            cache.close()
+        print(f"{completed} URLs completadas en {time.time() - start_time_total:.2f} segundos")
+    elif args.comando == "estado":
+        queue = WorkQueue(args.cola)
+        print(f"Avance: {queue.progress()}")
+        for worker, heartbeat, completed in queue.workers():
+            print(f"  {worker}: {completed} URLs, último latido hace {time.time() - heartbeat:.0f} s")
+        queue.close()
+    else:
+        written = merge_shards(args.cola, args.fragmentos, args.salida)
+        print(f"{written} productos unidos en '{args.salida}'")
@@ -1,9 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import time
 import logging
 import pandas as pd  # Importar pandas para la estructuración de los datos
 from requests.exceptions import ChunkedEncodingError, ConnectionError
+from http_client import get_client  # Sesión HTTP compartida con conexiones keep-alive
+from response_cache import ResponseCache, content_hash, with_position
+from checkpoint import BATCH_SIZE, open_writer
+from html_archive import configure_archive, get_archive  # Archivo opcional del HTML descargado
+from rate_limiter import RETRY_STATUS, get_limiter  # Limitador de tasa adaptativo por dominio
+from extractors import get_extractor  # Backends de extracción de campos (bs4, lxml)
+from metrics import get_metrics  # Tiempos por fase, tamaños, estados y reintentos
 
 # Configuración del logger
 logging.basicConfig(
@@ -13,200 +19,168 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-def scrape_product(url, position, pagination, max_retries=3, wait_time=2):
+# Extrae los campos del producto a partir del HTML de la página con el backend indicado
+def parse_product(content, position, pagination, backend=None):
+    extractor = get_extractor(backend)
+    with get_metrics().timer("parse_seconds", backend=extractor.name):
+        product_data = extractor.extract(content)
+    product_data["Position"] = position
+    product_data["Pagination"] = pagination
+    return product_data
+
+# Busca en la caché el registro de una respuesta 200/304 extraído con el backend indicado (o el configurado).
+# Devuelve (registro, hash del cuerpo):
+# si el registro es None y hay hash, la página cambió y hay que parsearla; si no hay ninguno de los dos,
+# es un 304 cuya entrada ya no está en la caché (eliminada antes de la respuesta, o caché compartida entre
+# ejecuciones) y hay que volver a pedir la página sin validadores
+def lookup_cache(url, status_code, content, position, pagination, cache, backend=None):
+    if status_code == 304:
+        record = cache.get_not_modified(url, backend)
+        return (with_position(record, position, pagination) if record is not None else None), None
+
+    # Si el cuerpo es idéntico al de la ejecución anterior reutilizamos el registro ya extraído
+    digest = content_hash(content)
+    record = cache.get_same_content(url, digest, backend)
+    return (with_position(record, position, pagination) if record is not None else None), digest
+
+# Obtiene el registro de una respuesta 200/304, evitando el parseo si la caché ya tiene la página.
+# Devuelve None solo en un 304 sin registro en la caché.
+def resolve_product(url, status_code, headers, content, position, pagination, cache=None):
+    archive = get_archive()
+    if archive is not None and status_code == 200:
+        archive.append(url, content, position, pagination)  # Para poder reextraer sin volver a descargar
+
+    if cache is None:
+        return parse_product(content, position, pagination)
+
+    record, digest = lookup_cache(url, status_code, content, position, pagination, cache)
+    if record is not None or digest is None:
+        return record
+
+    product_data = parse_product(content, position, pagination)
+    cache.store(url, headers, digest, product_data)
+    return product_data
+
+def scrape_product(url, position, pagination, max_retries=3, wait_time=0, cache=None, limiter=None):
     logging.info(f"Iniciando scraping para la URL: {url}")
     
     start_time = time.time()  # Comenzamos a medir el tiempo
+    limiter = limiter or get_limiter()  # Ritmo de solicitudes compartido por dominio
+    metrics = get_metrics()
 
     retries = 0
+    conditional = True  # Sin validadores tras un 304 cuya entrada ya no está en la caché
     while retries < max_retries:
         try:
-            time.sleep(wait_time)  # Espera para dar tiempo a que la página cargue completamente
+            if wait_time:
+                time.sleep(wait_time)  # Espera fija opcional además del limitador
+            limiter.acquire(url)
             
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-            response = requests.get(url, headers=headers)
-
-            if response.status_code == 200:
+            # Con caché enviamos If-None-Match / If-Modified-Since de la descarga anterior
+            request_headers = cache.conditional_headers(url) if cache is not None and conditional else {}
+            request_start = time.time()
+            response = get_client().get(url, headers=request_headers)
+            retry_delay = limiter.record(
+                url, time.time() - request_start, response.status_code, response.headers, retries + 1
+            )
+            metrics.record_response("producto", response)
+
+            if response.status_code == 200 or (cache is not None and response.status_code == 304):
                 logging.info(f"Solicitud exitosa para {url}")
                 
-                soup = BeautifulSoup(response.content, "html.parser")  # Parsear el contenido HTML
-
-                # Extraer el nombre del producto
-                product_name = soup.find("span", class_="vtex-store-components-3-x-productBrand")
-                product_name = (
-                    product_name.get_text(strip=True) if product_name else "Nombre no disponible"
-                )
-
-                # Extraer la categoría principal y subcategorías (breadcrumb)
-                breadcrumb = soup.find("div", {"data-testid": "breadcrumb"})
-                categories = []
-                if breadcrumb:
-                    links = breadcrumb.find_all("a")
-                    categories = [link.get_text(strip=True) for link in links if link.get_text(strip=True)]
-                    main_category = categories[0] if categories else None
-                    subcategories = categories[1:] if len(categories) > 1 else []
-                else:
-                    main_category = None
-                    subcategories = []
-
-                # Extraer la referencia
-                reference = soup.find("span", class_="vtex-product-identifier-0-x-product-identifier__value")
-                reference = (
-                    reference.get_text(strip=True) if reference else "Referencia no disponible"
-                )
-
-                # Extracción del precio
-                price_container = soup.find("span", class_="vtex-product-price-1-x-sellingPriceValue")
-                price = (
-                    price_container.get_text(strip=True) if price_container else "Precio no disponible"
-                )
-
-                # Extracción de la descripción del producto
-                description_container = soup.find("div", class_="vtex-store-components-3-x-productDescriptionText")
-                description = (
-                    " ".join(part.strip() for part in description_container.strings if part.strip() and "Mostrar más" not in part)
-                    if description_container else "Descripción no disponible"
+                product_data = resolve_product(
+                    url, response.status_code, response.headers, response.content, position, pagination, cache
                 )
-
-                # Extracción de los detalles del producto
-                product_details = {}
-                details_container = soup.find(
-                    "td", class_="vtex-store-components-3-x-specificationItemSpecifications--especificacionesdeta"
-                )
-                if details_container:
-                    for li in details_container.find_all("li"):
-                        text = li.text.strip()
-                        try:
-                            key, value = text.split(":", 1)
-                            product_details[key.strip()] = value.strip()
-                        except ValueError:
-                            continue  # Omite si no se puede dividir
-
-                # Extracción de las recomendaciones de cuidado
-                care_instructions = []
-                care_container = soup.find(
-                    "td", class_="vtex-store-components-3-x-specificationItemSpecifications--especificacionesapli"
-                )
-                if care_container:
-                    care_instructions = [li.text.strip() for li in care_container.find_all("li")]
-
-                # Extracción de imágenes del producto
-                image_urls = []
-                image_container = soup.find(
-                    "div", class_="vtex-store-components-3-x-carouselGaleryCursor"
-                )
-                if image_container:
-                    images = image_container.find_all("img", class_="vtex-store-components-3-x-productImageTag")
-                    for img in images:
-                        src = img.get("src")
-                        if src:
-                            base_url = src.split("?")[0]  # Extraer la URL de la imagen de mayor resolución
-                            image_urls.append(base_url)
-
-                # Extracción de los colores disponibles
-                colors_container = soup.find('div', class_='vtex-store-components-3-x-skuSelectorSubcontainer--colores')
-                colors = []
-                if colors_container:
-                    color_options = colors_container.find_all('div', class_='vtex-store-components-3-x-skuSelectorItem')
-                    for option in color_options:
-                        if 'vtex-store-components-3-x-diagonalCross' not in option.get('class', []) and \
-                        'vtex-store-components-3-x-skuSelectorItem--disabled' not in option.get('class', []) and \
-                        option.get('aria-disabled') != 'true':
-                            color_name = option.find('div', class_='vtex-store-components-3-x-skuSelectorItemTextValue')
-                            color_name = color_name.get_text(strip=True) if color_name else "Color no disponible"
-                            colors.append(color_name)
-
-                # Extracción de las tallas disponibles
-                sizes_container = soup.find('div', class_='vtex-store-components-3-x-skuSelectorSubcontainer--talla')
-                sizes = []
-                if sizes_container:
-                    size_options = sizes_container.find_all('div', class_='vtex-store-components-3-x-skuSelectorItem')
-                    for option in size_options:
-                        if 'vtex-store-components-3-x-diagonalCross' not in option.get('class', []) and \
-                        'vtex-store-components-3-x-skuSelectorItem--disabled' not in option.get('class', []) and \
-                        option.get('aria-disabled') != 'true':
-                            size_name = option.find('div', class_='vtex-store-components-3-x-skuSelectorItemTextValue')
-                            size_name = size_name.get_text(strip=True) if size_name else "Talla no disponible"
-                            sizes.append(size_name)
-
-                # Extracción del descuento
-                discount_container = soup.find('div', class_='vtex-store-components-3-x-discountContainer')
-                discount = "0%"  # Valor por defecto si no hay descuento
-                if discount_container:
-                    discount_value = discount_container.find('div', class_='vtex-store-components-3-x-discountInsideContainer')
-                    if discount_value:
-                        discount = discount_value.get_text(strip=True)
-
-                # Empaquetar la información en un diccionario
-                product_data = {
-                    "Nombre del Producto": product_name,
-                    "Categoría Principal": main_category,
-                    "Subcategorías": subcategories,
-                    "Referencia": reference,
-                    "Precio": price,
-                    "Descuento": discount,
-                    "Colores Disponibles": colors,
-                    "Tallas Disponibles": sizes,
-                    "Descripción del Producto": description,
-                    "Detalles del Producto": product_details,
-                    "Recomendaciones de Cuidado": care_instructions,
-                    "URLs de Imágenes": image_urls,
-                    "Position": position,
-                    "Pagination": pagination
-                }
+                if product_data is None:
+                    if conditional:
+                        logging.warning(f"Respuesta 304 sin registro en la caché para {url}; se pide sin validadores")
+                        conditional = False
+                        continue
+                    logging.error(f"Respuesta 304 sin registro en la caché para {url} aun sin validadores")
+                    break
 
                 end_time = time.time()  # Medir el tiempo que tomó la extracción
                 logging.info(f"Extracción completada para {url} en {end_time - start_time:.2f} segundos.")
+                metrics.observe("product_seconds", end_time - start_time, page="producto")
                 
                 return product_data
 
+            elif response.status_code in RETRY_STATUS:
+                # 429/503...: el limitador ya pausó el dominio (Retry-After o backoff) y redujo la tasa
+                retries += 1
+                metrics.inc("retries_total", page="producto", reason=str(response.status_code))
+                logging.warning(
+                    f"Servidor saturado en {url} (código {response.status_code}). "
+                    f"Reintentando en {retry_delay:.1f} s ({retries}/{max_retries})..."
+                )
+
             else:
                 logging.error(f"Error en la solicitud a {url}. Código de estado: {response.status_code}")
+                metrics.inc("errors_total", page="producto")
                 return None
         
         except (ChunkedEncodingError, ConnectionError) as e:
             retries += 1
-            logging.error(f"Error de conexión: {e}. Reintentando ({retries}/{max_retries})...")
-            time.sleep(wait_time)  # Espera antes de reintentar
+            metrics.inc("retries_total", page="producto", reason="conexion")
+            retry_delay = limiter.record(url, attempt=retries)  # Backoff exponencial con jitter
+            logging.error(f"Error de conexión: {e}. Reintentando en {retry_delay:.1f} s ({retries}/{max_retries})...")
         except Exception as e:
             logging.error(f"Otro error: {e}")
             break
     
     logging.error(f"No se pudo completar la solicitud para la URL: {url} después de {max_retries} intentos.")
+    metrics.inc("errors_total", page="producto")
     return None
 
-# Comenzar a medir el tiempo total
-start_time_total = time.time()
-
-# Cargar el archivo CSV con las URLs, posiciones y paginaciones
-csv_file = "C:/Users/johan/Desktop/Data/Caso uno/src/scraping/productos_20241006_165851.csv"
-product_df = pd.read_csv(csv_file)
-
-# Lista para almacenar los datos de todos los productos
-all_products = []
-
-# Iterar sobre las filas del DataFrame
-for index, row in product_df.iterrows():
-    url = row['URL']
-    position = row['Posición']
-    pagination = row['Paginación']
-    print(f"Scrapeando URL: {url} (Posición: {position}, Paginación: {pagination})")
-    
-    product_data = scrape_product(url, position, pagination)
-    if product_data:
-        all_products.append(product_data)
-
-# Convertir la lista de productos en un DataFrame
-products_df = pd.DataFrame(all_products)
-
-# Guardar los datos en un archivo CSV
-products_df.to_csv('productos_scrapeados_v4.csv', index=False, encoding='utf-8')
-logging.info("Datos estructurados y almacenados en productos_scrapeados_v4.csv")
-
-# Calcular el tiempo total de ejecución
-end_time_total = time.time()
-execution_time = end_time_total - start_time_total
-logging.info(f"Tiempo total de ejecución: {execution_time:.2f} segundos")
-print(f"Datos estructurados y almacenados en 'productos_scrapeados_v4.csv'")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping de las páginas de producto")
+    parser.add_argument("--csv", default="C:/Users/johan/Desktop/Data/Caso uno/src/scraping/productos_20241006_165851.csv",
+                        help="CSV con las columnas URL, Posición y Paginación")
+    parser.add_argument("--salida", default="productos_scrapeados_v4.csv", help="CSV de salida (o carpeta .parquet)")
+    parser.add_argument("--resume", action="store_true", help="Reanudar omitiendo las URLs ya guardadas")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="Registros por punto de control")
+    parser.add_argument("--archivo", help="Carpeta donde archivar el HTML descargado para reextraerlo sin red")
+    parser.add_argument("--metricas", help="Ruta del informe JSON de métricas de la ejecución")
+    parser.add_argument("--metricas-prom", help="Ruta del archivo de métricas para Prometheus (textfile collector)")
+    args = parser.parse_args()
+
+    # Comenzar a medir el tiempo total
+    start_time_total = time.time()
+
+    # Cargar el archivo CSV con las URLs, posiciones y paginaciones
+    product_df = pd.read_csv(args.csv)
+    if args.archivo:
+        configure_archive(args.archivo).register_listing(product_df)  # Filas y orden del listado para reextraer
+
+    # Caché en disco de las páginas descargadas en ejecuciones anteriores
+    cache = ResponseCache('cache_productos.sqlite')
+
+    # Los registros se escriben por lotes con puntos de control en lugar de acumularse en memoria
+    writer = open_writer(args.salida, batch_size=args.lote, resume=args.resume)
+
+    # Iterar sobre las filas del DataFrame
+    for index, row in product_df.iterrows():
+        url = row['URL']
+        position = row['Posición']
+        pagination = row['Paginación']
+        if writer.is_done(url):
+            continue  # Ya se guardó en una ejecución anterior
+        print(f"Scrapeando URL: {url} (Posición: {position}, Paginación: {pagination})")
+
+        product_data = scrape_product(url, position, pagination, cache=cache)
+        if product_data:
+            writer.add(url, product_data)
+
+    # Escribir el último lote pendiente
+    writer.close()
+    logging.info(f"Datos estructurados y almacenados en {args.salida}")
+    get_client().log_stats()  # Reutilización de conexiones durante la ejecución
+    cache.log_summary()  # Aciertos y fallos de la caché de respuestas
+    cache.close()
+    get_metrics().export(args.metricas, args.metricas_prom)
+
+    # Calcular el tiempo total de ejecución
+    end_time_total = time.time()
+    execution_time = end_time_total - start_time_total
+    logging.info(f"Tiempo total de ejecución: {execution_time:.2f} segundos")
+    print(f"Datos estructurados y almacenados en '{args.salida}'")
@@ -1,8 +1,17 @@
+import argparse
+import math
+import re
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 import pandas as pd
 import logging
 from datetime import datetime
+from urllib.parse import urljoin
+from http_client import configure_client, get_client  # Sesión HTTP compartida con conexiones keep-alive
+from rate_limiter import RETRY_STATUS, get_limiter  # Limitador de tasa adaptativo por dominio
+from metrics import get_metrics  # Tiempos por fase, tamaños, estados y reintentos
 
 # Configuración del sistema de logging
 def setup_logger():
@@ -17,52 +26,123 @@ def setup_logger():
 
 logger = setup_logger()
 
-def extract_products(url):
+# Patrón de la paginación de los listados (?page=N)
+PAGE_PATTERN = re.compile(r'^\?page=(\d+)$')
+# Total de productos que muestra el listado ("1.234 Productos", con punto de miles)
+TOTAL_PATTERN = re.compile(r'\d[\d.]*')
+
+# Descarga una página del listado y devuelve los enlaces de producto, el enlace a la página siguiente y el
+# total de productos de la categoría (None si la página no lo muestra)
+def fetch_listing_page(url, max_retries=3):
+    limiter = get_limiter()  # Ritmo de solicitudes compartido por dominio
+    metrics = get_metrics()
+    for attempt in range(1, max_retries + 1):
+        limiter.acquire(url)
+        request_start = time.time()
+        response = get_client().get(url)
+        retry_delay = limiter.record(url, time.time() - request_start, response.status_code, response.headers, attempt)
+        metrics.record_response("listado", response)
+        if response.status_code not in RETRY_STATUS:
+            break
+        metrics.inc("retries_total", page="listado", reason=str(response.status_code))
+        # 429/503...: el limitador ya pausó el dominio (Retry-After o backoff) antes del siguiente intento
+        logger.warning(f"Servidor saturado en {url} (código {response.status_code}). "
+                       f"Reintentando en {retry_delay:.1f} s ({attempt}/{max_retries})...")
+    response.raise_for_status()  # Lanzamos una excepción para códigos de estado HTTP no exitosos
+    with metrics.timer("parse_seconds", backend="listado"):
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # Encuentra todos los productos en la página
+        product_links = [product['href'] for product in soup.find_all('a', class_='vtex-product-summary-2-x-clearLink')]
+
+        # Buscamos el enlace "Mostrar más"
+        next_button = soup.find('a', href=lambda x: x and 'page=' in x)
+
+        total_element = soup.find(class_=lambda x: x and 'totalProducts' in x)
+        total = TOTAL_PATTERN.search(total_element.get_text()) if total_element else None
+    next_href = next_button['href'] if next_button else None
+    return product_links, next_href, int(total.group().replace('.', '')) if total else None
+
+def extract_products(url, prefetch=0):
     products = []
     seen_urls = set()  # Para almacenar URLs vistas y evitar duplicados
     page_number = 1  # Contador de la página
-    
-    while url:
-        logger.info(f"Extrayendo datos de: {url}")
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()  # Lanzamos una excepción para códigos de estado HTTP no exitosos
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Encuentra todos los productos en la página
-            product_links = soup.find_all('a', class_='vtex-product-summary-2-x-clearLink')
-            
-            for product in product_links:
-                product_url = f"https://www.arturocalle.com{product['href']}"  # Ajustamos el dominio aquí
-                
-                if product_url not in seen_urls:  # Verificamos si la URL ya fue vista
-                    seen_urls.add(product_url)  # Marcamos como vista para no repetir algún producto
-                    products.append({
-                        'URL': product_url,
-                        'Posición': len(products) + 1,  # Posición en la lista
-                        'Paginación': page_number  # Número de la página actual
-                    })
-            
-            logger.info(f"Extraídos {len(product_links)} productos de la página {page_number}")
-            
-            # Buscamos el enlace "Mostrar más"
-            next_button = soup.find('a', href=lambda x: x and 'page=' in x)
-            if next_button:
-                # Construimos la URL de la siguiente página utilizando la base de la URL de la categoría
-                url = f"{url.split('?')[0]}{next_button['href']}"  # Mantenemos la categoría en la URL
-                page_number += 1  # Incrementamos el número de la página
-            else:
-                logger.info(f"No se encontraron más páginas para {url}")
-                url = None  # No hay más páginas
-        
-        except requests.RequestException as e:
-            logger.error(f"Error al acceder a la URL {url}: {str(e)}")
-            url = None  # Terminamos el bucle si hay un error
-    
+    base_url = url.split('?')[0]
+    pending = {}  # Páginas descargadas por adelantado: número de página -> (URL, futuro)
+    last_page = None  # Última página según el total de productos del listado, si la página lo muestra
+
+    with ThreadPoolExecutor(max_workers=max(prefetch, 1)) as executor:
+        while url:
+            logger.info(f"Extrayendo datos de: {url}")
+            try:
+                # Usamos la descarga adelantada solo si corresponde exactamente a la URL que toca
+                prefetched = pending.pop(page_number, None)
+                if prefetched and prefetched[0] == url:
+                    product_links, next_href, total = prefetched[1].result()
+                else:
+                    product_links, next_href, total = fetch_listing_page(url)
+                if page_number == 1 and total and product_links:
+                    last_page = math.ceil(total / len(product_links))
+
+                # Las páginas se procesan siempre en orden, así Posición y Paginación no dependen del paralelismo
+                for href in product_links:
+                    product_url = urljoin(url, href)  # Enlace relativo al dominio del listado
+
+                    if product_url not in seen_urls:  # Verificamos si la URL ya fue vista
+                        seen_urls.add(product_url)  # Marcamos como vista para no repetir algún producto
+                        products.append({
+                            'URL': product_url,
+                            'Posición': len(products) + 1,  # Posición en la lista
+                            'Paginación': page_number  # Número de la página actual
+                        })
+
+                logger.info(f"Extraídos {len(product_links)} productos de la página {page_number}")
+                get_metrics().inc("listing_products_total", len(product_links))
+
+                if next_href:
+                    # Construimos la URL de la siguiente página utilizando la base de la URL de la categoría
+                    url = f"{base_url}{next_href}"  # Mantenemos la categoría en la URL
+                    page_number += 1  # Incrementamos el número de la página
+
+                    # Si el enlace sigue el patrón ?page=N, pedimos en paralelo las siguientes páginas, sin pasar de
+                    # la última según el total de productos. Si el listado no muestra el total no se adelanta
+                    # nada: cada página se pide al ver el "Mostrar más" de la anterior.
+                    match = PAGE_PATTERN.match(next_href)
+                    if prefetch and last_page and match and int(match.group(1)) == page_number:
+                        for ahead in range(page_number, min(page_number + prefetch, last_page + 1)):
+                            if ahead not in pending:
+                                ahead_url = f"{base_url}?page={ahead}"
+                                pending[ahead] = (ahead_url, executor.submit(fetch_listing_page, ahead_url))
+                else:
+                    logger.info(f"No se encontraron más páginas para {url}")
+                    url = None  # No hay más páginas
+
+            except requests.RequestException as e:
+                logger.error(f"Error al acceder a la URL {url}: {str(e)}")
+                get_metrics().inc("errors_total", page="listado")
+                url = None  # Terminamos el bucle si hay un error
+
+        # Descartamos las páginas pedidas de más después de la última
+        for _, future in pending.values():
+            future.cancel()
+
     logger.info(f"Extracción completada para la URL inicial. Total de productos: {len(products)}")
     return products
 
+# Extrae todas las categorías en paralelo; el resultado conserva el orden de category_urls
+def extract_categories(category_urls, max_workers=1, prefetch=0):
+    def extract_category(category_url):
+        logger.info(f"Iniciando extracción para: {category_url}")
+        products = extract_products(category_url, prefetch)  # Extraemos los productos de la categoría
+        logger.info(f"Extracción completada para {category_url}. Productos extraídos: {len(products)}")
+        return products
+
+    all_products = []  # Aquí almacenaremos todos los productos de todas las categorías
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        for products in executor.map(extract_category, category_urls):
+            all_products.extend(products)  # Agregamos los productos extraídos a la lista general
+    return all_products
+
 # Listamos las URLs iniciales de las categorías que vamos a scrapear
 category_urls = [
     'https://www.arturocalle.com/hombre',
@@ -73,19 +153,27 @@ category_urls = [
     'https://www.arturocalle.com/ofertas-arturo-calle'
 ]
 
-all_products = []  # Aquí almacenaremos todos los productos de todas las categorías
-
-# Iteramos sobre cada URL de categoría
-for category_url in category_urls:
-    logger.info(f"Iniciando extracción para: {category_url}")
-    products = extract_products(category_url)  # Extraemos los productos de la categoría
-    all_products.extend(products)  # Agregamos los productos extraídos a la lista general
-    logger.info(f"Extracción completada para {category_url}. Productos extraídos: {len(products)}")
-
-# Creamos un DataFrame y guardamos en CSV
-df = pd.DataFrame(all_products)
-csv_filename = f"productos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-df.to_csv(csv_filename, index=False)
-logger.info(f"Datos extraídos y guardados en {csv_filename}")
-print(f"Datos extraídos y guardados en {csv_filename}")
-logger.info("Proceso de scraping completado.")
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrae las URLs de producto de los listados de categorías")
+    parser.add_argument("--categorias-paralelas", type=int, default=len(category_urls),
+                        help="Categorías que se recorren a la vez")
+    parser.add_argument("--paginas-adelantadas", type=int, default=4,
+                        help="Páginas siguientes que se piden por adelantado en cada categoría (0 = secuencial)")
+    parser.add_argument("--metricas", help="Ruta del informe JSON de métricas de la ejecución")
+    parser.add_argument("--metricas-prom", help="Ruta del archivo de métricas para Prometheus (textfile collector)")
+    args = parser.parse_args()
+
+    # Una conexión keep-alive por cada descarga que puede estar en curso a la vez
+    configure_client(pool_maxsize=max(args.categorias_paralelas * (args.paginas_adelantadas + 1), 10))
+
+    all_products = extract_categories(category_urls, args.categorias_paralelas, args.paginas_adelantadas)
+
+    # Creamos un DataFrame y guardamos en CSV
+    df = pd.DataFrame(all_products)
+    csv_filename = f"productos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    df.to_csv(csv_filename, index=False)
+    logger.info(f"Datos extraídos y guardados en {csv_filename}")
+    get_client().log_stats()  # Reutilización de conexiones durante la ejecución
+    get_metrics().export(args.metricas, args.metricas_prom)
+    print(f"Datos extraídos y guardados en {csv_filename}")
+    logger.info("Proceso de scraping completado.")
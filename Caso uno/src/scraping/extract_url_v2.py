@@ -1,7 +1,12 @@
+import argparse
+import asyncio
+import time
 import pandas as pd
 import logging
 from datetime import datetime
+from urllib.parse import urlsplit
 from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 
 # Configuración del sistema de logging
 def setup_logger():
@@ -70,31 +75,169 @@ def extract_products(playwright, url):
         logger.error(f"Error al iniciar el navegador: {str(e)}")
         return []
 
-# Iniciamos Playwright y extraemos los productos
-with sync_playwright() as playwright:
-    # URLs de las categorías que deseas scrapear
-    category_urls = [
-        # 'https://www.arturocalle.com/hombre',
-        # 'https://www.arturocalle.com/woman',
-        'https://www.arturocalle.com/kids',
-        # 'https://www.arturocalle.com/viaje',
-        # 'https://www.arturocalle.com/marketplace',
-        'https://www.arturocalle.com/ofertas-arturo-calle'
-    ]
+# Recursos que el modo ligero no descarga: solo necesitamos el HTML con los enlaces de producto
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font', 'stylesheet'}
+BLOCKED_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'facebook.net',
+    'facebook.com', 'hotjar.com', 'clarity.ms', 'tiktok.com', 'vtexinsights.com'
+)
+PRODUCT_LINK_SELECTOR = 'a.vtex-product-summary-2-x-clearLink'
 
-    all_products = []  # Aquí almacenaremos todos los productos de todas las categorías
+# Cancela imágenes, fuentes, estilos y analítica antes de que salgan a la red
+async def block_heavy_resources(route):
+    request = route.request
+    host = urlsplit(request.url).hostname or ''
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or host.endswith(BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+# Recorre la paginación de una categoría en un contexto aislado dentro del navegador compartido
+async def extract_products_light(browser, url, contexts, stats):
+    products = []
+    seen_urls = set()  # Para almacenar URLs vistas y evitar duplicados
+    page_number = 1  # Contador de la página
+
+    async with contexts:  # Limita cuántos contextos hay abiertos a la vez
+        context = await browser.new_context()
+        await context.route('**/*', block_heavy_resources)
+        page = await context.new_page()
+
+        # Bytes realmente transferidos por las solicitudes que no se bloquearon. Cada conteo es una tarea
+        # propia que se espera antes de cerrar el contexto, para no perder las que aún están pendientes.
+        transferred = {'bytes': 0}
+        counting = set()
+
+        async def count_bytes(request):
+            try:
+                sizes = await request.sizes()
+                transferred['bytes'] += sizes['responseBodySize'] + sizes['responseHeadersSize']
+            except Exception:
+                pass  # La solicitud no tiene respuesta
+
+        def on_request_finished(request):
+            task = asyncio.ensure_future(count_bytes(request))
+            counting.add(task)
+            task.add_done_callback(counting.discard)
+
+        page.on('requestfinished', on_request_finished)
+
+        try:
+            while url:
+                logger.info(f"Extrayendo datos de: {url}")
+                try:
+                    # Esperamos a que aparezcan los enlaces de producto en lugar de a 'networkidle'
+                    await page.goto(url, wait_until='domcontentloaded')
+                    await page.wait_for_selector(PRODUCT_LINK_SELECTOR, timeout=30000)
+                    stats['pages'] += 1
+
+                    # Leemos todos los href en una sola llamada al navegador
+                    hrefs = await page.eval_on_selector_all(
+                        PRODUCT_LINK_SELECTOR, 'links => links.map(link => link.getAttribute("href"))'
+                    )
+
+                    for product_url in hrefs:
+                        full_url = f"https://www.arturocalle.com{product_url}"  # Formamos la URL completa
 
-    # Iteramos sobre cada URL de categoría
-    for category_url in category_urls:
-        logger.info(f"Iniciando extracción para: {category_url}")
-        products = extract_products(playwright, category_url)  # Extraemos los productos de la categoría
-        all_products.extend(products)  # Agregamos los productos extraídos a la lista general
+                        if full_url not in seen_urls:  # Verificamos si la URL ya fue vista
+                            seen_urls.add(full_url)  # Marcamos como vista para no repetir algún producto
+                            products.append({
+                                'URL': full_url,
+                                'Posición': len(products) + 1,  # Posición en la lista
+                                'Paginación': page_number  # Número de la página actual
+                            })
+
+                    logger.info(f"Extraídos {len(hrefs)} productos de la página {page_number}")
+
+                    # Intentamos localizar el botón de "Mostrar más" o el siguiente enlace de paginación
+                    next_button = await page.query_selector('a[href*="page="]')
+                    next_url = await next_button.get_attribute('href') if next_button else None
+                    if next_url:
+                        url = f"{url.split('?')[0]}{next_url}"  # Construimos la URL de la siguiente página
+                        page_number += 1  # Incrementamos el número de la página
+                    else:
+                        logger.info(f"No se encontraron más páginas para {url}")
+                        url = None  # No hay más páginas
+
+                except Exception as e:
+                    logger.error(f"Error al acceder a la URL {url}: {str(e)}")
+                    url = None  # Terminamos el bucle si hay un error
+        finally:
+            if counting:
+                await asyncio.gather(*counting)
+            await context.close()
+            stats['bytes'] += transferred['bytes']
+
+    logger.info(f"Extracción completada para la URL inicial. Total de productos: {len(products)}")
+    return products
+
+# Modo ligero: un solo Chromium y varias categorías en paralelo, cada una en su propio contexto
+async def extract_categories_light(category_urls, max_contexts=3):
+    stats = {'pages': 0, 'bytes': 0}
+    contexts = asyncio.Semaphore(max_contexts)
+    start_time = time.time()
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        try:
+            results = await asyncio.gather(*[
+                extract_products_light(browser, category_url, contexts, stats) for category_url in category_urls
+            ])
+        finally:
+            await browser.close()
+
+    # Rendimiento del recorrido: páginas por minuto y bytes transferidos por página
+    minutes = (time.time() - start_time) / 60
+    pages_per_minute = stats['pages'] / minutes if minutes else 0
+    bytes_per_page = stats['bytes'] / stats['pages'] if stats['pages'] else 0
+    logger.info(
+        f"Modo ligero: {stats['pages']} páginas, {pages_per_minute:.1f} páginas/minuto, "
+        f"{bytes_per_page / 1024:.1f} KB transferidos por página"
+    )
+    print(f"{stats['pages']} páginas | {pages_per_minute:.1f} páginas/minuto | {bytes_per_page / 1024:.1f} KB/página")
+
+    all_products = []  # Aquí almacenaremos todos los productos de todas las categorías
+    for category_url, products in zip(category_urls, results):
+        all_products.extend(products)  # gather conserva el orden de las categorías
         logger.info(f"Extracción completada para {category_url}. Productos extraídos: {len(products)}")
+    return all_products
+
+# URLs de las categorías que deseas scrapear
+category_urls = [
+    # 'https://www.arturocalle.com/hombre',
+    # 'https://www.arturocalle.com/woman',
+    'https://www.arturocalle.com/kids',
+    # 'https://www.arturocalle.com/viaje',
+    # 'https://www.arturocalle.com/marketplace',
+    'https://www.arturocalle.com/ofertas-arturo-calle'
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrae las URLs de producto con Playwright")
+    parser.add_argument("--modo", choices=["ligero", "completo"], default="ligero",
+                        help="ligero: un navegador y contextos en paralelo sin recursos pesados; "
+                             "completo: un navegador por categoría esperando 'networkidle'")
+    parser.add_argument("--contextos", type=int, default=3, help="Contextos en paralelo en el modo ligero")
+    args = parser.parse_args()
+
+    if args.modo == "ligero":
+        all_products = asyncio.run(extract_categories_light(category_urls, args.contextos))
+    else:
+        # Iniciamos Playwright y extraemos los productos
+        with sync_playwright() as playwright:
+            all_products = []  # Aquí almacenaremos todos los productos de todas las categorías
+
+            # Iteramos sobre cada URL de categoría
+            for category_url in category_urls:
+                logger.info(f"Iniciando extracción para: {category_url}")
+                products = extract_products(playwright, category_url)  # Extraemos los productos de la categoría
+                all_products.extend(products)  # Agregamos los productos extraídos a la lista general
+                logger.info(f"Extracción completada para {category_url}. Productos extraídos: {len(products)}")
 
-# Creamos un DataFrame y guardamos en CSV
-df = pd.DataFrame(all_products)
-csv_filename = f"productos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-df.to_csv(csv_filename, index=False)
-logger.info(f"Datos extraídos y guardados en {csv_filename}")
-print(f"Datos extraídos y guardados en {csv_filename}")
-logger.info("Proceso de scraping completado.")
\ No newline at end of file
+    # Creamos un DataFrame y guardamos en CSV
+    df = pd.DataFrame(all_products)
+    csv_filename = f"productos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    df.to_csv(csv_filename, index=False)
+    logger.info(f"Datos extraídos y guardados en {csv_filename}")
+    print(f"Datos extraídos y guardados en {csv_filename}")
+    logger.info("Proceso de scraping completado.")
@@ -0,0 +1,536 @@
+import html
+import json
+import re
+
+from bs4 import BeautifulSoup
+
+from metrics import get_metrics
+
+# lxml es opcional: si no está instalado solo queda disponible el backend de BeautifulSoup
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Clases VTEX de las que se extraen los campos del producto
+PRODUCT_NAME_CLASS = "vtex-store-components-3-x-productBrand"
+REFERENCE_CLASS = "vtex-product-identifier-0-x-product-identifier__value"
+PRICE_CLASS = "vtex-product-price-1-x-sellingPriceValue"
+DESCRIPTION_CLASS = "vtex-store-components-3-x-productDescriptionText"
+DETAILS_CLASS = "vtex-store-components-3-x-specificationItemSpecifications--especificacionesdeta"
+CARE_CLASS = "vtex-store-components-3-x-specificationItemSpecifications--especificacionesapli"
+IMAGES_CLASS = "vtex-store-components-3-x-carouselGaleryCursor"
+IMAGE_TAG_CLASS = "vtex-store-components-3-x-productImageTag"
+COLORS_CLASS = "vtex-store-components-3-x-skuSelectorSubcontainer--colores"
+SIZES_CLASS = "vtex-store-components-3-x-skuSelectorSubcontainer--talla"
+SKU_ITEM_CLASS = "vtex-store-components-3-x-skuSelectorItem"
+SKU_ITEM_TEXT_CLASS = "vtex-store-components-3-x-skuSelectorItemTextValue"
+SKU_CROSSED_CLASS = "vtex-store-components-3-x-diagonalCross"
+SKU_DISABLED_CLASS = "vtex-store-components-3-x-skuSelectorItem--disabled"
+DISCOUNT_CLASS = "vtex-store-components-3-x-discountContainer"
+DISCOUNT_VALUE_CLASS = "vtex-store-components-3-x-discountInsideContainer"
+
+# Interfaz común de los backends: reciben el HTML y devuelven los campos del producto
+class Extractor:
+    name = None
+    # Se sube al cambiar lo que devuelve el backend, para que la caché de respuestas no reutilice registros
+    # extraídos con la versión anterior
+    version = 1
+
+    # Backend y versión con los que se guarda un registro en la caché de respuestas
+    @property
+    def cache_key(self):
+        return f"{self.name}:{self.version}"
+
+    def extract(self, content):
+        raise NotImplementedError
+
+# Backend original: árbol completo de BeautifulSoup y una búsqueda por cada campo
+class BeautifulSoupExtractor(Extractor):
+    name = "bs4"
+
+    def extract(self, content):
+        clock = get_metrics().field_clock(self.name)  # Tiempo de extracción de cada campo
+        soup = BeautifulSoup(content, "html.parser")  # Parsear el contenido HTML
+        clock.lap("arbol")
+
+        # Extraer el nombre del producto
+        product_name = soup.find("span", class_=PRODUCT_NAME_CLASS)
+        product_name = (
+            product_name.get_text(strip=True) if product_name else "Nombre no disponible"
+        )
+        clock.lap("nombre")
+
+        # Extraer la categoría principal y subcategorías (breadcrumb)
+        breadcrumb = soup.find("div", {"data-testid": "breadcrumb"})
+        categories = []
+        if breadcrumb:
+            links = breadcrumb.find_all("a")
+            categories = [link.get_text(strip=True) for link in links if link.get_text(strip=True)]
+            main_category = categories[0] if categories else None
+            subcategories = categories[1:] if len(categories) > 1 else []
+        else:
+            main_category = None
+            subcategories = []
+        clock.lap("categorias")
+
+        # Extraer la referencia
+        reference = soup.find("span", class_=REFERENCE_CLASS)
+        reference = (
+            reference.get_text(strip=True) if reference else "Referencia no disponible"
+        )
+        clock.lap("referencia")
+
+        # Extracción del precio
+        price_container = soup.find("span", class_=PRICE_CLASS)
+        price = (
+            price_container.get_text(strip=True) if price_container else "Precio no disponible"
+        )
+        clock.lap("precio")
+
+        # Extracción de la descripción del producto
+        description_container = soup.find("div", class_=DESCRIPTION_CLASS)
+        description = (
+            " ".join(part.strip() for part in description_container.strings if part.strip() and "Mostrar más" not in part)
+            if description_container else "Descripción no disponible"
+        )
+        clock.lap("descripcion")
+
+        # Extracción de los detalles del producto
+        product_details = {}
+        details_container = soup.find("td", class_=DETAILS_CLASS)
+        if details_container:
+            for li in details_container.find_all("li"):
+                text = li.text.strip()
+                try:
+                    key, value = text.split(":", 1)
+                    product_details[key.strip()] = value.strip()
+                except ValueError:
+                    continue  # Omite si no se puede dividir
+        clock.lap("detalles")
+
+        # Extracción de las recomendaciones de cuidado
+        care_instructions = []
+        care_container = soup.find("td", class_=CARE_CLASS)
+        if care_container:
+            care_instructions = [li.text.strip() for li in care_container.find_all("li")]
+        clock.lap("cuidado")
+
+        # Extracción de imágenes del producto
+        image_urls = []
+        image_container = soup.find("div", class_=IMAGES_CLASS)
+        if image_container:
+            images = image_container.find_all("img", class_=IMAGE_TAG_CLASS)
+            for img in images:
+                src = img.get("src")
+                if src:
+                    base_url = src.split("?")[0]  # Extraer la URL de la imagen de mayor resolución
+                    image_urls.append(base_url)
+        clock.lap("imagenes")
+
+        # Extracción de los colores disponibles
+        colors_container = soup.find('div', class_=COLORS_CLASS)
+        colors = []
+        if colors_container:
+            color_options = colors_container.find_all('div', class_=SKU_ITEM_CLASS)
+            for option in color_options:
+                if SKU_CROSSED_CLASS not in option.get('class', []) and \
+                SKU_DISABLED_CLASS not in option.get('class', []) and \
+                option.get('aria-disabled') != 'true':
+                    color_name = option.find('div', class_=SKU_ITEM_TEXT_CLASS)
+                    color_name = color_name.get_text(strip=True) if color_name else "Color no disponible"
+                    colors.append(color_name)
+        clock.lap("colores")
+
+        # Extracción de las tallas disponibles
+        sizes_container = soup.find('div', class_=SIZES_CLASS)
+        sizes = []
+        if sizes_container:
+            size_options = sizes_container.find_all('div', class_=SKU_ITEM_CLASS)
+            for option in size_options:
+                if SKU_CROSSED_CLASS not in option.get('class', []) and \
+                SKU_DISABLED_CLASS not in option.get('class', []) and \
+                option.get('aria-disabled') != 'true':
+                    size_name = option.find('div', class_=SKU_ITEM_TEXT_CLASS)
+                    size_name = size_name.get_text(strip=True) if size_name else "Talla no disponible"
+                    sizes.append(size_name)
+        clock.lap("tallas")
+
+        # Extracción del descuento
+        discount_container = soup.find('div', class_=DISCOUNT_CLASS)
+        discount = "0%"  # Valor por defecto si no hay descuento
+        if discount_container:
+            discount_value = discount_container.find('div', class_=DISCOUNT_VALUE_CLASS)
+            if discount_value:
+                discount = discount_value.get_text(strip=True)
+        clock.lap("descuento")
+
+        # Empaquetar la información en un diccionario
+        product_data = {
+            "Nombre del Producto": product_name,
+            "Categoría Principal": main_category,
+            "Subcategorías": subcategories,
+            "Referencia": reference,
+            "Precio": price,
+            "Descuento": discount,
+            "Colores Disponibles": colors,
+            "Tallas Disponibles": sizes,
+            "Descripción del Producto": description,
+            "Detalles del Producto": product_details,
+            "Recomendaciones de Cuidado": care_instructions,
+            "URLs de Imágenes": image_urls
+        }
+        return product_data
+
+# Contenedores que se buscan en la pasada única: (etiqueta, clase) -> campo
+_TARGETS = {
+    ("span", PRODUCT_NAME_CLASS): "name",
+    ("span", REFERENCE_CLASS): "reference",
+    ("span", PRICE_CLASS): "price",
+    ("div", DESCRIPTION_CLASS): "description",
+    ("td", DETAILS_CLASS): "details",
+    ("td", CARE_CLASS): "care",
+    ("div", IMAGES_CLASS): "images",
+    ("div", COLORS_CLASS): "colors",
+    ("div", SIZES_CLASS): "sizes",
+    ("div", DISCOUNT_CLASS): "discount",
+}
+
+# Condición XPath equivalente a class_="..." de BeautifulSoup (la clase como palabra completa)
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+# Una sola expresión XPath con la unión de todos los contenedores: libxml2 recorre el documento una vez
+_TARGETS_XPATH = " | ".join(
+    [f"//{tag}[{_has_class(class_name)}]" for tag, class_name in _TARGETS]
+    + ["//div[@data-testid='breadcrumb']"]
+)
+_SKU_ITEM_XPATH = f".//div[{_has_class(SKU_ITEM_CLASS)}]"
+_SKU_ITEM_TEXT_XPATH = f".//div[{_has_class(SKU_ITEM_TEXT_CLASS)}]"
+_IMAGE_TAG_XPATH = f".//img[{_has_class(IMAGE_TAG_CLASS)}]"
+_DISCOUNT_VALUE_XPATH = f".//div[{_has_class(DISCOUNT_VALUE_CLASS)}]"
+
+# Equivalente de get_text(strip=True) de BeautifulSoup
+def _stripped_text(element):
+    return "".join(part.strip() for part in element.itertext())
+
+# Equivalente de .text.strip() de BeautifulSoup
+def _text(element):
+    return "".join(element.itertext()).strip()
+
+# Backend rápido: parser C de lxml y una sola consulta XPath restringida a los contenedores necesarios
+class LxmlExtractor(Extractor):
+    name = "lxml"
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("El backend 'lxml' requiere instalar lxml")
+        self.parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True)
+
+    def extract(self, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        clock = get_metrics().field_clock(self.name)  # Tiempo de extracción de cada campo
+        tree = lxml.html.document_fromstring(content, parser=self.parser)
+        clock.lap("arbol")
+
+        # Nos quedamos con el primer elemento de cada contenedor, igual que soup.find
+        found = {}
+        for element in tree.xpath(_TARGETS_XPATH):
+            if element.get("data-testid") == "breadcrumb" and element.tag == "div":
+                found.setdefault("breadcrumb", element)
+            for class_name in element.get("class", "").split():
+                field = _TARGETS.get((element.tag, class_name))
+                if field:
+                    found.setdefault(field, element)
+        clock.lap("contenedores")
+
+        product_name = _stripped_text(found["name"]) if "name" in found else "Nombre no disponible"
+        clock.lap("nombre")
+
+        main_category = None
+        subcategories = []
+        if "breadcrumb" in found:
+            categories = [_stripped_text(link) for link in found["breadcrumb"].iter("a")]
+            categories = [category for category in categories if category]
+            main_category = categories[0] if categories else None
+            subcategories = categories[1:] if len(categories) > 1 else []
+        clock.lap("categorias")
+
+        reference = _stripped_text(found["reference"]) if "reference" in found else "Referencia no disponible"
+        clock.lap("referencia")
+        price = _stripped_text(found["price"]) if "price" in found else "Precio no disponible"
+        clock.lap("precio")
+
+        description = (
+            " ".join(part.strip() for part in found["description"].itertext() if part.strip() and "Mostrar más" not in part)
+            if "description" in found else "Descripción no disponible"
+        )
+        clock.lap("descripcion")
+
+        product_details = {}
+        if "details" in found:
+            for li in found["details"].iter("li"):
+                try:
+                    key, value = _text(li).split(":", 1)
+                    product_details[key.strip()] = value.strip()
+                except ValueError:
+                    continue  # Omite si no se puede dividir
+        clock.lap("detalles")
+
+        care_instructions = [_text(li) for li in found["care"].iter("li")] if "care" in found else []
+        clock.lap("cuidado")
+
+        image_urls = []
+        if "images" in found:
+            for img in found["images"].xpath(_IMAGE_TAG_XPATH):
+                src = img.get("src")
+                if src:
+                    image_urls.append(src.split("?")[0])  # URL de la imagen de mayor resolución
+        clock.lap("imagenes")
+
+        colors = self._sku_values(found.get("colors"), "Color no disponible")
+        clock.lap("colores")
+        sizes = self._sku_values(found.get("sizes"), "Talla no disponible")
+        clock.lap("tallas")
+
+        discount = "0%"  # Valor por defecto si no hay descuento
+        if "discount" in found:
+            discount_value = found["discount"].xpath(_DISCOUNT_VALUE_XPATH)
+            if discount_value:
+                discount = _stripped_text(discount_value[0])
+        clock.lap("descuento")
+
+        return {
+            "Nombre del Producto": product_name,
+            "Categoría Principal": main_category,
+            "Subcategorías": subcategories,
+            "Referencia": reference,
+            "Precio": price,
+            "Descuento": discount,
+            "Colores Disponibles": colors,
+            "Tallas Disponibles": sizes,
+            "Descripción del Producto": description,
+            "Detalles del Producto": product_details,
+            "Recomendaciones de Cuidado": care_instructions,
+            "URLs de Imágenes": image_urls
+        }
+
+    # Opciones habilitadas de un selector de SKU (colores o tallas)
+    @staticmethod
+    def _sku_values(container, missing):
+        values = []
+        if container is None:
+            return values
+        for option in container.xpath(_SKU_ITEM_XPATH):
+            classes = option.get("class", "").split()
+            if SKU_CROSSED_CLASS not in classes and SKU_DISABLED_CLASS not in classes and \
+                    option.get("aria-disabled") != "true":
+                text_value = option.xpath(_SKU_ITEM_TEXT_XPATH)
+                values.append(_stripped_text(text_value[0]) if text_value else missing)
+        return values
+
+# Marcadores del bloque JSON con el estado de la página que VTEX IO incrusta en el HTML
+STATE_MARKER = b'data-varname="__STATE__"'
+SCRIPT_OPEN = b"<script>"
+SCRIPT_CLOSE = b"</script>"
+
+# Tamaño de las imágenes que muestra el carrusel de la tienda (ids/<imageId>-<ancho>-<alto>)
+IMAGE_SIZE = "800-1067"
+IMAGE_BASE_URL = "https://arturocalle.vtexassets.com/arquivos/ids/"
+
+# Nombres de las propiedades y especificaciones de SKU en el estado de VTEX
+DETAILS_PROPERTY = "Especificaciones Detalladas"
+CARE_PROPERTY = "Especificaciones Aplicación"
+COLORS_SPECIFICATION = "Colores"
+SIZES_SPECIFICATION = "Talla"
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_LI_RE = re.compile(r"<li[^>]*>(.*?)</li>", re.S | re.I)
+
+# Textos de un fragmento HTML, igual que los .strings de BeautifulSoup
+def _html_strings(fragment):
+    return [html.unescape(part) for part in _TAG_RE.split(fragment)]
+
+# Texto de cada <li> de un fragmento HTML, igual que li.text.strip()
+def _html_list_items(fragment):
+    return ["".join(_html_strings(item)).strip() for item in _LI_RE.findall(fragment)]
+
+# Precio en el formato que muestra la tienda: 465985 -> "$465.985,00"
+def _format_price(value):
+    return "$" + f"{value:,.2f}".translate(str.maketrans(",.", ".,"))
+
+# Backend estructurado: lee el JSON __STATE__ de la página sin construir ningún árbol HTML.
+# Si la página no trae el estado (o no contiene el producto) se usa el backend HTML por defecto.
+class VtexStateExtractor(Extractor):
+    name = "vtex-json"
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+        self.fallbacks = 0  # Páginas que tuvieron que extraerse del HTML
+
+    def extract(self, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        clock = get_metrics().field_clock(self.name)  # Tiempo de lectura del estado y de los campos
+        state = self._load_state(content)
+        product_key = self._product_key(state) if state else None
+        clock.lap("estado")
+        if product_key is None:
+            self.fallbacks += 1
+            return get_extractor(self.fallback or _html_backend()).extract(content)
+        product_data = self._extract_from_state(state, product_key)
+        clock.lap("campos")
+        return product_data
+
+    # Localiza el bloque __STATE__ con búsquedas de bytes y lo decodifica
+    @staticmethod
+    def _load_state(content):
+        marker = content.find(STATE_MARKER)
+        if marker == -1:
+            return None
+        start = content.find(SCRIPT_OPEN, marker)
+        end = content.find(SCRIPT_CLOSE, start)
+        if start == -1 or end == -1:
+            return None
+        try:
+            return json.loads(content[start + len(SCRIPT_OPEN):end])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _product_key(state):
+        for key, value in state.items():
+            if key.startswith("Product:") and isinstance(value, dict) and "productName" in value:
+                return key
+        return None
+
+    # Sigue las referencias normalizadas de Apollo ({"type": "id"}) y desempaqueta los valores JSON
+    @staticmethod
+    def _resolve(state, value):
+        if isinstance(value, dict):
+            if value.get("type") == "id":
+                return state.get(value["id"], {})
+            if value.get("type") == "json":
+                return value.get("json")
+        return value
+
+    def _extract_from_state(self, state, product_key):
+        resolve = lambda value: self._resolve(state, value)
+        product = state[product_key]
+
+        # Categorías: la ruta más profunda, p. ej. "/HOMBRE/Ropa/Trajes/"
+        category_paths = resolve(product.get("categories")) or []
+        deepest = max(category_paths, key=lambda path: path.count("/"), default="")
+        categories = [part for part in deepest.split("/") if part.strip()]
+        main_category = categories[0] if categories else None
+        subcategories = categories[1:] if len(categories) > 1 else []
+
+        description = product.get("description")
+        description = (
+            " ".join(part.strip() for part in _html_strings(description) if part.strip() and "Mostrar más" not in part)
+            if description else "Descripción no disponible"
+        )
+
+        properties = {}
+        for prop in (resolve(ref) for ref in product.get("properties", [])):
+            properties[prop.get("name")] = "".join(resolve(prop.get("values")) or [])
+
+        product_details = {}
+        for text in _html_list_items(properties.get(DETAILS_PROPERTY, "")):
+            try:
+                key, value = text.split(":", 1)
+                product_details[key.strip()] = value.strip()
+            except ValueError:
+                continue  # Omite si no se puede dividir
+        care_instructions = _html_list_items(properties.get(CARE_PROPERTY, ""))
+
+        # SKUs con su oferta; el primero con existencias es el que la tienda muestra seleccionado
+        items = []
+        items_key = next((key for key in product if key.startswith("items")), None)
+        for item in (resolve(ref) for ref in product.get(items_key, [])):
+            sellers = [resolve(ref) for ref in item.get("sellers", [])]
+            offer = resolve(sellers[0].get("commertialOffer")) if sellers else {}
+            variations = {}
+            for variation in (resolve(ref) for ref in item.get("variations", [])):
+                values = resolve(variation.get("values")) or []
+                if values:
+                    variations[variation.get("name")] = values[0]
+            items.append((item, offer, variations))
+
+        available = [entry for entry in items if entry[1].get("AvailableQuantity", 0) > 0]
+        selected = available[0] if available else (items[0] if items else None)
+
+        price = "Precio no disponible"
+        discount = "0%"  # Valor por defecto si no hay descuento
+        image_urls = []
+        if selected:
+            item, offer, _ = selected
+            if offer.get("Price") is not None:
+                price = _format_price(offer["Price"])
+            list_price = offer.get("ListPrice") or 0
+            if offer.get("Price") is not None and list_price > offer["Price"]:
+                discount = f"-{round((list_price - offer['Price']) * 100 / list_price)} %"
+            for image in (resolve(ref) for ref in item.get("images", [])):
+                if image.get("imageId"):
+                    image_urls.append(f"{IMAGE_BASE_URL}{image['imageId']}-{IMAGE_SIZE}")
+
+        # Valores de cada selector en su orden, solo los que tienen algún SKU con existencias
+        available_values = {}
+        for _, _, variations in available:
+            for name, value in variations.items():
+                available_values.setdefault(name, set()).add(value)
+        sku_values = {}
+        for specification in (resolve(ref) for ref in product.get("skuSpecifications", [])):
+            name = resolve(specification.get("field")).get("name")
+            values = [resolve(ref).get("name") for ref in specification.get("values", [])]
+            sku_values[name] = [value for value in values if value in available_values.get(name, ())]
+
+        return {
+            "Nombre del Producto": product.get("productName") or "Nombre no disponible",
+            "Categoría Principal": main_category,
+            "Subcategorías": subcategories,
+            "Referencia": product.get("productReference") or "Referencia no disponible",
+            "Precio": price,
+            "Descuento": discount,
+            "Colores Disponibles": sku_values.get(COLORS_SPECIFICATION, []),
+            "Tallas Disponibles": sku_values.get(SIZES_SPECIFICATION, []),
+            "Descripción del Producto": description,
+            "Detalles del Producto": product_details,
+            "Recomendaciones de Cuidado": care_instructions,
+            "URLs de Imágenes": image_urls
+        }
+
+# Backends disponibles por nombre
+EXTRACTORS = {
+    "bs4": BeautifulSoupExtractor,
+    "lxml": LxmlExtractor,
+    "vtex-json": VtexStateExtractor,
+}
+
+# Backend por defecto: BeautifulSoup. lxml (--parser lxml) solo se ha comparado con bs4 sobre las páginas de
+# fixtures/, reconstruidas a mano; pasa a ser el predeterminado cuando benchmark_parsers.py --archivo dé salida
+# idéntica sobre páginas reales archivadas
+DEFAULT_BACKEND = "bs4"
+
+_default_backend = DEFAULT_BACKEND
+_instances = {}
+
+# Backend HTML al que recurre el modo JSON cuando la página no trae el estado
+def _html_backend():
+    return _default_backend if _default_backend != "vtex-json" else DEFAULT_BACKEND
+
+# Cambia el backend que usan los scrapers cuando no se indica uno explícitamente
+def configure_extractor(name):
+    global _default_backend
+    get_extractor(name)  # Valida el nombre y que sus dependencias estén instaladas
+    _default_backend = name
+
+# Devuelve (y reutiliza) la instancia del backend pedido
+def get_extractor(name=None):
+    name = name or _default_backend
+    if name not in EXTRACTORS:
+        raise ValueError(f"Backend de extracción desconocido: {name}. Opciones: {', '.join(EXTRACTORS)}")
+    if name not in _instances:
+        _instances[name] = EXTRACTORS[name]()
+    return _instances[name]
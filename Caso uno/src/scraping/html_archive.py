@@ -0,0 +1,262 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from checkpoint import BATCH_SIZE, open_writer
+from extractors import EXTRACTORS, DEFAULT_BACKEND, get_extractor
+from response_cache import with_position
+
+# Tamaño a partir del cual se empieza un segmento nuevo
+SEGMENT_BYTES = 100 * 1024 * 1024
+# Páginas que procesa cada tarea del pool durante la reextracción
+REPLAY_CHUNK = 200
+
+# Archivo de solo anexado con el HTML de cada página descargada, al estilo WARC: segmentos
+# segment-00001.warc.gz formados por un miembro gzip por página (cabeceras WARC + cuerpo), de modo que
+# cada registro se puede leer por separado con su posición y longitud. Un índice SQLite guarda, por URL
+# y fecha de descarga, dónde está cada registro junto con la posición del producto en el listado.
+# Si el cuerpo es idéntico al de la última captura de la URL solo se añade la fila al índice.
+# Cada ejecución registra además el listado que recorre (todas sus filas, en orden), para que la reextracción
+# reproduzca el listado completo y no solo una fila por URL.
+class HtmlArchive:
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, 'indice.sqlite'), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS capturas (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                position INTEGER,
+                pagination INTEGER
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_capturas_url ON capturas (url, fetched_at)")
+        # Filas de cada listado distinto (identificado por su hash) con su número de fila en el CSV del listado
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS listados (
+                listing TEXT NOT NULL,
+                sequence INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                position INTEGER,
+                pagination INTEGER,
+                PRIMARY KEY (listing, sequence)
+            )
+        """)
+        # Listado que recorrió cada ejecución
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ejecuciones (listing TEXT NOT NULL, started_at REAL NOT NULL)")
+        self.conn.commit()
+        segments = sorted(name for name in os.listdir(directory) if name.endswith('.warc.gz'))
+        self.segment = segments[-1] if segments else self._segment_name(1)
+
+    @staticmethod
+    def _segment_name(number):
+        return f"segment-{number:05d}.warc.gz"
+
+    # Añade una página descargada al archivo
+    def append(self, url, content, position=None, pagination=None, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        digest = hashlib.sha256(content).hexdigest()
+        position = int(position) if position is not None else None
+        pagination = int(pagination) if pagination is not None else None
+        with self.lock:
+            previous = self.conn.execute(
+                "SELECT segment, offset, length, content_hash FROM capturas WHERE url = ? "
+                "ORDER BY fetched_at DESC LIMIT 1", (url,)
+            ).fetchone()
+            if previous and previous[3] == digest:
+                segment, offset, length = previous[:3]  # La página no cambió: reutilizamos el registro
+            else:
+                segment, offset, length = self._write_record(url, content, digest, fetched_at)
+            self.conn.execute(
+                "INSERT INTO capturas VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, fetched_at, segment, offset, length, digest, position, pagination)
+            )
+            self.conn.commit()
+
+    # Registra el listado de la ejecución (columnas URL, Posición y Paginación, en el orden del CSV del listado).
+    # Posición se reinicia en cada categoría y una URL puede estar en varias, así que el orden del listado es el
+    # número de fila y no (paginación, posición)
+    def register_listing(self, product_df, started_at=None):
+        rows = [(url, int(position), int(pagination)) for url, position, pagination
+                in product_df[['URL', 'Posición', 'Paginación']].itertuples(index=False)]
+        listing = hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+        with self.lock:
+            if not self.conn.execute("SELECT 1 FROM listados WHERE listing = ? LIMIT 1", (listing,)).fetchone():
+                self.conn.executemany("INSERT INTO listados VALUES (?, ?, ?, ?, ?)",
+                                      [(listing, sequence, *row) for sequence, row in enumerate(rows)])
+            self.conn.execute("INSERT INTO ejecuciones VALUES (?, ?)", (listing, started_at or time.time()))
+            self.conn.commit()
+        return listing
+
+    # Escribe el registro comprimido al final del segmento actual (el índice se actualiza después,
+    # así una caída entre ambos pasos solo deja bytes sin referenciar)
+    def _write_record(self, url, content, digest, fetched_at):
+        path = os.path.join(self.directory, self.segment)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+            self.segment = self._segment_name(int(self.segment[8:13]) + 1)
+            path = os.path.join(self.directory, self.segment)
+        date = datetime.fromtimestamp(fetched_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        header = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"WARC-Date: {date}\r\n"
+            f"WARC-Payload-Digest: sha256:{digest}\r\n"
+            f"Content-Length: {len(content)}\r\n"
+            "\r\n"
+        ).encode('utf-8')
+        record = gzip.compress(header + content + b"\r\n\r\n")
+        with open(path, 'ab') as segment:
+            offset = segment.tell()
+            segment.write(record)
+            segment.flush()
+        return self.segment, offset, len(record)
+
+    # Última captura de cada URL (opcionalmente hasta una fecha), en el orden en que se descargaron
+    def latest_captures(self, until=None):
+        return self.conn.execute("""
+            SELECT c.url, c.fetched_at, c.segment, c.offset, c.length, c.position, c.pagination
+            FROM capturas c
+            JOIN (SELECT url, MAX(fetched_at) AS fetched_at FROM capturas WHERE fetched_at <= ? GROUP BY url) m
+              ON c.url = m.url AND c.fetched_at = m.fetched_at
+            ORDER BY c.fetched_at, c.url
+        """, (until or float('inf'),)).fetchall()
+
+    # Filas del listado de la última ejecución (opcionalmente hasta una fecha) en su orden, cada una con la última
+    # captura de su URL; las URLs repetidas salen una vez por fila y las que nunca se descargaron se omiten.
+    # Los archivos sin listados registrados (anteriores a register_listing) usan latest_captures.
+    def listing_captures(self, until=None):
+        until = until or float('inf')
+        run = self.conn.execute("SELECT listing FROM ejecuciones WHERE started_at <= ? ORDER BY started_at DESC LIMIT 1",
+                                (until,)).fetchone()
+        if run is None:
+            return self.latest_captures(until)
+        return self.conn.execute("""
+            SELECT c.url, c.fetched_at, c.segment, c.offset, c.length, l.position, l.pagination
+            FROM listados l
+            JOIN (SELECT url, MAX(fetched_at) AS fetched_at FROM capturas WHERE fetched_at <= ? GROUP BY url) m
+              ON l.url = m.url
+            JOIN capturas c ON c.url = m.url AND c.fetched_at = m.fetched_at
+            WHERE l.listing = ?
+            ORDER BY l.sequence
+        """, (until, run[0])).fetchall()
+
+    # HTML de una captura
+    def read(self, segment, offset, length):
+        with open(os.path.join(self.directory, segment), 'rb') as segment_file:
+            segment_file.seek(offset)
+            return read_record(segment_file.read(length))
+
+    def close(self):
+        self.conn.close()
+
+# Extrae el cuerpo de un registro comprimido
+def read_record(data):
+    record = gzip.decompress(data)
+    header, _, body = record.partition(b"\r\n\r\n")
+    for line in header.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            return body[:int(line.split(b":", 1)[1])]
+    return body[:-4]
+
+_archive = None
+
+# Activa el archivo compartido: a partir de aquí los scrapers guardan cada página descargada
+def configure_archive(directory, **kwargs):
+    global _archive
+    _archive = HtmlArchive(directory, **kwargs)
+    return _archive
+
+# Devuelve el archivo compartido, o None si no se activó
+def get_archive():
+    return _archive
+
+# Reextrae un bloque de capturas en un proceso del pool (sin red: solo lee los segmentos)
+def _extract_chunk(directory, captures, backend):
+    results = []
+    for url, fetched_at, segment, offset, length, position, pagination in captures:
+        try:
+            with open(os.path.join(directory, segment), 'rb') as segment_file:
+                segment_file.seek(offset)
+                content = read_record(segment_file.read(length))
+            product_data = with_position(get_extractor(backend).extract(content), position, pagination)
+            results.append((url, fetched_at, product_data))
+        except Exception as e:
+            logging.error(f"Error al reextraer {url}: {e}")
+            results.append((url, fetched_at, None))
+    return results
+
+# Vuelve a extraer los campos de cada fila del último listado archivado (listing_captures), repartiendo el
+# trabajo entre procesos. Cada registro se escribe con la fecha de su descarga original, así el diario sirve al
+# modo incremental. Al reanudar se omiten las filas ya escritas.
+def replay(directory, writer, backend=DEFAULT_BACKEND, workers=None, until=None, chunk_size=REPLAY_CHUNK):
+    archive = HtmlArchive(directory)
+    captures = archive.listing_captures(until)
+    archive.close()
+
+    # Las filas escritas son las primeras del listado salvo las que no se pudieron extraer: se recorren a la par
+    # con las URLs del diario hasta la última escrita
+    written = iter(writer.recovered)
+    expected = next(written, None)
+    start = 0
+    while expected is not None and start < len(captures):
+        if captures[start][0] == expected:
+            expected = next(written, None)
+        start += 1
+    captures = captures[start:]
+
+    chunks = [captures[i:i + chunk_size] for i in range(0, len(captures), chunk_size)]
+    extracted = 0
+    with ProcessPoolExecutor(workers) as pool:
+        # map conserva el orden de los bloques, así el CSV sale en el orden del listado
+        for results in pool.map(_extract_chunk, [directory] * len(chunks), chunks, [backend] * len(chunks)):
+            for url, fetched_at, product_data in results:
+                if product_data:
+                    writer.add(url, product_data, fetched_at)
+                    extracted += 1
+    writer.flush()
+    logging.info(f"Reextracción: {extracted} de {len(captures)} páginas archivadas")
+    return extracted, len(captures)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reextrae los productos desde el archivo de HTML, sin red")
+    parser.add_argument("--archivo", required=True, help="Carpeta del archivo de páginas")
+    parser.add_argument("--salida", default="productos_reextraidos.csv", help="CSV de salida (o carpeta .parquet)")
+    parser.add_argument("--parser", choices=list(EXTRACTORS), default=DEFAULT_BACKEND,
+                        help="Backend de extracción de los campos")
+    parser.add_argument("--procesos", type=int, help="Procesos de extracción (por defecto, uno por núcleo)")
+    parser.add_argument("--hasta", help="Usar solo capturas hasta esta fecha (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument("--resume", action="store_true", help="Reanudar omitiendo las URLs ya guardadas")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="Registros por punto de control")
+    args = parser.parse_args()
+    logging.basicConfig(
+        filename='scraping_productos.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    start_time_total = time.time()
+    until = datetime.strptime(args.hasta, '%Y-%m-%d %H:%M:%S').timestamp() if args.hasta else None
+    writer = open_writer(args.salida, batch_size=args.lote, resume=args.resume)
+    extracted, total = replay(args.archivo, writer, args.parser, args.procesos, until)
+    writer.close()
+
+    execution_time = time.time() - start_time_total
+    logging.info(f"Tiempo total de reextracción: {execution_time:.2f} segundos")
+    print(f"{extracted} de {total} productos reextraídos en '{args.salida}' en {execution_time:.2f} segundos")
@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Dependencias opcionales: brotli para comprimir con 'br', httpx + h2 para HTTP/2
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Cabeceras HTTP que se envían en cada solicitud
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Encoding": ACCEPT_ENCODING,
+}
+
+# Tiempo dedicado a abrir conexiones (resolución DNS + TCP + TLS) durante la solicitud en curso de cada hilo.
+# urllib3 no expone la resolución DNS por separado, así que con requests forma parte de la fase "connect".
+_connect_time = threading.local()
+
+class _TimedConnectionMixin:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - start
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+# Cliente HTTP compartido con conexiones keep-alive reutilizables entre solicitudes.
+# Cada respuesta lleva en response.timings la duración de sus fases (connect, ttfb, download, total).
+class HttpClient:
+    def __init__(self, pool_connections=10, pool_maxsize=20, http2=False):
+        self.http2 = http2 and httpx is not None
+        self.requests_made = 0
+        self.connections_opened = 0  # Solo se usa con HTTP/2 (httpx)
+        self.lock = threading.Lock()  # Los contadores se actualizan desde varios hilos con la misma sesión
+
+        if http2 and httpx is None:
+            logging.warning("httpx no está instalado; se usará HTTP/1.1 con requests")
+
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+            self.session = httpx.Client(http2=True, headers=HEADERS, limits=limits, follow_redirects=True)
+        else:
+            self.session = requests.Session()
+            self.session.headers.update(HEADERS)
+            # pool_connections: cuántos dominios se mantienen en caché; pool_maxsize: conexiones por dominio
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            adapter.poolmanager.pool_classes_by_scheme = {
+                "http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool
+            }
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.requests_made += 1
+        if not self.http2:
+            _connect_time.seconds = 0.0
+            start = time.perf_counter()
+            response = self.session.get(url, **kwargs)
+            total = time.perf_counter() - start
+            # elapsed va del envío a la recepción de las cabeceras; el cuerpo se lee después
+            headers_received = response.elapsed.total_seconds()
+            connect = _connect_time.seconds
+            response.timings = {
+                "connect": connect or None,  # Solo cuando se abrió una conexión nueva
+                "ttfb": max(headers_received - connect, 0.0),
+                "download": max(total - headers_received, 0.0),
+                "total": total,
+            }
+            return response
+
+        # Con httpx las fases y las conexiones TCP nuevas salen de la extensión de trazas
+        events = {}
+
+        def trace(event_name, info):
+            events[event_name] = time.perf_counter()
+            if event_name == "connection.connect_tcp.complete":
+                with self.lock:
+                    self.connections_opened += 1
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, extensions={"trace": trace}, **kwargs)
+        except httpx.TransportError as e:
+            # Convertimos el error para que los scrapers sigan capturando las excepciones de requests
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        converted = self._to_requests_response(response)
+        converted.timings = self._phase_timings(events, start, time.perf_counter())
+        return converted
+
+    # Duración de cada fase a partir de los eventos de traza de httpcore
+    @staticmethod
+    def _phase_timings(events, start, end):
+        def span(first, last):
+            return events[last] - events[first] if first in events and last in events else None
+
+        headers_sent = events.get("http2.send_request_headers.started", events.get("http11.send_request_headers.started"))
+        headers_received = events.get(
+            "http2.receive_response_headers.complete", events.get("http11.receive_response_headers.complete")
+        )
+        connect = span("connection.connect_tcp.started", "connection.connect_tcp.complete")
+        tls = span("connection.start_tls.started", "connection.start_tls.complete")
+        return {
+            "connect": connect + (tls or 0.0) if connect is not None else None,
+            "ttfb": headers_received - headers_sent if headers_sent and headers_received else None,
+            "download": end - headers_received if headers_received else None,
+            "total": end - start,
+        }
+
+    # Convierte una respuesta de httpx en una de requests para no cambiar el código de los scrapers
+    @staticmethod
+    def _to_requests_response(response):
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted._content = response.content
+        converted.headers = CaseInsensitiveDict(response.headers)
+        converted.url = str(response.url)
+        converted.encoding = response.encoding
+        converted.reason = response.reason_phrase
+        return converted
+
+    # Estadísticas de reutilización de conexiones (cada conexión nueva es un handshake TCP/TLS)
+    def stats(self):
+        with self.lock:
+            requests_made, connections_opened = self.requests_made, self.connections_opened
+        if self.http2:
+            new_connections = connections_opened
+        else:
+            # urllib3 lleva la cuenta de conexiones creadas en cada pool
+            new_connections = 0
+            for adapter in set(self.session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                new_connections += sum(pools[key].num_connections for key in pools.keys())
+        reused = max(requests_made - new_connections, 0)
+        return {
+            "requests": requests_made,
+            "new_connections": new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": reused / requests_made if requests_made else 0.0,
+            "http2": self.http2,
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(
+            f"Conexiones HTTP: {stats['requests']} solicitudes, {stats['new_connections']} conexiones nuevas, "
+            f"{stats['reused_connections']} reutilizadas ({stats['reuse_ratio']:.1%})"
+        )
+        return stats
+
+    def close(self):
+        self.session.close()
+
+_client = None
+
+# Configura (o reemplaza) el cliente compartido con otros tamaños de pool o HTTP/2
+def configure_client(pool_connections=10, pool_maxsize=20, http2=False):
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = HttpClient(pool_connections, pool_maxsize, http2)
+    return _client
+
+# Devuelve el cliente compartido, creándolo con la configuración por defecto si aún no existe
+def get_client():
+    if _client is None:
+        configure_client()
+    return _client
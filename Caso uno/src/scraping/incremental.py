@@ -0,0 +1,136 @@
+import argparse
+import logging
+import random
+import time
+
+import pandas as pd
+
+from async_scraper import MAX_CONCURRENCY, PER_HOST_CONCURRENCY, scrape_products
+from checkpoint import BATCH_SIZE, CheckpointWriter, read_journal
+from response_cache import ResponseCache
+
+# Antigüedad máxima de un registro antes de volver a scrapearlo, y fracción de los demás que se refresca
+MAX_AGE_DAYS = 7
+REFRESH_SAMPLE = 0.05
+
+# Recolector en memoria con la misma interfaz que CheckpointWriter: {URL: registro}
+class _Collector(dict):
+    batch_size = BATCH_SIZE
+
+    def is_done(self, url):
+        return False
+
+    def add(self, url, product_data, scraped_at=None):
+        self[url] = product_data
+
+    def flush(self):
+        pass
+
+# Carga el último dataset de productos junto con la URL y la fecha de scraping de cada fila (de su diario)
+def load_previous_products(products_csv):
+    # Leemos todo como texto para volver a escribir las celdas exactamente igual
+    previous_df = pd.read_csv(products_csv, dtype=str, keep_default_na=False)
+    urls, times = read_journal(products_csv)
+    if len(urls) != len(previous_df):
+        raise ValueError(
+            f"El diario de {products_csv} tiene {len(urls)} URLs pero el CSV tiene {len(previous_df)} filas"
+        )
+    previous_df['URL'] = urls
+    previous_df['scraped_at'] = times
+    return previous_df.drop_duplicates(subset='URL', keep='last').set_index('URL')
+
+# Decide qué URLs del listado nuevo hay que scrapear: las nuevas y un refresco de las existentes
+def plan_incremental(listing_df, previous_df, max_age_days=MAX_AGE_DAYS, sample=REFRESH_SAMPLE, seed=None,
+                     previous_listing_df=None, now=None):
+    now = now or time.time()
+    listing_urls = list(dict.fromkeys(listing_df['URL']))
+    known = [url for url in listing_urls if url in previous_df.index]
+    added = [url for url in listing_urls if url not in previous_df.index]
+
+    # Refresco por antigüedad
+    max_age_seconds = max_age_days * 24 * 3600
+    scraped_at = previous_df['scraped_at']
+    stale = [url for url in known if pd.isna(scraped_at[url]) or now - float(scraped_at[url]) > max_age_seconds]
+    # Refresco por muestreo de los que aún no han caducado
+    stale_set = set(stale)
+    fresh = [url for url in known if url not in stale_set]
+    sampled = random.Random(seed).sample(fresh, round(len(fresh) * sample)) if fresh else []
+
+    report = {
+        'listado': len(listing_urls),
+        'nuevas': len(added),
+        'caducadas': len(stale),
+        'muestreadas': len(sampled),
+        'arrastradas': len(known) - len(stale) - len(sampled),
+        'retiradas': len(set(previous_df.index) - set(listing_urls)),
+    }
+    if previous_listing_df is not None:
+        previous_listing_urls = set(previous_listing_df['URL'])
+        report['nuevas_en_listado'] = len([url for url in listing_urls if url not in previous_listing_urls])
+        report['retiradas_del_listado'] = len(previous_listing_urls - set(listing_urls))
+    return set(added) | set(stale) | set(sampled), report
+
+# Scrapea solo lo necesario y escribe el dataset nuevo en el orden del listado, arrastrando el resto
+def run_incremental(listing_df, products_csv, output_csv, max_age_days=MAX_AGE_DAYS, sample=REFRESH_SAMPLE,
+                    seed=None, previous_listing_df=None, max_concurrency=MAX_CONCURRENCY,
+                    per_host_concurrency=PER_HOST_CONCURRENCY, cache=None):
+    previous_df = load_previous_products(products_csv)
+    to_scrape, report = plan_incremental(listing_df, previous_df, max_age_days, sample, seed, previous_listing_df)
+    logging.info(f"Plan incremental: {report}")
+
+    scraped = _Collector()
+    scrape_products(
+        listing_df[listing_df['URL'].isin(to_scrape)].drop_duplicates(subset='URL'),
+        max_concurrency, per_host_concurrency, cache=cache, writer=scraped
+    )
+    report['fallidas'] = len(to_scrape) - len(scraped)
+
+    record_columns = [column for column in previous_df.columns if column != 'scraped_at']
+    writer = CheckpointWriter(output_csv)
+    seen = set()
+    for _, row in listing_df.iterrows():
+        url = row['URL']
+        if url in seen:
+            continue
+        seen.add(url)
+        if url in scraped:
+            writer.add(url, scraped[url])
+        elif url in previous_df.index:
+            # Registro sin cambios: se conserva tal cual, con la posición del listado nuevo y su fecha original
+            previous = previous_df.loc[url]
+            record = {column: previous[column] for column in record_columns}
+            record['Position'] = row['Posición']
+            record['Pagination'] = row['Paginación']
+            writer.add(url, record, None if pd.isna(previous['scraped_at']) else float(previous['scraped_at']))
+    writer.close()
+
+    logging.info(f"Dataset incremental escrito en {output_csv}: {report}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping incremental: solo URLs nuevas más un refresco parcial")
+    parser.add_argument("--listado", required=True, help="Listado nuevo (productos_YYYYMMDD_HHMMSS.csv)")
+    parser.add_argument("--listado-anterior", help="Listado anterior, solo para el informe de altas y bajas")
+    parser.add_argument("--productos", required=True, help="Último dataset de productos (con su .journal)")
+    parser.add_argument("--salida", required=True, help="CSV del dataset actualizado")
+    parser.add_argument("--max-edad-dias", type=float, default=MAX_AGE_DAYS,
+                        help="Se vuelven a scrapear los registros con más antigüedad")
+    parser.add_argument("--muestra", type=float, default=REFRESH_SAMPLE,
+                        help="Fracción de los registros vigentes que se refresca al azar")
+    parser.add_argument("--semilla", type=int, help="Semilla del muestreo, para repetir el mismo plan")
+    parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCY, help="Solicitudes simultáneas en total")
+    parser.add_argument("--cache", default="cache_productos.sqlite", help="Archivo de la caché de respuestas")
+    args = parser.parse_args()
+
+    start_time_total = time.time()
+    cache = ResponseCache(args.cache)
+    report = run_incremental(
+        pd.read_csv(args.listado), args.productos, args.salida, args.max_edad_dias, args.muestra, args.semilla,
+        pd.read_csv(args.listado_anterior) if args.listado_anterior else None, args.concurrencia, cache=cache
+    )
+    cache.log_summary()
+    cache.close()
+
+    execution_time = time.time() - start_time_total
+    logging.info(f"Tiempo total de ejecución: {execution_time:.2f} segundos")
+    print(f"Dataset actualizado en '{args.salida}' en {execution_time:.2f} segundos: {report}")
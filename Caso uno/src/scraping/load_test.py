@@ -0,0 +1,149 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from storefront_server import FaultConfig, StorefrontServer
+
+# Tamaños de tienda que se prueban por defecto
+SIZES = (1000, 10000, 100000)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Proceso de la tienda: así el servidor no compite por el GIL con el scraper que se mide
+def _serve(n_products, faults, seed, ready):
+    server = StorefrontServer(n_products, faults=faults, seed=seed)
+    ready.put((server.base_url, server.category_urls()))
+    server.serve_forever()
+
+# Memoria residente máxima del proceso (MiB)
+def _peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # Bytes en macOS, KiB en Linux
+
+# Resumen de una etapa a partir de las métricas registradas durante la ejecución
+def _stage_report(metrics, page, urls, elapsed):
+    total = metrics.histograms.get(("http_phase_seconds", (("page", page), ("phase", "total"))))
+    errors = sum(value for (name, labels), value in metrics.counters.items()
+                 if name == "errors_total" and ("page", page) in labels)
+    retries = sum(value for (name, labels), value in metrics.counters.items()
+                  if name == "retries_total" and ("page", page) in labels)
+    return {
+        "urls": urls,
+        "segundos": elapsed,
+        "urls_por_segundo": urls / elapsed if elapsed else None,
+        "p50": total.quantile(0.5) if total else None,
+        "p99": total.quantile(0.99) if total else None,
+        "reintentos": retries,
+        "errores": errors,
+    }
+
+# Recorre la tienda como en producción (listados con extract_url y productos con extract_product_info o el
+# motor asíncrono). Se ejecuta en un proceso nuevo para que la memoria máxima sea la de esta prueba.
+def _run_crawl(category_urls, options, work_dir):
+    os.chdir(work_dir)  # Los scrapers crean sus logs en el directorio actual
+    import pandas as pd
+    from async_scraper import scrape_products
+    from checkpoint import CheckpointWriter
+    from extract_product_info import scrape_product
+    from extract_url import extract_categories
+    from http_client import configure_client
+    from metrics import configure_metrics
+    from rate_limiter import configure_limiter
+
+    if not options['con_limitador']:
+        configure_limiter(initial_rate=1e6, max_rate=1e6, burst=1e6)  # Medimos el scraper, no el limitador
+    configure_client(pool_maxsize=max(len(category_urls) * (options['paginas_adelantadas'] + 1), 10))
+    metrics = configure_metrics()
+
+    start_time = time.time()
+    products = extract_categories(category_urls, len(category_urls), options['paginas_adelantadas'])
+    # En los listados las URLs son las páginas pedidas (incluidos los reintentos), no los productos encontrados
+    listing_requests = metrics.histograms.get(("http_phase_seconds", (("page", "listado"), ("phase", "total"))))
+    listing = _stage_report(metrics, "listado", listing_requests.count if listing_requests else 0,
+                            time.time() - start_time)
+
+    product_df = pd.DataFrame(products)
+    writer = CheckpointWriter(os.path.join(work_dir, 'productos.csv'))
+    start_time = time.time()
+    if options['motor'] == 'async':
+        scrape_products(product_df, options['concurrencia'], options['concurrencia'], writer=writer)
+    else:
+        for _, row in product_df.iterrows():
+            product_data = scrape_product(row['URL'], row['Posición'], row['Paginación'])
+            if product_data:
+                writer.add(row['URL'], product_data)
+    writer.close()
+    product_report = _stage_report(metrics, "producto", len(product_df), time.time() - start_time)
+    product_report["escritos"] = writer.written
+    product_report["errores"] = len(product_df) - writer.written  # Incluye respuestas 500 que no se reintentan
+
+    return {"listado": listing, "productos": product_report, "memoria_pico_mb": _peak_memory_mb()}
+
+def run_load_test(n_products, options):
+    context = multiprocessing.get_context('spawn')
+    faults = FaultConfig(options['latencia'], options['variacion'], options['errores'], options['limitadas'],
+                         options['retry_after'])
+    ready = context.Queue()
+    server = context.Process(target=_serve, args=(n_products, faults, options['semilla'], ready), daemon=True)
+    server.start()
+    try:
+        _, category_urls = ready.get(timeout=30)
+        with tempfile.TemporaryDirectory() as work_dir, context.Pool(1) as pool:
+            result = pool.apply(_run_crawl, (category_urls, options, work_dir))
+    finally:
+        server.terminate()
+        server.join()
+    result["productos_tienda"] = n_products
+    return result
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}" if seconds is not None else "n/d"
+
+def print_report(results):
+    print(f"{'Productos':>10} | {'Etapa':<9} | {'URLs/s':>8} | {'p50 ms':>8} | {'p99 ms':>8} | "
+          f"{'Reintentos':>10} | {'Errores':>7} | {'Memoria pico':>12}")
+    for result in results:
+        memory = f"{result['memoria_pico_mb']:.0f} MiB" if result['memoria_pico_mb'] is not None else "n/d"
+        for stage in ("listado", "productos"):
+            report = result[stage]
+            print(f"{result['productos_tienda']:>10} | {stage:<9} | {report['urls_por_segundo']:>8.1f} | "
+                  f"{_ms(report['p50']):>8} | {_ms(report['p99']):>8} | {report['reintentos']:>10} | "
+                  f"{report['errores']:>7} | {memory:>12}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de los scrapers contra la tienda local")
+    parser.add_argument("--tamanos", default=",".join(str(size) for size in SIZES),
+                        help="Productos de la tienda en cada prueba, separados por comas")
+    parser.add_argument("--motor", choices=["async", "secuencial"], default="async",
+                        help="Scraper de productos: async_scraper o extract_product_info")
+    parser.add_argument("--concurrencia", type=int, default=16, help="Solicitudes simultáneas del motor asíncrono")
+    parser.add_argument("--paginas-adelantadas", type=int, default=4, help="Páginas de listado pedidas por adelantado")
+    parser.add_argument("--latencia", type=float, default=0.005, help="Latencia del servidor (segundos)")
+    parser.add_argument("--variacion", type=float, default=0.0, help="Latencia aleatoria adicional (segundos)")
+    parser.add_argument("--errores", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--limitadas", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After de las respuestas 429")
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de las fallas inyectadas")
+    parser.add_argument("--con-limitador", action="store_true", help="Mantener el limitador de tasa por defecto")
+    parser.add_argument("--salida", help="Ruta del informe JSON con los resultados")
+    args = parser.parse_args()
+
+    options = {key: value for key, value in vars(args).items() if key not in ('tamanos', 'salida')}
+    results = []
+    for size in (int(size) for size in args.tamanos.split(',')):
+        print(f"Probando con {size} productos...", flush=True)
+        results.append(run_load_test(size, options))
+
+    print_report(results)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites superiores de los cubos de los histogramas (al estilo de Prometheus; el último es +Inf)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(1024 * 2 ** i for i in range(12))  # 1 KiB .. 2 MiB
+
+# Prefijo de las métricas exportadas a Prometheus
+METRIC_PREFIX = "scraper"
+
+# Histograma acumulativo con cubos fijos: memoria constante sin importar cuántas observaciones haya
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    # Suma las observaciones de otro histograma con los mismos cubos
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    # Cuantil aproximado por interpolación lineal dentro del cubo que lo contiene
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+# Cronómetro por campo: cada lap() anota el tiempo transcurrido desde la anterior
+class _FieldClock:
+    def __init__(self, metrics, backend):
+        self.metrics = metrics
+        self.backend = backend
+        self.last = time.perf_counter()
+
+    def lap(self, field):
+        now = time.perf_counter()
+        self.metrics.observe("extract_field_seconds", now - self.last, backend=self.backend, field=field)
+        self.last = now
+
+# Registro de métricas de una ejecución (contadores e histogramas con etiquetas), seguro entre hilos
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(buckets)
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def field_clock(self, backend):
+        return _FieldClock(self, backend)
+
+    # Devuelve lo anotado hasta ahora (contadores, histogramas) y vacía el registro. Lo usan los procesos
+    # de un pool para enviar sus métricas al proceso principal, que las suma con merge()
+    def take(self):
+        with self.lock:
+            taken = self.counters, self.histograms
+            self.counters, self.histograms = {}, {}
+        return taken
+
+    def merge(self, taken):
+        counters, histograms = taken
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, histogram in histograms.items():
+                if key in self.histograms:
+                    self.histograms[key].merge(histogram)
+                else:
+                    self.histograms[key] = histogram
+
+    # Fases de una respuesta de http_client (response.timings), su tamaño y su código de estado
+    def record_response(self, page, response):
+        for phase, seconds in getattr(response, "timings", {}).items():
+            if seconds is not None:
+                self.observe("http_phase_seconds", seconds, page=page, phase=phase)
+        self.observe("response_bytes", len(response.content or b""), SIZE_BUCKETS, page=page)
+        self.inc("responses_total", page=page, status=str(response.status_code))
+
+    # Informe de la ejecución en un diccionario serializable
+    def report(self):
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(labels), **histogram.summary()}
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ]
+        return {
+            "started_at": self.start_time,
+            "duration_seconds": time.time() - self.start_time,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.report(), ensure_ascii=False, indent=2))
+        logging.info(f"Informe de métricas guardado en {path}")
+
+    # Formato de texto de Prometheus, para el textfile collector de node_exporter
+    def write_prometheus(self, path):
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{METRIC_PREFIX}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f"{METRIC_PREFIX}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bucket, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bucket)),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_duration_seconds {time.time() - self.start_time}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds {time.time()}")
+        _write_atomic(path, "\n".join(lines) + "\n")
+        logging.info(f"Métricas de Prometheus guardadas en {path}")
+
+    def export(self, json_path=None, prometheus_path=None):
+        if json_path:
+            self.write_json(json_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+# Escapa barras, comillas y saltos de línea en el valor de una etiqueta
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Escribe a un archivo temporal y lo renombra, así el recolector nunca lee un archivo a medias
+def _write_atomic(path, text):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as output:
+        output.write(text)
+    os.replace(temp_path, path)
+
+_metrics = None
+
+# Reinicia el registro compartido (p. ej. al comenzar una ejecución nueva)
+def configure_metrics():
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
+
+# Devuelve el registro compartido, creándolo si aún no existe
+def get_metrics():
+    if _metrics is None:
+        configure_metrics()
+    return _metrics
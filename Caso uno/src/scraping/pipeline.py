@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+import pandas as pd
+
+from async_scraper import MAX_CONCURRENCY, PER_HOST_CONCURRENCY, fetch_response, trace_config
+from extract_product_info import lookup_cache, parse_product
+from http_client import HEADERS
+from response_cache import ResponseCache
+from checkpoint import BATCH_SIZE, open_writer
+from html_archive import configure_archive, get_archive
+from extractors import EXTRACTORS, DEFAULT_BACKEND, configure_extractor
+from metrics import configure_metrics, get_metrics
+
+# Procesos de parseo por defecto: uno por núcleo
+PARSE_WORKERS = os.cpu_count() or 1
+# Capacidad de cada cola entre etapas
+QUEUE_SIZE = 64
+# Segundos entre dos informes del estado de las etapas
+REPORT_INTERVAL = 5.0
+
+# Marca de fin de cola
+_DONE = object()
+
+# Parseo en un proceso del pool. Las métricas que anota el proceso (parse_seconds, extract_field_seconds) se
+# devuelven con el registro para sumarlas a las del proceso principal, que es el que las exporta
+def _parse_worker(content, position, pagination, backend):
+    product_data = parse_product(content, position, pagination, backend)
+    return product_data, get_metrics().take()
+
+# Scraping por etapas unidas por colas acotadas:
+#   descarga (asyncio, E/S concurrente) -> parseo (procesos, uno por núcleo) -> escritura (lotes en disco)
+# Mientras se parsea una página se siguen descargando otras, y el parseo no bloquea el bucle de eventos.
+# Cuando una etapa se atrasa su cola se llena y frena a la anterior; además, como mucho `window`
+# productos están a la vez entre la entrada y el CSV, así la memoria queda acotada aunque una descarga
+# lenta retenga la escritura en orden.
+class ScrapingPipeline:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, per_host_concurrency=PER_HOST_CONCURRENCY,
+                 parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE, max_retries=3, cache=None, backend=None,
+                 report_interval=REPORT_INTERVAL):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.cache = cache
+        self.backend = backend  # Se pasa explícito: los procesos de parseo no heredan configure_extractor
+        self.report_interval = report_interval
+        self.window = max_concurrency + parse_workers * 2 + queue_size * 2
+        # Contadores de cada etapa para el informe periódico y el resumen final
+        self.stats = {'descargados': 0, 'fallidos': 0, 'cache': 0, 'parseados': 0, 'escritos': 0}
+
+    def run(self, product_df, writer):
+        return asyncio.run(self.run_async(product_df, writer))
+
+    async def run_async(self, product_df, writer):
+        self.fetch_queue = asyncio.Queue(self.queue_size)  # URLs pendientes de descargar
+        self.parse_queue = asyncio.Queue(self.queue_size)  # Respuestas pendientes de parsear
+        self.write_queue = asyncio.Queue(self.queue_size)  # Registros pendientes de escribir
+        self.in_flight = asyncio.Semaphore(self.window)
+        self.parsing = 0
+        self.reorder = {}
+        self.start_time = time.time()
+
+        limits = (asyncio.Semaphore(self.max_concurrency), {}, self.per_host_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_concurrency)
+        # Cada proceso empieza con un registro de métricas vacío (con fork heredaría el del proceso principal)
+        with ProcessPoolExecutor(self.parse_workers, initializer=configure_metrics) as pool:
+            async with aiohttp.ClientSession(headers=HEADERS, connector=connector,
+                                             trace_configs=[trace_config()]) as session:
+                monitor = asyncio.ensure_future(self._monitor())
+                try:
+                    await asyncio.gather(
+                        self._feed(product_df, writer),
+                        self._fetch_stage(session, limits),
+                        self._parse_stage(pool, session, limits),
+                        self._write_stage(writer),
+                    )
+                finally:
+                    monitor.cancel()
+
+        self._report()
+        return self.stats
+
+    # Encola las URLs del listado en orden, omitiendo las ya completadas en una ejecución anterior
+    async def _feed(self, product_df, writer):
+        index = 0
+        for _, row in product_df.iterrows():
+            if writer.is_done(row['URL']):
+                continue
+            await self.in_flight.acquire()  # Se libera cuando el registro sale de la etapa de escritura
+            await self.fetch_queue.put((index, row['URL'], row['Posición'], row['Paginación']))
+            index += 1
+        for _ in range(self.max_concurrency):
+            await self.fetch_queue.put(_DONE)
+
+    async def _fetch_stage(self, session, limits):
+        async def worker():
+            while True:
+                item = await self.fetch_queue.get()
+                if item is _DONE:
+                    return
+                response = await fetch_response(session, limits, item[1], self.max_retries, cache=self.cache,
+                                                backend=self.backend)
+                self.stats['descargados' if response is not None else 'fallidos'] += 1
+                await self.parse_queue.put((item, response))
+
+        await asyncio.gather(*[worker() for _ in range(self.max_concurrency)])
+        await self.parse_queue.put(_DONE)
+
+    # Resuelve las páginas sin cambios con la caché y reparte el resto entre los procesos de parseo
+    async def _parse_stage(self, pool, session, limits):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.parse_workers * 2)  # Páginas enviadas al pool a la vez
+        tasks = set()
+
+        async def parse(item, response, digest):
+            index, url, position, pagination = item
+            status, headers, content = response
+            try:
+                product_data, worker_metrics = await loop.run_in_executor(
+                    pool, _parse_worker, content, position, pagination, self.backend
+                )
+                get_metrics().merge(worker_metrics)
+                self.stats['parseados'] += 1
+                if self.cache is not None:
+                    self.cache.store(url, headers, digest, product_data, self.backend)
+            except Exception as e:
+                logging.error(f"Otro error: {e}")
+                get_metrics().inc("errors_total", page="producto")
+                product_data = None
+            finally:
+                self.parsing -= 1
+                slots.release()
+            await self.write_queue.put((index, url, product_data))
+
+        while True:
+            entry = await self.parse_queue.get()
+            if entry is _DONE:
+                break
+            item, response = entry
+            index, url, position, pagination = item
+            if response is None:
+                await self.write_queue.put((index, url, None))
+                continue
+
+            record = digest = None
+            if self.cache is not None:
+                record, digest = lookup_cache(url, response[0], response[2], position, pagination, self.cache,
+                                              self.backend)
+                if record is None and digest is None:
+                    # 304 cuya entrada ya no está en la caché: se vuelve a descargar sin validadores. Es raro,
+                    # así que se espera aquí en lugar de devolver la URL a la etapa de descarga.
+                    logging.warning(f"Respuesta 304 sin registro en la caché para {url}; se pide sin validadores")
+                    response = await fetch_response(session, limits, url, self.max_retries, cache=self.cache,
+                                                    conditional=False, backend=self.backend)
+                    if response is None:
+                        await self.write_queue.put((index, url, None))
+                        continue
+                    record, digest = lookup_cache(url, response[0], response[2], position, pagination,
+                                                  self.cache, self.backend)
+                    if record is None and digest is None:
+                        logging.error(f"Respuesta 304 sin registro en la caché para {url} aun sin validadores")
+                        get_metrics().inc("errors_total", page="producto")
+                        await self.write_queue.put((index, url, None))
+                        continue
+
+            status, headers, content = response
+            archive = get_archive()
+            if archive is not None and status == 200:
+                archive.append(url, content, position, pagination)  # Para poder reextraer sin volver a descargar
+            if record is not None:
+                self.stats['cache'] += 1
+                await self.write_queue.put((index, url, record))
+                continue
+
+            await slots.acquire()
+            self.parsing += 1
+            task = asyncio.ensure_future(parse(item, response, digest))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        await self.write_queue.put(_DONE)
+
+    # Escribe los registros en el orden del listado; el guardado por lotes (con fsync) va en un hilo
+    async def _write_stage(self, writer):
+        loop = asyncio.get_running_loop()
+        next_index = 0
+        while True:
+            entry = await self.write_queue.get()
+            if entry is _DONE:
+                break
+            index, url, product_data = entry
+            self.reorder[index] = (url, product_data)
+            while next_index in self.reorder:
+                url, product_data = self.reorder.pop(next_index)
+                if product_data:
+                    await loop.run_in_executor(None, writer.add, url, product_data)
+                    self.stats['escritos'] += 1
+                self.in_flight.release()
+                next_index += 1
+        await loop.run_in_executor(None, writer.flush)
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self._report()
+
+    # Profundidad de cada cola y ritmo de cada etapa desde el inicio
+    def _report(self):
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        fetched = self.stats['descargados'] + self.stats['fallidos']
+        resolved = self.stats['cache'] + self.stats['parseados']
+        message = (
+            f"Pipeline {elapsed:.0f} s | "
+            f"descarga: cola {self.fetch_queue.qsize()}/{self.queue_size}, {fetched / elapsed:.1f} págs/s | "
+            f"parseo: cola {self.parse_queue.qsize()}/{self.queue_size}, {self.parsing} en proceso, "
+            f"{resolved / elapsed:.1f} págs/s ({self.stats['cache']} de caché) | "
+            f"escritura: cola {self.write_queue.qsize()}/{self.queue_size}, {len(self.reorder)} en espera de orden, "
+            f"{self.stats['escritos'] / elapsed:.1f} regs/s"
+        )
+        logging.info(message)
+        print(message)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping por etapas: descarga, parseo en procesos y escritura")
+    parser.add_argument("--csv", default="C:/Users/johan/Desktop/Data/Caso uno/src/scraping/productos_20241006_165851.csv",
+                        help="CSV con las columnas URL, Posición y Paginación")
+    parser.add_argument("--salida", default="productos_scrapeados_v4.csv", help="CSV de salida (o carpeta .parquet)")
+    parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCY, help="Descargas simultáneas en total")
+    parser.add_argument("--concurrencia-host", type=int, default=PER_HOST_CONCURRENCY,
+                        help="Descargas simultáneas por dominio")
+    parser.add_argument("--procesos", type=int, default=PARSE_WORKERS, help="Procesos de parseo")
+    parser.add_argument("--cola", type=int, default=QUEUE_SIZE, help="Capacidad de cada cola entre etapas")
+    parser.add_argument("--intervalo", type=float, default=REPORT_INTERVAL,
+                        help="Segundos entre informes del estado de las etapas")
+    parser.add_argument("--cache", default="cache_productos.sqlite", help="Archivo de la caché de respuestas")
+    parser.add_argument("--sin-cache", action="store_true", help="Descargar y parsear todas las páginas")
+    parser.add_argument("--parser", choices=list(EXTRACTORS), default=DEFAULT_BACKEND,
+                        help="Backend de extracción de los campos")
+    parser.add_argument("--resume", action="store_true", help="Reanudar omitiendo las URLs ya guardadas")
+    parser.add_argument("--lote", type=int, default=BATCH_SIZE, help="Registros por punto de control")
+    parser.add_argument("--archivo", help="Carpeta donde archivar el HTML descargado para reextraerlo sin red")
+    parser.add_argument("--metricas", help="Ruta del informe JSON de métricas de la ejecución")
+    parser.add_argument("--metricas-prom", help="Ruta del archivo de métricas para Prometheus (textfile collector)")
+    args = parser.parse_args()
+    configure_extractor(args.parser)
+
+    start_time_total = time.time()
+
+    cache = None if args.sin_cache else ResponseCache(args.cache)
+    writer = open_writer(args.salida, batch_size=args.lote, resume=args.resume)
+    product_df = pd.read_csv(args.csv)
+    if args.archivo:
+        configure_archive(args.archivo).register_listing(product_df)  # Filas y orden del listado para reextraer
+    pipeline = ScrapingPipeline(args.concurrencia, args.concurrencia_host, args.procesos, args.cola, cache=cache,
+                                backend=args.parser, report_interval=args.intervalo)
+    stats = pipeline.run(product_df, writer)
+    writer.close()
+    if cache is not None:
+        cache.log_summary()  # Aciertos y fallos de la caché de respuestas
+        cache.close()
+    get_metrics().export(args.metricas, args.metricas_prom)
+
+    execution_time = time.time() - start_time_total
+    logging.info(f"Tiempo total de ejecución: {execution_time:.2f} segundos")
+    print(f"Datos estructurados y almacenados en '{args.salida}' ({stats['escritos']} productos en {execution_time:.2f} segundos)")
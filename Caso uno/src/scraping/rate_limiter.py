@@ -0,0 +1,165 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Límites de la tasa por dominio (solicitudes por segundo)
+INITIAL_RATE = 2.0
+MIN_RATE = 0.2
+MAX_RATE = 20.0
+BURST = 4  # Solicitudes que se pueden hacer seguidas tras un periodo sin actividad
+
+# Ajuste automático: si la latencia media supera el objetivo o hay errores se frena; si no, se acelera
+TARGET_LATENCY = 1.5  # Segundos
+INCREASE_STEP = 0.25  # Aumento aditivo de la tasa por cada segundo de respuestas sanas
+DECREASE_FACTOR = 0.5  # Reducción multiplicativa ante 429/503 o errores de conexión
+SLOW_FACTOR = 0.9  # Reducción suave cuando la latencia supera el objetivo
+EWMA_ALPHA = 0.2
+DECREASE_INTERVAL = 1.0  # Segundos mínimos entre dos reducciones, para no hundir la tasa con una ráfaga de errores
+
+# Backoff exponencial con jitter para los reintentos
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# Códigos que indican que el servidor está saturado y conviene reintentar más tarde
+RETRY_STATUS = {429, 502, 503, 504}
+
+# Segundos de espera de una cabecera Retry-After (en segundos o como fecha HTTP)
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+# Espera exponencial con "full jitter": aleatoria entre 0 y base * 2^intento (con tope)
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Estado de un dominio: cubeta de tokens, pausa por Retry-After y métricas observadas
+class _HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.latency = None  # Media móvil exponencial de la latencia
+        self.errors = 0.0  # Media móvil exponencial de la tasa de error
+        self.logged_rate = rate
+        self.last_decrease = 0.0
+
+# Limitador de tasa adaptativo compartido por los scrapers (seguro entre hilos y usable con asyncio)
+class RateLimiter:
+    def __init__(self, initial_rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE, burst=BURST,
+                 target_latency=TARGET_LATENCY):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.target_latency = target_latency
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _state(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = _HostState(self.initial_rate, self.burst)
+        return self.hosts[host]
+
+    # Reserva un token y devuelve cuántos segundos hay que esperar para usarlo
+    def _reserve(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.tokens = min(state.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            state.tokens -= 1  # Puede quedar negativo: es una reserva a futuro
+            delay = -state.tokens / state.rate if state.tokens < 0 else 0.0
+            return max(delay, state.paused_until - now)
+
+    def acquire(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, url):
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # Registra el resultado de una solicitud y ajusta la tasa del dominio.
+    # status=None indica un error de conexión. Devuelve los segundos recomendados antes de reintentar
+    # (0 si la respuesta no requiere reintento).
+    def record(self, url, latency=None, status=None, headers=None, attempt=1):
+        host = urlsplit(url).netloc
+        with self.lock:
+            state = self._state(host)
+            overloaded = status is None or status in RETRY_STATUS
+            state.errors = EWMA_ALPHA * overloaded + (1 - EWMA_ALPHA) * state.errors
+            if latency is not None:
+                state.latency = latency if state.latency is None else \
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * state.latency
+
+            now = time.monotonic()
+            can_decrease = now - state.last_decrease >= DECREASE_INTERVAL
+            retry_delay = 0.0
+            if overloaded:
+                if can_decrease:
+                    state.rate = max(self.min_rate, state.rate * DECREASE_FACTOR)
+                    state.last_decrease = now
+                retry_delay = parse_retry_after((headers or {}).get('Retry-After'))
+                if retry_delay is None:
+                    retry_delay = backoff_delay(attempt)
+                # Nadie vuelve a pedir a este dominio hasta que pase la espera
+                state.paused_until = max(state.paused_until, now + retry_delay)
+                state.tokens = min(state.tokens, 0)
+            elif state.latency is not None and state.latency > self.target_latency:
+                if can_decrease:
+                    state.rate = max(self.min_rate, state.rate * SLOW_FACTOR)
+                    state.last_decrease = now
+            elif state.errors < 0.05:
+                state.rate = min(self.max_rate, state.rate + INCREASE_STEP / state.rate)
+
+            self._log_rate(host, state, status, retry_delay)
+            return retry_delay
+
+    # Anota en el log la tasa elegida cuando cambia más de un 10 % respecto a la última anotada
+    @staticmethod
+    def _log_rate(host, state, status, retry_delay):
+        if abs(state.rate - state.logged_rate) < 0.1 * state.logged_rate and not retry_delay:
+            return
+        latency = f"{state.latency:.2f} s" if state.latency is not None else "n/d"
+        reason = f", esperando {retry_delay:.1f} s (estado {status})" if retry_delay else ""
+        logging.info(
+            f"Tasa para {host}: {state.rate:.2f} solicitudes/s (latencia media {latency}, "
+            f"tasa de error {state.errors:.0%}){reason}"
+        )
+        state.logged_rate = state.rate
+
+    def current_rates(self):
+        with self.lock:
+            return {host: state.rate for host, state in self.hosts.items()}
+
+_limiter = None
+
+# Configura (o reemplaza) el limitador compartido
+def configure_limiter(**kwargs):
+    global _limiter
+    _limiter = RateLimiter(**kwargs)
+    return _limiter
+
+# Devuelve el limitador compartido, creándolo con la configuración por defecto si aún no existe
+def get_limiter():
+    if _limiter is None:
+        configure_limiter()
+    return _limiter
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from extractors import get_extractor
+
+# Tamaño máximo por defecto de la caché (bytes de registros guardados)
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+# Caché persistente de respuestas por URL: validadores HTTP, hash del cuerpo y el registro ya extraído, con el
+# backend (y su versión) que lo extrajo. Un registro de otro backend cuenta como fallo: la página se pide sin
+# validadores y se vuelve a parsear.
+class ResponseCache:
+    def __init__(self, path='cache_productos.sqlite', max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT NOT NULL,
+                record TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                extractor TEXT
+            )
+        """)
+        # Cachés creadas antes de guardar el backend: sus registros no coinciden con ninguno y se vuelven a extraer
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(respuestas)")}
+        if 'extractor' not in columns:
+            self.conn.execute("ALTER TABLE respuestas ADD COLUMN extractor TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_last_access ON respuestas (last_access)")
+        self.conn.commit()
+        # Contadores para el resumen al final de la ejecución
+        self.stats = {'not_modified': 0, 'same_hash': 0, 'misses': 0, 'evictions': 0}
+
+    # Cabeceras condicionales para la URL si ya se descargó y extrajo antes con el mismo backend. La entrada se
+    # marca como usada para que no sea la primera en eliminarse mientras se espera el 304.
+    def conditional_headers(self, url, backend=None):
+        row = self.conn.execute("SELECT etag, last_modified FROM respuestas WHERE url = ? AND extractor = ?",
+                                (url, get_extractor(backend).cache_key)).fetchone()
+        headers = {}
+        if row:
+            self._touch(url)
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    # Registro guardado cuando el servidor responde 304 (no modificado)
+    def get_not_modified(self, url, backend=None):
+        record = self._load(url, backend)
+        if record is not None:
+            self.stats['not_modified'] += 1
+        return record
+
+    # Registro guardado si el cuerpo descargado es idéntico al de la ejecución anterior
+    def get_same_content(self, url, content_hash, backend=None):
+        row = self.conn.execute("SELECT content_hash FROM respuestas WHERE url = ? AND extractor = ?",
+                                (url, get_extractor(backend).cache_key)).fetchone()
+        if row and row[0] == content_hash:
+            self.stats['same_hash'] += 1
+            return self._load(url, backend)
+        return None
+
+    def _load(self, url, backend=None):
+        row = self.conn.execute("SELECT record FROM respuestas WHERE url = ? AND extractor = ?",
+                                (url, get_extractor(backend).cache_key)).fetchone()
+        if not row:
+            return None
+        self._touch(url)
+        return json.loads(row[0])
+
+    def _touch(self, url):
+        self.conn.execute("UPDATE respuestas SET last_access = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+
+    # Guarda el registro extraído junto con los validadores de la respuesta y el backend que lo extrajo
+    def store(self, url, headers, content_hash, record, backend=None):
+        self.stats['misses'] += 1
+        # Position y Pagination dependen del listado, no de la página, así que no se guardan
+        payload = json.dumps(
+            {k: v for k, v in record.items() if k not in ('Position', 'Pagination')}, ensure_ascii=False
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO respuestas (url, etag, last_modified, content_hash, record, size, last_access, "
+            "extractor) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, headers.get('ETag'), headers.get('Last-Modified'), content_hash, payload,
+             len(payload.encode('utf-8')), time.time(), get_extractor(backend).cache_key)
+        )
+        self.conn.commit()
+        self._evict()
+
+    # Elimina las entradas usadas hace más tiempo hasta volver a estar por debajo del límite
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM respuestas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT url, size FROM respuestas ORDER BY last_access").fetchall()
+        to_delete = []
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((url,))
+            total -= size
+        self.conn.executemany("DELETE FROM respuestas WHERE url = ?", to_delete)
+        self.conn.commit()
+        self.stats['evictions'] += len(to_delete)
+
+    def log_summary(self):
+        hits = self.stats['not_modified'] + self.stats['same_hash']
+        total = hits + self.stats['misses']
+        logging.info(
+            f"Caché de respuestas: {hits} aciertos ({self.stats['not_modified']} por 304, "
+            f"{self.stats['same_hash']} por hash), {self.stats['misses']} fallos, "
+            f"{self.stats['evictions']} entradas eliminadas, tasa de acierto {hits / total if total else 0:.1%}"
+        )
+        return self.stats
+
+    def close(self):
+        self.conn.close()
+
+# Hash del cuerpo de la respuesta para detectar páginas sin cambios
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+# Completa un registro de la caché con la posición del listado actual
+def with_position(record, position, pagination):
+    record = dict(record)
+    record['Position'] = position
+    record['Pagination'] = pagination
+    return record
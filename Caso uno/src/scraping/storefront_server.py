@@ -0,0 +1,189 @@
+import argparse
+import glob
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Carpeta con las páginas de producto guardadas que sirven de plantilla
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Productos por página de listado, igual que la tienda
+PAGE_SIZE = 24
+# Categorías de la tienda de prueba (los productos se reparten entre ellas)
+CATEGORIES = ('hombre', 'woman', 'kids', 'viaje', 'marketplace', 'ofertas-arturo-calle')
+
+# Nombre de producto en el bloque productBrand de una plantilla
+_NAME_RE = re.compile(rb'productBrand">([^<]+)<')
+
+# Comportamiento inyectado en las respuestas; se puede cambiar en caliente con /__config?clave=valor
+class FaultConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=1.0):
+        self.latency = latency  # Segundos fijos antes de responder
+        self.jitter = jitter  # Segundos aleatorios adicionales (uniforme entre 0 y jitter)
+        self.error_rate = error_rate  # Fracción de respuestas 500
+        self.throttle_rate = throttle_rate  # Fracción de respuestas 429 con Retry-After
+        self.retry_after = retry_after
+
+    def update(self, values):
+        for key, value in values.items():
+            if hasattr(self, key):
+                setattr(self, key, float(value))
+
+    def as_dict(self):
+        return dict(vars(self))
+
+# Tienda VTEX simulada: listados /<categoría>?page=N y páginas de producto /<slug>-<n>/p generadas a partir de
+# las plantillas de fixtures/ (cada producto lleva su número en el nombre, en el HTML y en el JSON __STATE__).
+# Las páginas se generan al vuelo, así el servidor puede anunciar cientos de miles de productos sin memoria extra.
+class StorefrontServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, n_products, address=('127.0.0.1', 0), page_size=PAGE_SIZE, categories=CATEGORIES,
+                 faults=None, seed=None):
+        self.n_products = n_products
+        self.page_size = page_size
+        self.categories = list(categories)
+        self.faults = faults or FaultConfig()
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.requests_served = 0
+        self.templates = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+            content = open(path, 'rb').read()
+            slug = os.path.basename(path)[:-len('.html')].rsplit('-', 1)[0]
+            self.templates.append((slug, content, _NAME_RE.search(content).group(1)))
+        super().__init__(address, StorefrontHandler)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def category_urls(self):
+        return [f"{self.base_url}/{category}" for category in self.categories]
+
+    # Productos de una categoría: se reparten por turnos (producto n -> categoría n % número de categorías)
+    def category_products(self, category):
+        index = self.categories.index(category)
+        return range(index, self.n_products, len(self.categories))
+
+    def product_path(self, number):
+        slug = self.templates[number % len(self.templates)][0]
+        return f"/{slug}-{number}/p"
+
+    def listing_page(self, category, page):
+        products = self.category_products(category)
+        start = (page - 1) * self.page_size
+        links = "\n".join(
+            f'<section class="vtex-product-summary-2-x-container">'
+            f'<a class="vtex-product-summary-2-x-clearLink" href="{self.product_path(number)}">Producto {number}</a>'
+            f'</section>'
+            for number in products[start:start + self.page_size]
+        )
+        more = (f'<a class="vtex-search-result-3-x-buttonShowMore" href="?page={page + 1}">Mostrar más</a>'
+                if start + self.page_size < len(products) else "")
+        return (
+            f'<!DOCTYPE html><html lang="es-CO"><head><meta charset="utf-8"><title>{category}</title></head>'
+            f'<body><div class="vtex-search-result-3-x-totalProducts--layout"><span>{len(products)} Productos</span></div>'
+            f'<div class="vtex-search-result-3-x-gallery">{links}</div>{more}</body></html>'
+        ).encode('utf-8')
+
+    def product_page(self, number):
+        _, content, name = self.templates[number % len(self.templates)]
+        return content.replace(name, name + f" #{number}".encode('utf-8'))
+
+    # Decide la falla inyectada en una solicitud: None, 500 o 429
+    def draw_fault(self):
+        with self.random_lock:
+            self.requests_served += 1
+            draw = self.random.random()
+            delay = self.faults.latency + self.random.uniform(0, self.faults.jitter)
+        if draw < self.faults.throttle_rate:
+            return 429, delay
+        if draw < self.faults.throttle_rate + self.faults.error_rate:
+            return 500, delay
+        return None, delay
+
+class StorefrontHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Permite conexiones keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        segments = [segment for segment in parts.path.split('/') if segment]
+
+        if segments == ['__config']:
+            server.faults.update(query)
+            return self._send(200, repr(server.faults.as_dict()).encode('utf-8'), 'text/plain')
+
+        fault, delay = server.draw_fault()
+        if delay:
+            time.sleep(delay)
+        if fault == 429:
+            return self._send(429, b'', headers={'Retry-After': f"{server.faults.retry_after:g}"})
+        if fault == 500:
+            return self._send(500, b'Error interno simulado')
+
+        if len(segments) == 1 and segments[0] in server.categories:
+            page = int(query.get('page', 1))
+            return self._send(200, server.listing_page(segments[0], page))
+        if len(segments) == 2 and segments[1] == 'p':
+            number = segments[0].rsplit('-', 1)[-1]
+            if number.isdigit() and int(number) < server.n_products:
+                return self._send_product(server.product_page(int(number)))
+        self._send(404, b'No encontrado')
+
+    # Página de producto con ETag para que funcionen las solicitudes condicionales de la caché
+    def _send_product(self, body):
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, None, headers={'ETag': etag})
+        self._send(200, body, headers={'ETag': etag})
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Silenciamos el log de acceso del servidor
+
+# Levanta la tienda en un hilo y la devuelve (server.base_url, server.category_urls())
+def start_storefront(n_products, faults=None, seed=None, **kwargs):
+    server = StorefrontServer(n_products, faults=faults, seed=seed, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tienda local de prueba con listados, productos y fallas inyectadas")
+    parser.add_argument("--productos", type=int, default=1000, help="Productos que anuncia la tienda")
+    parser.add_argument("--puerto", type=int, default=8000, help="Puerto de escucha (0 = uno libre)")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de espera antes de cada respuesta")
+    parser.add_argument("--variacion", type=float, default=0.0, help="Segundos aleatorios adicionales de espera")
+    parser.add_argument("--errores", type=float, default=0.0, help="Fracción de respuestas 500")
+    parser.add_argument("--limitadas", type=float, default=0.0, help="Fracción de respuestas 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Valor de Retry-After en las respuestas 429")
+    parser.add_argument("--semilla", type=int, help="Semilla de las fallas, para repetir la misma secuencia")
+    args = parser.parse_args()
+
+    faults = FaultConfig(args.latencia, args.variacion, args.errores, args.limitadas, args.retry_after)
+    server = StorefrontServer(args.productos, ('127.0.0.1', args.puerto), faults=faults, seed=args.semilla)
+    print(f"Tienda de prueba en {server.base_url} con {args.productos} productos", flush=True)
+    for category_url in server.category_urls():
+        print(f"  {category_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()